@@ -1,9 +1,57 @@
 from gods.models import Game_State, Choice
+import multiprocessing
+
+
+# Imported once by the fork server, so that the processes it starts do not
+# import them again (about 60 ms each otherwise).
+WORKER_MODULES = ["gods.agents.mcts", "gods.agents.mcts_shared", "gods.agents.minimax_stochastic", "gods.agents.ponder"]
+
+
+def worker_context():
+    """multiprocessing context for the processes agents search in.
+
+    Positions are pickled to them. A fresh process, unlike a fork, does not
+    inherit locks held by the other threads of the graphical client.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(WORKER_MODULES)
+    return ctx
+
 
 class Agent:
     def message(self, msg: str):
         print("Agent:", msg)
 
+    def observe_pending(self, choices: list[Choice]) -> None:
+        """The choices queued after the one about to be passed to choose_action,
+        for agents that match positions (see game_loop)."""
+        pass
+
+    def ponder(self, game: Game_State, choice: Choice, actions: list) -> None:
+        """The other player's decision while they make it, for agents that
+        think meanwhile (see Agent_Duel)."""
+        pass
+
     def choose_action(self, game: Game_State, choice: Choice, actions: list) -> int:
         """Pick an action index. Does NOT call resolve."""
         return 0
+
+
+class Ponderable_Agent(Agent):
+    """An agent whose search of a decision is made of ponder_rounds() independent
+    searches, each drawn from a seed, that Agent_Ponder can run before the
+    decision comes (see gods.agents.ponder)."""
+    def ponder_rounds(self) -> int:
+        raise NotImplementedError
+
+    def ponder_search(self, game: Game_State, choice: Choice, actions: list, seed: int):
+        """One of those searches, run in the pondering process. The result is
+        pickled back."""
+        raise NotImplementedError
+
+    def use_pondered(self, results: list, actions: list) -> int:
+        """Results of ponder_search for the decision about to be passed to
+        choose_action, returns how many of them it uses."""
+        raise NotImplementedError
@@ -11,5 +11,11 @@ class Agent_Duel(Agent):
     def message(self, msg: str):
         print("Duel:", msg)
 
+    def observe_pending(self, choices: list[Choice]) -> None:
+        for agent in self.agents:
+            agent.observe_pending(choices)
+
     def choose_action(self, state: Game_State, choice: Choice, actions: list):
+        # the other agent can think meanwhile, see gods.agents.ponder
+        self.agents[1 - choice.player_index].ponder(state, choice, actions)
         return self.agents[choice.player_index].choose_action(state, choice, actions)
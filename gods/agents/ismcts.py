@@ -0,0 +1,142 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from gods.models import Game_State, Choice, clone_choice, get_actions, action_key, invalidate_caches, spawn_seed
+from gods.game import player_score, get_next_search_choice, rollout, random_policy
+from gods.agents.agent import Agent
+from typing import Iterable, Optional
+import math
+import random
+import time
+
+
+@dataclass(slots=True)
+class IS_Node:
+    children: dict = field(default_factory=dict)  # action_key -> IS_Node
+    player_index: int = -1  # player whose action led to this node
+    visits: int = 0
+    wins: float = 0.0  # from the point of view of player_index
+    available: int = 0  # iterations in which the action leading here could be played
+
+
+def determinize(state: Game_State, player_index: int, rng: random.Random) -> Game_State:
+    """Clone of state with what player_index cannot see re-sampled: the opponent's
+    hand and deck are shuffled together and redealt, and both decks and the shared
+    deck are put in a random order."""
+    sampled = state.clone()
+    opp = sampled.players[1 - player_index]
+    hand_size = len(opp.hand)
+    hidden_cards = opp.hand + opp.deck
+    rng.shuffle(hidden_cards)
+    opp.hand = hidden_cards[:hand_size]
+    opp.deck = hidden_cards[hand_size:]
+    rng.shuffle(sampled.players[player_index].deck)
+    rng.shuffle(sampled.shared_deck)
+    sampled.seed = spawn_seed(rng)  # the real game's future shuffles are hidden too
+    invalidate_caches(sampled)
+    return sampled
+
+
+class Agent_ISMCTS(Agent):
+    """Single-observer information set MCTS.
+
+    Every iteration plays in a new determinization of the hidden cards, and all of
+    them add to one tree. Edges are action_key descriptions, so "play Flood" is
+    the same edge whichever position Flood has in the sampled hand, and an
+    opponent action only exists in the samples that deal them the card. UCB1 uses
+    how often an action was available instead of the parent's visits, and each
+    node keeps its statistics for the player choosing there.
+    """
+    def __init__(self, exploration: float = 1.41, time_limit: float = 10.0, rollout_policy=random_policy):
+        self.exploration = exploration
+        self.time_limit = time_limit  # max seconds for search
+        self.rollout_policy = rollout_policy  # see gods.game.rollout
+        self.rng = random.Random()
+        self.player_index: Optional[int] = None  # set during choose_action
+        self.iterations = 0  # iterations run by the last search
+
+    def message(self, msg: str):
+        pass  # silent agent
+
+    def choose_action(self, state: Game_State, choice: Choice, actions: list) -> int:
+        self.player_index = choice.player_index
+        return self.ismcts_search(state, choice, actions)
+
+    def select(self, node: IS_Node, keys: Iterable) -> Optional[object]:
+        # the key to follow among the available (distinct) ones with UCB1, or
+        # None when some of them were never tried and the caller should expand one
+        if any(key not in node.children for key in keys):
+            return None
+        best_key, best_value = None, -float("inf")
+        for key in keys:
+            child = node.children[key]
+            child.available += 1
+            value = child.wins / child.visits + self.exploration * math.sqrt(math.log(child.available) / child.visits)
+            if value > best_value:
+                best_key, best_value = key, value
+        return best_key
+
+    def ismcts_search(self, state: Game_State, choice: Choice, actions: list) -> int:
+        root = IS_Node()
+        print("started:", choice.type)
+        start_time = time.time()
+        iteration = 0
+        while (time.time() - start_time) < self.time_limit:
+            iteration += 1
+            sim_state = determinize(state, self.player_index, self.rng)  # type: ignore[arg-type]
+            sim_choice = clone_choice(choice)
+            sim_choices = []
+            node = root
+            path = [root]
+
+            # selection and expansion in this determinization
+            while sim_choice is not None:
+                # equal actions (two copies of a card in hand with the same
+                # fields) are one edge, played through the first of them
+                keys: dict = {}  # action_key -> index of its first action
+                for i, action in enumerate(get_actions(sim_state, sim_choice)):
+                    keys.setdefault(action_key(sim_state, action), i)
+                key = self.select(node, keys)
+                expanded = key is None
+                if expanded:
+                    untried = [k for k in keys if k not in node.children]
+                    key = self.rng.choice(untried)
+                    for k in keys:
+                        if k in node.children:
+                            node.children[k].available += 1
+                    node.children[key] = IS_Node(player_index=sim_choice.player_index, available=1)
+                index = keys[key]
+                node = node.children[key]
+                path.append(node)
+                new_choices = sim_choice.resolve(sim_state, index)
+                sim_choices.extend(new_choices)
+                sim_choice = get_next_search_choice(sim_state, sim_choices)
+                if expanded:
+                    break
+
+            # simulation
+            if sim_choice is not None:
+                sim_choices.insert(0, sim_choice)
+            rollout(sim_state, sim_choices, self.rollout_policy, self.rng)
+            result = self.evaluate(sim_state)
+
+            # backpropagation, each node from the point of view of who chose it
+            for node in path:
+                node.visits += 1
+                node.wins += result if node.player_index == self.player_index else -result
+
+        self.iterations = iteration
+        print(choice.type, "iterations:", iteration)
+        keys = [action_key(state, action) for action in actions]
+        for action, key in zip(actions, keys):
+            child = root.children.get(key)
+            if child is not None:
+                print("child:", action, child.visits, child.wins / child.visits)
+        return max(range(len(actions)), key=lambda i: root.children[keys[i]].visits if keys[i] in root.children else -1)
+
+    def evaluate(self, state: Game_State) -> float:
+        # final state from the point of view of self.player_index, in [-1, 1],
+        # a tie is lost by the player who ended the game
+        diff = player_score(state, self.player_index) - player_score(state, 1 - self.player_index)
+        if diff == 0:
+            return -1.0 if state.ending_player == self.player_index else 1.0
+        return 1.0 if diff > 0 else -1.0
@@ -1,134 +1,299 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
-from gods.models import Game_State, Choice
-from gods.agents.randomized import Agent_Random
-from gods.game import compute_player_score, game_loop, get_next_choice
+from gods.models import Game_State, Choice, clone_choice, get_actions, state_hash
+from gods.game import player_score, get_next_search_choice, rollout, random_policy
+from gods.agents.agent import Agent, worker_context
+from gods.agents.transposition import position_key
+from array import array
+from typing import Optional
 import copy
 import math
 import random
 import time
 
+try:
+    import numpy as np  # optional, only vectorizes UCB1 over wide nodes
+except ImportError:
+    np = None
 
-@dataclass
-class MCTS_Node:
-    parent: int = -1  # index into tree, -1 means no parent (root)
-    action_index: int = -1  # action that led to this node
-    children: list[int] = field(default_factory=list)  # indices into tree
-    visits: int = 0
-    wins: float = 0.0
-    untried_actions: list[int] = field(default_factory=list)
+NUMPY_MIN_CHILDREN = 48  # below this a plain loop is faster than NumPy's per-call overhead
 
+NO_KEY = 0  # node position not recorded yet
+MIXED_KEYS = 1  # node reached in different positions (hidden draws), not reusable
 
-class Agent_MCTS:
-    def __init__(self, exploration: float = 1.41, time_limit: float = 10.0):
+
+class Node_Store:
+    """MCTS tree in flat typed arrays (the array module), one slot per node.
+
+    The children of a node are allocated together the first time the node is
+    expanded, so they are the contiguous slice starting at first_child, and the
+    action that leads to a child is its offset in that slice. positions maps the
+    key of a position (see transposition.position_key, pending choices and
+    searching player included) to the node that reaches it, for reuse.
+    """
+    def __init__(self):
+        self.size = 0
+        self.visits = array("i")
+        self.wins = array("f")
+        self.parent = array("i")  # -1 means no parent (root)
+        self.first_child = array("i")  # -1 until expanded
+        self.num_children = array("i")
+        self.key = array("q")
+        self.positions: dict[int, int] = {}
+
+    def arrays(self) -> list[array]:
+        return [self.visits, self.wins, self.parent, self.first_child, self.num_children, self.key]
+
+    def bytes_per_node(self) -> int:
+        return sum(values.itemsize for values in self.arrays())
+
+    def add_nodes(self, parent: int, count: int) -> int:
+        """Allocate count nodes under parent, returns the index of the first."""
+        first = self.size
+        self.size += count
+        for values in (self.visits, self.wins, self.num_children, self.key):
+            values.frombytes(bytes(values.itemsize * count))
+        self.parent.extend(array("i", [parent]) * count)
+        self.first_child.extend(array("i", [-1]) * count)
+        return first
+
+    def num_visited(self) -> int:
+        """Nodes visited at least once, the others are only allocated."""
+        return self.size - self.visits.count(0)
+
+    def expand(self, node: int, num_actions: int) -> None:
+        self.first_child[node] = self.add_nodes(node, num_actions)
+        self.num_children[node] = num_actions
+
+    def record_position(self, node: int, key: int) -> None:
+        old_key = self.key[node]
+        if old_key == NO_KEY:
+            self.key[node] = key
+            self.positions.setdefault(key, node)
+        elif old_key != key and old_key != MIXED_KEYS:
+            self.key[node] = MIXED_KEYS
+            if self.positions.get(old_key) == node:
+                del self.positions[old_key]
+
+    def subtree(self, node: int) -> Node_Store:
+        """Copy of the subtree under node, node becoming the root."""
+        tree = Node_Store()
+        tree.add_nodes(-1, 1)
+        tree.visits[0] = self.visits[node]
+        tree.wins[0] = self.wins[node]
+        tree.key[0] = self.key[node]
+        stack = [(node, 0)]
+        while stack:
+            old, new = stack.pop()
+            if self.first_child[old] == -1:
+                continue
+            count = self.num_children[old]
+            old_first = self.first_child[old]
+            tree.expand(new, count)
+            first = tree.first_child[new]
+            for values, old_values in zip([tree.visits, tree.wins, tree.key], [self.visits, self.wins, self.key]):
+                values[first:first + count] = old_values[old_first:old_first + count]
+            stack.extend((old_first + i, first + i) for i in range(count))
+        for new in range(tree.size):
+            if tree.key[new] not in (NO_KEY, MIXED_KEYS):
+                tree.positions.setdefault(tree.key[new], new)
+        return tree
+
+
+def _search_worker(task: tuple) -> tuple[dict[int, tuple[int, float]], int, int]:
+    # one tree of a root-parallel search, in a process of Agent_MCTS.pool
+    agent, state, choice, actions, seed = task
+    agent.rng.seed(seed)
+    return agent.search_tree(state, choice, actions, reuse=False)
+
+
+class Agent_MCTS(Agent):
+    def __init__(
+        self,
+        exploration: float = 1.41,
+        time_limit: float = 10.0,
+        rollout_policy=random_policy,
+        workers: int = 1,
+        max_iterations: Optional[int] = None,
+    ):
         self.exploration = exploration
         self.time_limit = time_limit  # max seconds for search
-        self.random_agent = Agent_Random()
+        self.max_iterations = max_iterations  # max iterations per tree, None for no limit
+        self.workers = workers  # independent trees searched in parallel (root parallelism)
+        self.rollout_policy = rollout_policy  # see gods.game.rollout
+        self.rng = random.Random()
         self.player_index = None  # set during choose_action
-        self.tree: list[MCTS_Node] = []  # nodes stored by index
+        self.iterations = 0  # iterations run by the last search
+        self.reused_visits = 0  # visits kept from the previous tree by the last search
+        self.tree = Node_Store()  # tree of the last search, kept for reuse
+        self.pending: Optional[list[Choice]] = None  # queued after the decision at hand, see observe_pending
+        self.pool = None  # worker processes, started by the first parallel search and kept until close()
 
     def message(self, msg: str):
         pass  # silent agent
 
-    def create_node(self, parent: int = -1, action_index: int = -1) -> int:
-        node_index = len(self.tree)
-        self.tree.append(MCTS_Node(parent=parent, action_index=action_index))
-        return node_index
-
-    def ucb1(self, node_index: int) -> float:
-        node = self.tree[node_index]
-        if node.visits == 0:
-            return float('inf')
-        parent = self.tree[node.parent]
-        exploitation = node.wins / node.visits
-        exploration_term = self.exploration * math.sqrt(math.log(parent.visits) / node.visits)
-        return exploitation + exploration_term
-
-    def best_child(self, node_index: int) -> int:
-        node = self.tree[node_index]
-        return max(node.children, key=lambda c: self.ucb1(c))
-
-    def best_action(self, node_index: int) -> int:
-        node = self.tree[node_index]
-        best_child_index = max(node.children, key=lambda c: self.tree[c].visits)
-        return self.tree[best_child_index].action_index
+    def close(self) -> None:
+        """Stop the worker processes, if any were started."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def best_child(self, node: int, num_actions: int) -> int:
+        # UCB1 over the children of node, an unvisited child first; children past
+        # num_actions are skipped, a random event can lead node to a choice with
+        # fewer actions than when it was expanded
+        tree = self.tree
+        visits = tree.visits
+        start = tree.first_child[node]
+        end = start + min(tree.num_children[node], num_actions)
+        unvisited = [child for child in range(start, end) if not visits[child]]
+        if unvisited:
+            return self.rng.choice(unvisited)
+        log_visits = math.log(visits[node])
+        if np is not None and end - start >= NUMPY_MIN_CHILDREN:
+            inverse = 1.0 / np.frombuffer(visits, np.int32, end - start, start * visits.itemsize)
+            wins = np.frombuffer(tree.wins, np.float32, end - start, start * tree.wins.itemsize)
+            return start + int((wins * inverse + self.exploration * np.sqrt(log_visits * inverse)).argmax())
+        wins = tree.wins
+        exploration = self.exploration
+        best, best_value = start, -math.inf
+        for child in range(start, end):
+            value = wins[child] / visits[child] + exploration * math.sqrt(log_visits / visits[child])
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    def observe_pending(self, choices: list[Choice]) -> None:
+        self.pending = [clone_choice(c) for c in choices]
 
     def choose_action(self, state: Game_State, choice: Choice, actions: list) -> int:
         self.player_index = choice.player_index
         selected = self.mcts_search(state, choice, actions)
+        self.pending = None
         return selected
 
     def mcts_search(self, state: Game_State, choice: Choice, actions: list) -> int:
-        self.tree = []
-        root = self.create_node()
-        self.tree[root].untried_actions = list(range(len(actions)))
-
         print("started:", choice.type)
+        if self.workers > 1:
+            stats, iteration, num_nodes = self.parallel_search(state, choice, actions)
+        else:
+            stats, iteration, num_nodes = self.search_tree(state, choice, actions)
+
+        self.iterations = iteration
+        print(choice.type, "iterations:", iteration, "nodes:", num_nodes, f"({self.tree.bytes_per_node()} bytes/node)")
+        if self.reused_visits:
+            total = self.tree.visits[0]
+            print(f"reused visits: {self.reused_visits}/{total} ({self.reused_visits / total:.0%})")
+        for action, (visits, wins) in sorted(stats.items()):
+            print("child:", actions[action], visits, wins/visits)
+
+        return max(stats, key=lambda a: stats[a][0])
+
+    def parallel_search(self, state: Game_State, choice: Choice, actions: list) -> tuple[dict[int, tuple[int, float]], int, int]:
+        # root parallelism: every worker grows its own tree from the same root,
+        # then the visits and wins of the root children are summed. The pool is
+        # started once, so later decisions do not wait for the processes; each
+        # tree's time limit starts in its worker.
+        if self.pool is None:
+            self.pool = worker_context().Pool(self.workers)
+        worker = copy.copy(self)
+        worker.tree = Node_Store()  # workers grow their own, the last tree is not sent
+        worker.pool = None
+        tasks = [(worker, state, choice, actions, self.rng.randrange(2**32)) for _ in range(self.workers)]
+        results = self.pool.map(_search_worker, tasks)
+
+        stats: dict[int, tuple[int, float]] = {}
+        for worker_stats, _, _ in results:
+            for action, (visits, wins) in worker_stats.items():
+                total_visits, total_wins = stats.get(action, (0, 0.0))
+                stats[action] = (total_visits + visits, total_wins + wins)
+        return stats, sum(result[1] for result in results), sum(result[2] for result in results)
+
+    def search_tree(
+        self, state: Game_State, choice: Choice, actions: list, reuse: bool = True
+    ) -> tuple[dict[int, tuple[int, float]], int, int]:
+        # grow self.tree from the root until the time or iteration budget is spent, returns
+        # the (visits, wins) of each root child by action, the iterations and the visited nodes.
+        # With reuse, the search continues from the node of the previous tree that
+        # reached this position, if there is exactly one. Without the pending
+        # choices (see observe_pending) the position is not known and a new tree
+        # is grown.
+        root = 0
+        node = -1
+        if self.pending is not None:
+            key = position_key(state, choice, self.pending, self.player_index)
+            if reuse:
+                node = self.tree.positions.get(key, -1)
+        if node != -1:
+            tree = self.tree = self.tree.subtree(node)
+        else:
+            tree = self.tree = Node_Store()
+            tree.add_nodes(-1, 1)
+            if self.pending is not None:
+                tree.record_position(root, key)
+        self.reused_visits = tree.visits[root]
+        state_hash(state)  # once here, the clones below keep it up to date
+
         start_time = time.time()
         iteration = 0
         while (time.time() - start_time) < self.time_limit:
+            if self.max_iterations is not None and iteration >= self.max_iterations:
+                break
             iteration += 1
             # clone state for simulation
-            sim_state = copy.deepcopy(state)
-            sim_choice = copy.deepcopy(choice)
+            sim_state = state.clone()
+            sim_choice = clone_choice(choice)
             sim_choices = []
-            node_index = root
-
-            # selection: traverse tree using UCB1
-            node = self.tree[node_index]
-            while node.untried_actions == [] and node.children:
-                node_index = self.best_child(node_index)
-                node = self.tree[node_index]
-                new_choices = sim_choice.resolve(sim_state, sim_choice, node.action_index) or []
-                sim_choices.extend(new_choices)
-                sim_choice = get_next_choice(sim_state, sim_choices)
-                if sim_choice is None:
-                    break
+            node = root
+            path = [root]
 
-            # expansion: add a new child node
-            if node.untried_actions and sim_choice is not None:
-                action = random.choice(node.untried_actions)
-                node.untried_actions.remove(action)
-                child_index = self.create_node(parent=node_index, action_index=action)
-                node.children.append(child_index)
-                node_index = child_index
-                node = self.tree[node_index]
-                new_choices = sim_choice.resolve(sim_state, sim_choice, action) or []
+            # selection and expansion: walk down with UCB1 until a node visited for the
+            # first time, the children of a node are created when it is first walked through
+            while sim_choice is not None:
+                num_actions = len(get_actions(sim_state, sim_choice))
+                if tree.first_child[node] == -1:
+                    tree.expand(node, num_actions)
+                child = self.best_child(node, num_actions)
+                action = child - tree.first_child[node]
+                node = child
+                path.append(node)
+                new_choices = sim_choice.resolve(sim_state, action)
                 sim_choices.extend(new_choices)
-                # initialize child's untried actions for the next choice
-                sim_choice = get_next_choice(sim_state, sim_choices)
+                sim_choice = get_next_search_choice(sim_state, sim_choices)
                 if sim_choice is not None:
-                    sim_actions = sim_choice.generate_actions(sim_state, sim_choice)
-                    node.untried_actions = list(range(len(sim_actions)))
+                    tree.record_position(node, position_key(sim_state, sim_choice, sim_choices, self.player_index))
+                if tree.visits[node] == 0:
+                    break
 
-            # simulation: play randomly until game ends
-            result = self.simulate(sim_state)
+            # simulation: play randomly until game ends, positions are only
+            # recorded in the tree so the hash is no longer maintained
+            if sim_choice is not None:
+                sim_choices.insert(0, sim_choice)
+            sim_state.zobrist = None
+            result = self.simulate(sim_state, sim_choices)
 
             # backpropagation: update statistics
-            while node_index != -1:
-                node = self.tree[node_index]
-                node.visits += 1
-                node.wins += result
-                node_index = node.parent
-
-        print(choice.type, "iterations:", iteration)
-        root_node = self.tree[root]
-        for child_index in root_node.children:
-            child = self.tree[child_index]
-            print("child:", actions[child.action_index], child.visits, child.wins/child.visits)
-
-        return self.best_action(root)
-
-    def simulate(self, state: Game_State) -> float:
-        # play random moves until game ends using the actual game loop
-        game_loop(state, self.random_agent, display=None)
+            for node in path:
+                tree.visits[node] += 1
+                tree.wins[node] += result
+
+        stats = {}
+        first = tree.first_child[root]
+        for action in range(tree.num_children[root]):
+            visits = tree.visits[first + action]
+            if visits:
+                stats[action] = (visits, tree.wins[first + action])
+        return stats, iteration, tree.num_visited()
+
+    def simulate(self, state: Game_State, choices: list[Choice]) -> float:
+        # play until game ends, starting from the pending choices
+        rollout(state, choices, self.rollout_policy, self.rng)
         return self.evaluate(state)
 
     def evaluate(self, state: Game_State) -> float:
         # evaluate the final state from perspective of self.player_index
         # returns value in [-1, 1] range for proper UCB1 exploration
-        my_score = compute_player_score(state, self.player_index)
-        opp_score = compute_player_score(state, 1 - self.player_index)
+        my_score = player_score(state, self.player_index)
+        opp_score = player_score(state, 1 - self.player_index)
         diff = my_score - opp_score
         if diff == 0:
             # tiebreaker: ending player loses
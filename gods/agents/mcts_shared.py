@@ -0,0 +1,199 @@
+from __future__ import annotations
+from gods.models import Game_State, Choice, clone_choice, get_actions
+from gods.game import get_next_search_choice, random_policy
+from gods.agents.agent import worker_context
+from gods.agents.mcts import Agent_MCTS, Node_Store
+from typing import Optional
+import copy
+import math
+import multiprocessing
+import time
+
+# Search handed to the worker processes: (agent, tree, state, choice), given to
+# each of them by the pool initializer. The arrays of the tree are shared
+# memory, whose handles can only reach a process as it starts, so unlike root
+# parallelism (Agent_MCTS.pool) each search starts its own pool.
+_worker_job: Optional[tuple] = None
+
+
+def _set_worker_job(job: tuple) -> None:
+    global _worker_job
+    _worker_job = job
+
+
+def _search_worker(seed: int) -> int:
+    agent, tree, state, choice = _worker_job  # type: ignore[misc]
+    agent.rng.seed(seed)
+    return agent.grow_tree(tree, state, choice)
+
+
+class Shared_Tree:
+    """MCTS tree stored in flat arrays, one slot per node, that worker processes
+    share. Children of a node are linked through first_child/next_sibling, and
+    actions are expanded in order, so num_expanded is also the next untried one.
+    Statistics are from the searching player's point of view, as in Agent_MCTS.
+    """
+    def __init__(self, capacity: int, ctx=multiprocessing):
+        self.capacity = capacity
+        self.visits = ctx.RawArray("d", capacity)  # real visits + virtual losses in flight
+        self.wins = ctx.RawArray("d", capacity)
+        self.parent = ctx.RawArray("i", capacity)
+        self.first_child = ctx.RawArray("i", capacity)
+        self.next_sibling = ctx.RawArray("i", capacity)
+        self.action_index = ctx.RawArray("i", capacity)  # action that led to this node
+        self.num_actions = ctx.RawArray("i", capacity)  # -1 until the node's choice is reached
+        self.num_expanded = ctx.RawArray("i", capacity)
+        self.size = ctx.RawValue("i", 0)
+        self.lock = ctx.Lock()
+
+    def create_node(self, parent: int = -1, action_index: int = -1) -> int:
+        # call with the lock held
+        node = self.size.value
+        self.size.value = node + 1
+        self.visits[node] = 0.0
+        self.wins[node] = 0.0
+        self.parent[node] = parent
+        self.first_child[node] = -1
+        self.next_sibling[node] = -1
+        self.action_index[node] = action_index
+        self.num_actions[node] = -1
+        self.num_expanded[node] = 0
+        if parent != -1:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+        return node
+
+    def children(self, node: int) -> list[int]:
+        result = []
+        child = self.first_child[node]
+        while child != -1:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+
+class Agent_MCTS_Shared(Agent_MCTS):
+    """Tree-parallel MCTS: workers select, expand and back up into one Shared_Tree.
+
+    The lock is only held while walking or updating the tree, the state changes
+    and rollouts run in parallel. Every node on a path being simulated gets a
+    virtual loss (a visit with the worst result), so concurrent selections spread
+    over different branches until the real result replaces it.
+    """
+    def __init__(
+        self,
+        exploration: float = 1.41,
+        time_limit: float = 10.0,
+        rollout_policy=random_policy,
+        workers: int = 1,
+        max_iterations: Optional[int] = None,
+        max_nodes: int = 200_000,
+        virtual_loss: float = 1.0,
+    ):
+        super().__init__(exploration, time_limit, rollout_policy, workers, max_iterations)
+        self.max_nodes = max_nodes
+        self.virtual_loss = virtual_loss
+
+    def mcts_search(self, state: Game_State, choice: Choice, actions: list) -> int:
+        print("started:", choice.type)
+        ctx = worker_context()
+        tree = Shared_Tree(self.max_nodes, ctx)
+        root = tree.create_node()
+        tree.num_actions[root] = len(actions)
+
+        if self.workers > 1:
+            worker = copy.copy(self)
+            worker.tree = Node_Store()  # the Agent_MCTS tree is not used here
+            seeds = [self.rng.randrange(2**32) for _ in range(self.workers)]
+            with ctx.Pool(self.workers, _set_worker_job, ((worker, tree, state, choice),)) as pool:
+                iteration = sum(pool.map(_search_worker, seeds))
+        else:
+            iteration = self.grow_tree(tree, state, choice)
+
+        self.iterations = iteration
+        print(choice.type, "iterations:", iteration, "nodes:", tree.size.value)
+        children = tree.children(root)
+        for child in sorted(children, key=lambda c: tree.action_index[c]):
+            print("child:", actions[tree.action_index[child]], int(tree.visits[child]), tree.wins[child] / tree.visits[child])
+
+        best = max(children, key=lambda c: tree.visits[c])
+        return tree.action_index[best]
+
+    def select_child(self, tree: Shared_Tree, node: int) -> int:
+        # call with the lock held
+        log_visits = math.log(max(tree.visits[node], 1.0))
+        best, best_value = -1, -float("inf")
+        child = tree.first_child[node]
+        while child != -1:
+            visits = tree.visits[child]
+            if visits == 0:
+                return child
+            value = tree.wins[child] / visits + self.exploration * math.sqrt(log_visits / visits)
+            if value > best_value:
+                best, best_value = child, value
+            child = tree.next_sibling[child]
+        return best
+
+    def grow_tree(self, tree: Shared_Tree, state: Game_State, choice: Choice) -> int:
+        # run iterations into tree until the time or iteration budget is spent,
+        # returns the number of iterations run by this process
+        lock = tree.lock
+        loss = self.virtual_loss
+        start_time = time.time()
+        iteration = 0
+        while (time.time() - start_time) < self.time_limit:
+            if self.max_iterations is not None and iteration >= self.max_iterations:
+                break
+            iteration += 1
+            sim_state = state.clone()
+            sim_choice = clone_choice(choice)
+            sim_choices = []
+            node = 0
+            path = [node]
+            with lock:
+                tree.visits[node] += loss
+                tree.wins[node] -= loss
+
+            # selection and expansion, one step of the tree under the lock at a time
+            while sim_choice is not None:
+                # a random event can lead a node to a choice with fewer actions than
+                # its first visit, then the walk stops and the rollout starts here
+                num_actions = len(get_actions(sim_state, sim_choice))
+                with lock:
+                    if tree.num_actions[node] == -1:
+                        tree.num_actions[node] = num_actions
+                    expanded = tree.num_expanded[node] < tree.num_actions[node] and tree.size.value < tree.capacity
+                    if expanded:
+                        if tree.num_expanded[node] >= num_actions:
+                            break
+                        child = tree.create_node(node, tree.num_expanded[node])
+                        tree.num_expanded[node] += 1
+                    elif tree.first_child[node] != -1:
+                        child = self.select_child(tree, node)
+                        if tree.action_index[child] >= num_actions:
+                            break
+                    else:
+                        break  # tree is full
+                    tree.visits[child] += loss
+                    tree.wins[child] -= loss
+                path.append(child)
+                node = child
+                new_choices = sim_choice.resolve(sim_state, tree.action_index[node])
+                sim_choices.extend(new_choices)
+                sim_choice = get_next_search_choice(sim_state, sim_choices)
+                if expanded:
+                    break
+
+            # simulation: play randomly until game ends, the hash is not
+            # maintained as no position is recorded from here
+            if sim_choice is not None:
+                sim_choices.insert(0, sim_choice)
+            sim_state.zobrist = None
+            result = self.simulate(sim_state, sim_choices)
+
+            # backpropagation: replace the virtual loss with the result
+            with lock:
+                for node in path:
+                    tree.visits[node] += 1 - loss
+                    tree.wins[node] += result + loss
+        return iteration
@@ -1,15 +1,27 @@
 from __future__ import annotations
 from typing import Optional
-from gods.models import Game_State, Choice
+from gods.models import Game_State, Choice, has_equivalent_cards
 from gods.agents.minimax_search import Search_Context, minimax_search
+from gods.agents.transposition import Transposition_Table
+from gods.agents.agent import Agent
 import time
 
 
-class Agent_Minimax:
-    def __init__(self, max_depth: int = 5, time_limit: float = 10.0):
-        self.max_depth = max_depth
+class Agent_Minimax(Agent):
+    """Iterative deepening alpha-beta search on the true state (see minimax_search).
+
+    collapse decides whether equivalent actions, equal by equivalence_key, are
+    searched once: True always, False never, None (the default) when the game
+    has two cards with the same name (has_equivalent_cards), since otherwise no
+    two actions are equivalent and computing the keys only costs time.
+    """
+    def __init__(self, max_depth: int = 5, time_limit: float = 10.0, table_mb: float = 16.0, macro_actions: bool = False, collapse: Optional[bool] = None):
+        self.max_depth = max_depth  # in turns with macro_actions, see Search_Context
         self.time_limit = time_limit
         self.player_index: Optional[int] = None
+        self.table = Transposition_Table(table_mb) if table_mb > 0 else None
+        self.macro_actions = macro_actions
+        self.collapse = collapse  # search equivalent actions once, see the class docstring
 
     def message(self, msg: str):
         pass
@@ -19,10 +31,15 @@ class Agent_Minimax:
         if is_root:
             self.player_index = choice.player_index
 
+        if self.table is not None:
+            self.table.new_search()
         ctx = Search_Context(
             player_index=self.player_index,  # type: ignore[arg-type]
             start_time=time.time(),
             time_limit=self.time_limit,
+            table=self.table,
+            macro_actions=self.macro_actions,
+            collapse=has_equivalent_cards(state) if self.collapse is None else self.collapse,
         )
 
         print("started:", choice.type)
@@ -34,6 +51,8 @@ class Agent_Minimax:
             f"score={scores[best_action]:.2f} nodes={ctx.nodes_searched} "
             f"time={elapsed:.2f}s"
         )
+        if self.table is not None:
+            print(f"  table: hit_rate={self.table.hit_rate():.2f} cutoffs={self.table.cutoffs}")
 
         if is_root:
             self.player_index = None
@@ -1,8 +1,12 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from gods.models import Game_State, Choice
-from gods.game import compute_player_score, get_next_choice
-import copy
+from dataclasses import dataclass, field
+from typing import Optional
+from gods.models import (
+    Game_State, Choice, clone_choice, start_journal, journal_mark, undo, action_key,
+    equivalent_actions, action_classes, get_action_classes, state_hash, choice_key, get_actions,
+)
+from gods.game import player_score, get_next_search_choice
+from gods.agents.transposition import Transposition_Table, position_key, EXACT, LOWER, UPPER
 import time
 
 
@@ -13,7 +17,128 @@ class Search_Context:
     start_time: float
     time_limit: float
     time_up: bool = False
-    nodes_searched: int = 0
+    nodes_searched: int = 0  # nodes of the last deepening iteration
+    total_nodes: int = 0  # nodes of all iterations
+    depth_reached: int = 0  # depth of the last completed iteration
+    table: Optional[Transposition_Table] = None
+    # Move ordering of interior nodes: killer moves per ply and a history table,
+    # both keyed by move_key so they carry over between positions.
+    ordering: bool = True
+    iteration_depth: int = 0  # depth of the current iteration, ply = iteration_depth - depth
+    killers: dict[int, list] = field(default_factory=dict)  # ply -> up to NUM_KILLERS move keys
+    history: dict = field(default_factory=dict)  # move key -> sum of depth^2 of its cutoffs
+    cutoffs: int = 0  # alpha-beta cutoffs in interior nodes
+    first_move_cutoffs: int = 0  # cutoffs by the first move tried
+    # Principal variation search: moves after the first are searched with a null
+    # window and only re-searched when they may be better. The root window of
+    # each iteration is aspiration_window around the previous best score (0 for
+    # a full window), widened when the best score falls outside of it.
+    pvs: bool = True
+    aspiration_window: float = 5.0
+    # Search turns instead of choices: main and choose-card are one choice (see
+    # make_turn_choice) that counts as one ply of depth, the choices cards ask
+    # for along the way count as FOLLOW_UP_DEPTH (a card can keep asking).
+    # Off by default, as depth then counts turns rather than choices.
+    macro_actions: bool = False
+    # Equivalent actions are searched once: with collapse those equal by
+    # equivalence_key, with collapse_outcomes also those leading to the same
+    # position after resolving (not at the last ply, where it costs as much as
+    # searching them). The agents collapse by key when the game has equivalent
+    # cards (has_equivalent_cards): otherwise nothing collapses, and computing
+    # the keys costs about a quarter of the search (see benchmark_action_collapsing).
+    collapse: bool = False
+    collapse_outcomes: bool = False
+    collapsed: int = 0  # actions skipped as equivalent to another one
+    researches: int = 0  # null window searches that had to be repeated
+    aspiration_failures: int = 0  # root iterations searched again with a full window
+
+
+NUM_KILLERS = 2
+
+
+def move_key(state: Game_State, choice: Choice, action) -> tuple:
+    """Description of a move that is the same wherever the card sits, e.g.
+    ("choose-card", ("hand", 0, "Flood")) rather than its action index."""
+    return (choice.type, action_key(state, action))
+
+
+def order_moves(state: Game_State, choice: Choice, actions: list, first: int, ply: int, ctx: Search_Context) -> list[int]:
+    """Action indices to try: first (the table's move, or -1), then the killers
+    of this ply, then the rest by history score."""
+    keys = [move_key(state, choice, action) for action in actions]
+    killers = ctx.killers.get(ply, [])
+    history = ctx.history
+
+    def priority(a: int):
+        if a == first:
+            return (2, 0)
+        key = keys[a]
+        if key in killers:
+            return (1, -killers.index(key))
+        return (0, history.get(key, 0))
+
+    return sorted(range(len(actions)), key=priority, reverse=True)
+
+
+def record_cutoff(state: Game_State, choice: Choice, action, depth: int, ply: int, ctx: Search_Context) -> None:
+    key = move_key(state, choice, action)
+    killers = ctx.killers.setdefault(ply, [])
+    if key not in killers:
+        killers.insert(0, key)
+        del killers[NUM_KILLERS:]
+    ctx.history[key] = ctx.history.get(key, 0) + depth * depth
+
+
+NULL_WINDOW = 1e-6  # scores are multiples of 0.05, any smaller width works
+FOLLOW_UP_DEPTH = 0.5  # depth used by a choice inside a turn when searching with macro_actions
+
+
+def search_action(
+    state: Game_State,
+    choice: Choice,
+    action: int,
+    pending_choices: list[Choice],
+    depth: float,
+    alpha: float,
+    beta: float,
+    ctx: Search_Context,
+) -> float:
+    """Score of playing action in choice, with state restored afterwards."""
+    mark = journal_mark(state)
+    new_choices = choice.resolve(state, action)
+    score = minimax(state, list(new_choices) + pending_choices, depth, alpha, beta, ctx)
+    undo(state, mark)
+    return score
+
+
+def equivalent_outcomes(state: Game_State, choice: Choice, order: list[int]) -> dict[int, int]:
+    """Each action of order mapped to the first one leading to the same state and
+    new choices, itself for the first of a class."""
+    first = {}
+    result = {}
+    for action in order:
+        mark = journal_mark(state)
+        new_choices = choice.resolve(state, action)
+        key = (state_hash(state), tuple(choice_key(c) for c in new_choices))
+        undo(state, mark)
+        result[action] = first.setdefault(key, action)
+    return result
+
+
+def collapse_actions(
+    state: Game_State, choice: Choice, actions: list, classes: list[int], order, outcomes: bool, ctx: Search_Context
+) -> dict[int, int]:
+    """Each action of order mapped to the one searched in its place, see
+    equivalent_actions (classes are the action_classes of actions) and, when
+    outcomes is set, equivalent_outcomes."""
+    same = equivalent_actions(state, actions, order, classes)
+    if outcomes:
+        distinct = [a for a in same if same[a] == a]
+        if len(distinct) > 1:
+            same_outcome = equivalent_outcomes(state, choice, distinct)
+            same = {a: same_outcome[r] for a, r in same.items()}
+    ctx.collapsed += sum(1 for a in same if same[a] != a)
+    return same
 
 
 def check_time(ctx: Search_Context) -> None:
@@ -31,19 +156,42 @@ def minimax_search(
 ) -> list[float]:
     """Run iterative deepening minimax search.
 
-    Returns scores where scores[i] is the score for action i.
+    The search works on a single copy of state: every choice is applied in
+    place and reverted with undo() once its subtree has been searched.
+
+    Returns scores where scores[i] is the score for action i: exact for the
+    best action, an upper bound not above the best score for the others.
     """
+    state = state.clone()
+    choice = clone_choice(choice)
+    start_journal(state)
+
     num_actions = len(actions)
     action_order = list(range(num_actions))
+    same = {a: a for a in action_order}
+    if ctx.collapse and num_actions > 1:
+        classes = action_classes(state, actions)
+        same = collapse_actions(state, choice, actions, classes, action_order, ctx.collapse_outcomes, ctx)
+        action_order = [a for a in action_order if same[a] == a]
     scores: list[float] = [-float("inf")] * num_actions
 
     for depth in range(1, max_depth + 1):
         if ctx.time_up:
             break
         ctx.nodes_searched = 0
-        depth_scores = minimax_root(state, choice, actions, depth, action_order, ctx)
+        ctx.iteration_depth = depth
+        best = max(scores)
+        if depth > 1 and ctx.aspiration_window > 0 and abs(best) < 900:
+            alpha, beta = best - ctx.aspiration_window, best + ctx.aspiration_window
+            depth_scores = minimax_root(state, choice, actions, depth, action_order, ctx, alpha, beta)
+            if not ctx.time_up and not alpha < max(depth_scores) < beta:
+                ctx.aspiration_failures += 1
+                depth_scores = minimax_root(state, choice, actions, depth, action_order, ctx)
+        else:
+            depth_scores = minimax_root(state, choice, actions, depth, action_order, ctx)
         if not ctx.time_up:
-            scores = depth_scores
+            scores = [depth_scores[same[a]] for a in range(num_actions)]
+            ctx.depth_reached = depth
             action_order.sort(key=lambda a: depth_scores[a], reverse=True)
         if max(scores) >= 900:
             break
@@ -55,23 +203,26 @@ def minimax_root(
     state: Game_State,
     choice: Choice,
     actions: list,
-    depth: int,
+    depth: float,
     action_order: list[int],
     ctx: Search_Context,
+    alpha: float = -float("inf"),
+    beta: float = float("inf"),
 ) -> list[float]:
-    """Try every action at the root and return scores."""
+    """Try every action at the root within (alpha, beta) and return scores."""
     num_actions = len(actions)
-    alpha = -float("inf")
-    beta = float("inf")
     scores: list[float] = [-float("inf")] * num_actions
 
-    for action in action_order:
+    for i, action in enumerate(action_order):
         if ctx.time_up:
             break
-        sim = copy.deepcopy(state)
-        sim_choice = copy.deepcopy(choice)
-        new_choices = sim_choice.resolve(sim, sim_choice, action) or []
-        score = minimax(sim, list(new_choices), depth, alpha, beta, ctx)
+        if i == 0 or not ctx.pvs:
+            score = search_action(state, choice, action, [], depth, alpha, beta, ctx)
+        else:
+            score = search_action(state, choice, action, [], depth, alpha, alpha + NULL_WINDOW, ctx)
+            if alpha < score < beta:
+                ctx.researches += 1
+                score = search_action(state, choice, action, [], depth, alpha, beta, ctx)
         scores[action] = score
         alpha = max(alpha, score)
 
@@ -81,13 +232,18 @@ def minimax_root(
 def minimax(
     state: Game_State,
     pending_choices: list[Choice],
-    depth: int,
+    depth: float,
     alpha: float,
     beta: float,
     ctx: Search_Context,
 ) -> float:
-    """Recursive minimax with alpha-beta pruning."""
+    """Recursive minimax with alpha-beta pruning.
+
+    Choices are applied to state in place and undone before returning to the
+    caller's loop, the caller reverts whatever get_next_search_choice advanced here.
+    """
     ctx.nodes_searched += 1
+    ctx.total_nodes += 1
     if ctx.nodes_searched & 1023 == 0:
         check_time(ctx)
     if ctx.time_up:
@@ -96,53 +252,113 @@ def minimax(
     if state.game_over:
         return evaluate(state, ctx.player_index)
 
-    choice = get_next_choice(state, pending_choices)
+    choice = get_next_search_choice(state, pending_choices, ctx.macro_actions)
     if choice is None:
         return evaluate(state, ctx.player_index)
 
-    actions = choice.generate_actions(state, choice)
+    actions = get_actions(state, choice)
     maximizing = choice.player_index == ctx.player_index
-    next_depth = depth - 1
-    if next_depth < 0:
+    # a choose-cards picked card by card (make_pick_choice) is one ply, as when
+    # flat: its first pick uses the depth, the others are finished past the horizon
+    if depth <= 0 and not choice.picked:
         return evaluate_heuristic(state, ctx.player_index)
+    next_depth = depth - 1 if not ctx.macro_actions or choice.type == "turn" else depth - FOLLOW_UP_DEPTH
+    if choice.picked:
+        next_depth = depth
 
     if not actions:
         return evaluate_heuristic(state, ctx.player_index)
 
+    # Transposition table: reuse a result from an earlier iteration or from the
+    # same position reached by another move order, and try its best move first.
+    table = ctx.table
+    action_order = range(len(actions))
+    table_move = -1
+    if table is not None:
+        key = position_key(state, choice, pending_choices, ctx.player_index)
+        entry = table.probe(key)
+        if entry is not None:
+            _, stored_value, stored_depth, bound, stored_action, _ = entry
+            if stored_depth >= depth:
+                if bound == EXACT:
+                    table.cutoffs += 1
+                    return stored_value
+                elif bound == LOWER:
+                    alpha = max(alpha, stored_value)
+                elif bound == UPPER:
+                    beta = min(beta, stored_value)
+                if alpha >= beta:
+                    table.cutoffs += 1
+                    return stored_value
+            if 0 <= stored_action < len(actions):
+                table_move = stored_action
+                action_order = [stored_action] + [a for a in range(len(actions)) if a != stored_action]
+    ply = int(ctx.iteration_depth - depth)
+    if ctx.ordering and len(actions) > 1:
+        action_order = order_moves(state, choice, actions, table_move, ply, ctx)
+    if ctx.collapse and len(actions) > 1:
+        classes = get_action_classes(state, choice)
+        same = collapse_actions(state, choice, actions, classes, action_order, ctx.collapse_outcomes and next_depth > 0, ctx)
+        action_order = [a for a in same if same[a] == a]
+    original_alpha = alpha
+    original_beta = beta
+    best_action = 0
+
     if maximizing:
         value = -float("inf")
-        for action in range(len(actions)):
-            sim = copy.deepcopy(state)
-            sim_pending = list(pending_choices)
-            sim_choice = copy.deepcopy(choice)
-            new_choices = sim_choice.resolve(sim, sim_choice, action) or []
-            sim_pending = list(new_choices) + sim_pending
-            score = minimax(sim, sim_pending, next_depth, alpha, beta, ctx)
-            value = max(value, score)
+        for i, action in enumerate(action_order):
+            if i == 0 or not ctx.pvs:
+                score = search_action(state, choice, action, pending_choices, next_depth, alpha, beta, ctx)
+            else:
+                score = search_action(state, choice, action, pending_choices, next_depth, alpha, alpha + NULL_WINDOW, ctx)
+                if alpha < score < beta:
+                    ctx.researches += 1
+                    score = search_action(state, choice, action, pending_choices, next_depth, alpha, beta, ctx)
+            if score > value:
+                value = score
+                best_action = action
             alpha = max(alpha, value)
             if alpha >= beta:
                 break
-        return value
     else:
         value = float("inf")
-        for action in range(len(actions)):
-            sim = copy.deepcopy(state)
-            sim_pending = list(pending_choices)
-            sim_choice = copy.deepcopy(choice)
-            new_choices = sim_choice.resolve(sim, sim_choice, action) or []
-            sim_pending = list(new_choices) + sim_pending
-            score = minimax(sim, sim_pending, next_depth, alpha, beta, ctx)
-            value = min(value, score)
+        for i, action in enumerate(action_order):
+            if i == 0 or not ctx.pvs:
+                score = search_action(state, choice, action, pending_choices, next_depth, alpha, beta, ctx)
+            else:
+                score = search_action(state, choice, action, pending_choices, next_depth, beta - NULL_WINDOW, beta, ctx)
+                if alpha < score < beta:
+                    ctx.researches += 1
+                    score = search_action(state, choice, action, pending_choices, next_depth, alpha, beta, ctx)
+            if score < value:
+                value = score
+                best_action = action
             beta = min(beta, value)
             if alpha >= beta:
                 break
-        return value
+
+    if alpha >= beta and not ctx.time_up:
+        ctx.cutoffs += 1
+        if best_action == action_order[0]:
+            ctx.first_move_cutoffs += 1
+        if ctx.ordering:
+            record_cutoff(state, choice, actions[best_action], depth, ply, ctx)
+
+    if table is not None and not ctx.time_up:
+        if value <= original_alpha:
+            bound = UPPER
+        elif value >= original_beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        table.store(key, value, depth, bound, best_action)
+    return value
 
 
 def evaluate_heuristic(state: Game_State, player_index: int) -> float:
     """Estimate how good a non-finished position is."""
-    my_score = compute_player_score(state, player_index)
-    opp_score = compute_player_score(state, 1 - player_index)
+    my_score = player_score(state, player_index)
+    opp_score = player_score(state, 1 - player_index)
 
     score = float(my_score - opp_score)
 
@@ -162,8 +378,8 @@ def evaluate_heuristic(state: Game_State, player_index: int) -> float:
 
 def evaluate(state: Game_State, player_index: int) -> float:
     """Evaluate a finished game. Returns +1000 for win, -1000 for loss."""
-    my_score = compute_player_score(state, player_index)
-    opp_score = compute_player_score(state, 1 - player_index)
+    my_score = player_score(state, player_index)
+    opp_score = player_score(state, 1 - player_index)
     diff = my_score - opp_score
     if diff > 0:
         score = 1000.0
@@ -1,23 +1,99 @@
 from __future__ import annotations
 from typing import Optional
-from gods.models import Game_State, Choice
+from gods.models import Game_State, Choice, clone_choice, invalidate_caches, spawn_seed, has_equivalent_cards
 from gods.agents.minimax_search import Search_Context, minimax_search
-import copy
+from gods.agents.transposition import Transposition_Table
+from gods.agents.agent import Ponderable_Agent, worker_context
+import contextlib
+import math
+import queue
 import time
 import random
 
+MIN_SAMPLES = 4  # samples before the sign test can stop the search
+CONFIDENCE_Z = 1.96  # normal quantile of the sign test
+CONTESTED_MARGIN = 1.0  # a sample whose two best scores are this close is searched again
+RESEARCH_DEPTH = 1  # depth above max_depth allowed to those searches
+RESEARCH_TIME = 2.0  # time of such a search, in times the time of a sample
 
-class Agent_Minimax_Stochastic:
-    def __init__(self, max_depth: int = 5, time_limit: float = 10.0, num_samples: int = 20):
+
+def _search_task(task: tuple) -> tuple[list[float], int, int]:
+    # one sample, searched here or in a worker process, see Agent_Minimax_Stochastic._search_samples
+    agent, state, choice, actions, seed, time_limit, max_depth = task
+    return agent._search_sample(state, choice, actions, seed, time_limit, max_depth)
+
+
+def vote(scores: list[float]) -> int:
+    return max(range(len(scores)), key=lambda a: scores[a])
+
+
+def vote_decided(results: list[list[float]], samples_left: int) -> bool:
+    """Whether more samples are unlikely to change the vote: the leader is ahead
+    by more than the samples left, or, after MIN_SAMPLES samples, its lead over
+    the runner-up is above CONFIDENCE_Z standard deviations of a sign test
+    between the two. Only votes count: under alpha-beta the scores of the
+    actions other than the best of a sample are upper bounds, not values."""
+    votes = [0] * len(results[0])
+    for scores in results:
+        votes[vote(scores)] += 1
+    ordered = sorted(votes, reverse=True)
+    if len(ordered) < 2 or ordered[0] > ordered[1] + samples_left:
+        return True
+    if len(results) < MIN_SAMPLES:
+        return False
+    first, second = ordered[:2]
+    return first - second > CONFIDENCE_Z * math.sqrt(first + second)
+
+
+def contested(results: list[tuple[list[float], int, int]]) -> list[int]:
+    """Indices of the results whose two best scores are at most CONTESTED_MARGIN
+    apart, closest first. Results that found a won or lost game are decided.
+    Scores other than the best are upper bounds: a gap of 0 means the search
+    could not tell the two actions apart."""
+    gaps = []
+    for index, (scores, _, _) in enumerate(results):
+        if len(scores) < 2:
+            continue
+        first, second = sorted(scores, reverse=True)[:2]
+        if abs(first) < 900 and first - second <= CONTESTED_MARGIN:
+            gaps.append((first - second, index))
+    return [index for _, index in sorted(gaps)]
+
+
+class Agent_Minimax_Stochastic(Ponderable_Agent):
+    def __init__(
+        self,
+        max_depth: int = 5,
+        time_limit: float = 10.0,
+        num_samples: int = 20,
+        table_mb: float = 16.0,
+        workers: int = 1,
+        adaptive: bool = True,
+        collapse: Optional[bool] = None,
+    ):
         self.max_depth = max_depth
         self.time_limit = time_limit
         self.num_samples = num_samples
+        self.workers = workers  # processes the samples are spread over
+        self.adaptive = adaptive  # stop sampling once the vote is decided, see vote_decided
+        self.collapse = collapse  # as in Agent_Minimax
+        self.samples_saved = 0  # samples skipped by the last search
+        self.time_saved = 0.0  # seconds left when the last search stopped sampling
+        self.samples_deepened = 0  # contested samples searched deeper with that time
+        self.rng = random.Random()
         self.player_index: Optional[int] = None
+        self.sample_depths: list[int] = []  # depth reached by each sample of the last search
+        # Samples of the next decision searched beforehand (see ponder_search),
+        # counted by the next search as its own
+        self.prior: list[tuple[list[float], int, int]] = []
+        # Emptied before each sample: the sampled seed is part of every key, so
+        # samples never share entries. With workers, each process has its own copy.
+        self.table = Transposition_Table(table_mb) if table_mb > 0 else None
 
     def message(self, msg: str):
         pass
 
-    def _sample_state(self, state: Game_State, player_index: int) -> Game_State:
+    def _sample_state(self, state: Game_State, player_index: int, rng: random.Random) -> Game_State:
         """Create a sampled state by shuffling hidden information.
 
         The agent cannot see:
@@ -25,20 +101,23 @@ class Agent_Minimax_Stochastic:
         - Opponent's deck order
         - Agent's own deck order
         """
-        sampled = copy.deepcopy(state)
+        sampled = state.clone()
 
         # Shuffle opponent's hidden cards (hand + deck)
         opp_index = 1 - player_index
         opp = sampled.players[opp_index]
         hand_size = len(opp.hand)
         hidden_cards = opp.hand + opp.deck
-        random.shuffle(hidden_cards)
+        rng.shuffle(hidden_cards)
         opp.hand = hidden_cards[:hand_size]
         opp.deck = hidden_cards[hand_size:]
 
         # Shuffle agent's own deck (hand is known, deck order is not)
         me = sampled.players[player_index]
-        random.shuffle(me.deck)
+        rng.shuffle(me.deck)
+        sampled.seed = spawn_seed(rng)
+
+        invalidate_caches(sampled)
 
         return sampled
 
@@ -55,6 +134,19 @@ class Agent_Minimax_Stochastic:
         print(f"selected: {actions[selected]}")
         return selected
 
+    def ponder_rounds(self) -> int:
+        return self.num_samples
+
+    def ponder_search(self, state: Game_State, choice: Choice, actions: list, seed: int) -> tuple[list[float], int, int]:
+        """One sample of a decision to come, drawn from seed and searched with its
+        share of the time limit, for prior (see gods.agents.ponder)."""
+        self.player_index = choice.player_index
+        return self._search_sample(state, choice, actions, seed, self.time_limit / self.num_samples, self.max_depth)
+
+    def use_pondered(self, results: list, actions: list) -> int:
+        self.prior = [sample for sample in results if len(sample[0]) == len(actions)]
+        return len(self.prior)
+
     def _search(self, state: Game_State, choice: Choice, actions: list) -> int:
         """Stochastic minimax with root sampling.
 
@@ -63,38 +155,132 @@ class Agent_Minimax_Stochastic:
         - Agent's own deck is shuffled
 
         For each sample, runs iterative deepening alpha-beta search.
-        Returns the action with the highest average score across samples.
+        Each sample gets an equal share of the time left, so time not used by
+        a sample goes to the next ones; with workers, the samples are spread
+        over worker processes that each have the whole time limit for their
+        share. When adaptive, sampling stops as soon as the vote is decided,
+        and the time left goes to searching the closest contested samples
+        again, each RESEARCH_TIME times longer (see contested). Samples in
+        prior are not searched again, and neither is their share of the time.
+        Returns the action with the most votes across samples.
         """
         num_actions = len(actions)
         total_scores: list[float] = [0.0] * num_actions
         votes: list[int] = [0] * num_actions
-        time_per_sample = self.time_limit / self.num_samples
         overall_start = time.time()
 
-        print(f"started: {choice.type} ({self.num_samples} samples)")
+        results, self.prior = self.prior[:self.num_samples], []
+        print(f"started: {choice.type} ({self.num_samples} samples, {len(results)} pondered)")
+        if self.table is not None:
+            self.table.new_search()
 
-        for _ in range(self.num_samples):
-            sampled_state = self._sample_state(state, self.player_index)  # type: ignore[arg-type]
+        # each sample is drawn from its own seed, so that it can be searched again
+        num_left = self.num_samples - len(results)
+        seeds = [self.rng.randrange(2**32) for _ in range(num_left)]
+        if self.adaptive and results and vote_decided([scores for scores, _, _ in results], num_left):
+            seeds = []
+        deadline = overall_start + self.time_limit * num_left / self.num_samples
+        self.samples_deepened = 0
+        workers = max(1, min(self.workers, len(seeds)))
 
-            ctx = Search_Context(
-                player_index=self.player_index,  # type: ignore[arg-type]
-                start_time=time.time(),
-                time_limit=time_per_sample,
-            )
-            scores = minimax_search(sampled_state, choice, actions, self.max_depth, ctx)
-            best_action = max(range(num_actions), key=lambda a: scores[a])
-            votes[best_action] += 1
+        def decided(found: list) -> bool:
+            done = [scores for scores, _, _ in results + found]
+            return self.adaptive and vote_decided(done, self.num_samples - len(done))
 
+        with worker_context().Pool(workers) if workers > 1 else contextlib.nullcontext() as pool:
+            results += self._search_samples(state, choice, actions, seeds, self.max_depth, deadline, pool, workers, decided)
+            self.time_saved = max(0.0, deadline - time.time())
+            if self.adaptive:
+                # a search of a sample again replaces its result only if it went deeper
+                todo = contested(results)[:self._research_count(workers)]
+                todo_seeds = [results[index][2] for index in todo]
+                deeper = self._search_samples(
+                    state, choice, actions, todo_seeds, self.max_depth + RESEARCH_DEPTH, deadline, pool, workers
+                )
+                for index, result in zip(todo, deeper):
+                    if result[1] > results[index][1]:
+                        results[index] = result
+                        self.samples_deepened += 1
+        self.samples_saved = self.num_samples - len(results)
+
+        for scores, _, _ in results:
+            votes[vote(scores)] += 1
 
             for i, score in enumerate(scores):
                 total_scores[i] += score
+        self.sample_depths = [depth for _, depth, _ in results]
 
         best_action = max(range(num_actions), key=lambda a: votes[a])
         elapsed = time.time() - overall_start
-        avg_score = total_scores[best_action] / self.num_samples
+        avg_score = total_scores[best_action] / len(results)
+        avg_depth = sum(self.sample_depths) / len(self.sample_depths)
         print(
             f"  result: action={actions[best_action]} "
-            f"avg_score={avg_score:.2f} time={elapsed:.2f}s"
+            f"avg_score={avg_score:.2f} depth={avg_depth:.1f} time={elapsed:.2f}s "
+            f"samples={len(results)}/{self.num_samples} saved={self.time_saved:.2f}s "
+            f"deepened={self.samples_deepened}"
         )
 
         return best_action
+
+    def _search_samples(
+        self, state: Game_State, choice: Choice, actions: list, seeds: list[int], max_depth: int,
+        deadline: float, pool=None, workers: int = 1, decided=None,
+    ) -> list[tuple[list[float], int, int]]:
+        """Search the samples drawn from seeds, in this process without pool,
+        otherwise workers at a time in its processes. Each starts with its
+        share of the time left to deadline, per worker, so time not used by a
+        sample goes to the next ones. Once decided(results so far) is true,
+        the samples being searched finish and the others are skipped. Returns
+        the results in the order of seeds."""
+        found: dict[int, tuple[list[float], int, int]] = {}
+        finished: queue.Queue = queue.Queue()  # (index, result or error) from the pool
+        started = 0
+        while True:
+            stopped = decided is not None and found and decided(list(found.values()))
+            if started < len(seeds) and not stopped and started - len(found) < workers:
+                rounds_left = -(-(len(seeds) - started) // workers)
+                time_limit = max(0.0, deadline - time.time()) / rounds_left
+                task = (self, state, choice, actions, seeds[started], time_limit, max_depth)
+                if pool is None:
+                    found[started] = _search_task(task)
+                else:
+                    pool.apply_async(
+                        _search_task, (task,),
+                        callback=lambda result, index=started: finished.put((index, result)),
+                        error_callback=lambda error: finished.put((-1, error)),
+                    )
+                started += 1
+            elif started > len(found):
+                index, result = finished.get()
+                if index == -1:
+                    raise result
+                found[index] = result
+            else:
+                break
+        return [found[index] for index in sorted(found)]
+
+    def _search_sample(
+        self, state: Game_State, choice: Choice, actions: list, seed: int, time_limit: float, max_depth: int
+    ) -> tuple[list[float], int, int]:
+        """Search the sample drawn from seed, returns the scores, the depth
+        reached and the seed."""
+        sampled_state = self._sample_state(state, self.player_index, random.Random(seed))  # type: ignore[arg-type]
+        sampled_choice = clone_choice(choice)
+        if self.table is not None:
+            self.table.clear()
+
+        ctx = Search_Context(
+            player_index=self.player_index,  # type: ignore[arg-type]
+            start_time=time.time(),
+            time_limit=time_limit,
+            table=self.table,
+            collapse=has_equivalent_cards(state) if self.collapse is None else self.collapse,
+        )
+        scores = minimax_search(sampled_state, sampled_choice, actions, max_depth, ctx)
+        return scores, ctx.depth_reached, seed
+
+    def _research_count(self, workers: int) -> int:
+        # contested samples that the time left can search RESEARCH_TIME times longer
+        sample_time = self.time_limit / -(-self.num_samples // workers)
+        return workers * int(self.time_saved / (RESEARCH_TIME * sample_time))
@@ -0,0 +1,172 @@
+from __future__ import annotations
+from typing import Optional
+from gods.models import Game_State, Choice, clone_choice, get_actions, state_hash, choice_key, action_key
+from gods.game import get_next_choice, player_score
+from gods.agents.agent import Agent, Ponderable_Agent, worker_context
+from gods.agents.ismcts import determinize
+import math
+import os
+import random
+import sys
+
+PONDER_NICENESS = 10  # the pondering process yields the CPU to the UI and the game
+PONDER_DEPTH = 2  # decisions of the other player followed to reach one of ours
+PONDER_VIEWS = 8  # determinizations that rank those decisions, see likely_paths
+
+
+def reachable_decisions(
+    state: Game_State, choice: Choice, pending: list[Choice], player_index: int, depth: int, path: tuple = ()
+) -> list[tuple[tuple, Game_State, Choice, list[Choice]]]:
+    """Decisions of player_index reached through at most depth decisions of the
+    other player, as (action_key of the actions on the way, state, choice,
+    pending choices)."""
+    found = []
+    for action_index, action in enumerate(get_actions(state, choice)):
+        sim_state = state.clone()
+        sim_choice = clone_choice(choice)
+        sim_choices = [clone_choice(c) for c in pending]
+        sim_path = path + (action_key(state, action),)
+        sim_choices.extend(sim_choice.resolve(sim_state, action_index))
+        next_choice = get_next_choice(sim_state, sim_choices)
+        if next_choice is None:
+            continue
+        if next_choice.player_index == player_index:
+            found.append((sim_path, sim_state, next_choice, sim_choices))
+        elif depth > 1:
+            found.extend(reachable_decisions(sim_state, next_choice, sim_choices, player_index, depth - 1, sim_path))
+    return found
+
+
+def likely_paths(
+    state: Game_State, choice: Choice, pending: list[Choice], player_index: int, depth: int, rng: random.Random
+) -> dict[tuple, tuple[int, float]]:
+    """How likely the other player is to take each path of reachable_decisions,
+    as seen by player_index: over PONDER_VIEWS determinizations of their hidden
+    cards, the number of views in which it leads them the most in score, and
+    its mean lead over the views that have it."""
+    votes: dict[tuple, int] = {}
+    leads: dict[tuple, list[int]] = {}
+    for _ in range(PONDER_VIEWS):
+        view = determinize(state, player_index, rng)
+        best_path, best_lead = None, None
+        for path, sim_state, _, _ in reachable_decisions(view, clone_choice(choice), pending, player_index, depth):
+            lead = player_score(sim_state, 1 - player_index) - player_score(sim_state, player_index)
+            leads.setdefault(path, []).append(lead)
+            if best_lead is None or lead > best_lead:
+                best_path, best_lead = path, lead
+        if best_path is not None:
+            votes[best_path] = votes.get(best_path, 0) + 1
+    return {path: (votes.get(path, 0), sum(values) / len(values)) for path, values in leads.items()}
+
+
+def ponder_key(state: Game_State, choice: Choice, pending: list[Choice], player_index: int) -> tuple:
+    """The parts of transposition.position_key, not hashed: the pondering
+    process hashes strings with another seed."""
+    return (state_hash(state), choice_key(choice), tuple(choice_key(c) for c in pending), player_index)
+
+
+def _ponder_worker(
+    agent: Ponderable_Agent, state: Game_State, choice: Choice, pending: list[Choice], player_index: int, seed: int, connection
+) -> None:
+    # runs in its own process: run the searches of the decisions player_index
+    # may face next, one of each per round so that whichever comes has some,
+    # the likely plays of the other player first (see likely_paths), and send
+    # back (position key, result) for each
+    os.nice(PONDER_NICENESS)
+    sys.stdout = open(os.devnull, "w")
+    rng = random.Random(seed)
+    decisions = reachable_decisions(state, choice, pending, player_index, PONDER_DEPTH)
+    likely = likely_paths(state, choice, pending, player_index, PONDER_DEPTH, rng)
+    decisions.sort(key=lambda d: likely.get(d[0], (0, -math.inf)), reverse=True)
+    searches = [
+        (ponder_key(sim_state, next_choice, next_pending, player_index), sim_state, next_choice, get_actions(sim_state, next_choice))
+        for _, sim_state, next_choice, next_pending in decisions
+    ]
+    searches = [search for search in searches if len(search[3]) > 1]
+    for _ in range(agent.ponder_rounds()):
+        for key, sim_state, next_choice, next_actions in searches:
+            result = agent.ponder_search(sim_state, next_choice, next_actions, rng.randrange(2**32))
+            try:
+                connection.send((key, result))
+            except BrokenPipeError:  # stopped meanwhile
+                return
+
+
+class Agent_Ponder(Agent):
+    """Wraps a Ponderable_Agent to search while the other player is deciding.
+
+    Agent_Duel calls ponder with the other player's decision. The wrapped agent
+    then runs, in a low priority process so the UI keeps its frame rate, the
+    searches of the decisions it would face after each of their actions (see
+    Ponderable_Agent.ponder_search). When the real decision arrives, the
+    results found for the same position, pending choices included, are passed
+    to use_pondered before choose_action; Agent_Minimax_Stochastic then
+    searches only the samples still missing, with their share of the time
+    limit, and answers right away when none are. game_loop passes the pending
+    choices to observe_pending; without them the agent neither ponders nor
+    matches results.
+    """
+    def __init__(self, agent: Ponderable_Agent):
+        self.agent = agent
+        self.player_index: Optional[int] = None  # set by the first choose_action
+        self.results: dict[tuple, list] = {}  # ponder_key -> results of ponder_search
+        self.pending: Optional[list[Choice]] = None  # queued after the decision at hand
+        self.process = None
+        self.connection = None
+        self.hits = 0  # decisions with pondered results
+        self.misses = 0
+        self.samples_pondered = 0  # results of those decisions searched beforehand
+
+    def message(self, msg: str):
+        self.agent.message(msg)
+
+    def observe_pending(self, choices: list[Choice]) -> None:
+        self.pending = [clone_choice(c) for c in choices]
+
+    def ponder(self, state: Game_State, choice: Choice, actions: list) -> None:
+        self.stop()
+        pending, self.pending = self.pending, None
+        if self.player_index is None or pending is None:
+            return
+        ctx = worker_context()
+        self.connection, child_connection = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(
+            target=_ponder_worker,
+            args=(self.agent, state, choice, pending, self.player_index, self.agent.rng.randrange(2**32), child_connection),
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+
+    def stop(self) -> None:
+        # collect what the pondering process found so far and stop it
+        if self.process is None:
+            return
+        while self.connection.poll():
+            try:
+                key, result = self.connection.recv()
+            except EOFError:
+                break
+            self.results.setdefault(key, []).append(result)
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def choose_action(self, state: Game_State, choice: Choice, actions: list) -> int:
+        self.player_index = choice.player_index
+        self.stop()
+        pending, self.pending = self.pending, None
+        results = []
+        if pending is not None:
+            results = self.results.get(ponder_key(state, choice, pending, choice.player_index), [])
+        self.results = {}
+        used = self.agent.use_pondered(results, actions)
+        if used:
+            self.hits += 1
+            self.samples_pondered += used
+            print(f"ponder hit: {used} results")
+        else:
+            self.misses += 1
+        return self.agent.choose_action(state, choice, actions)
@@ -1,12 +1,13 @@
 from gods.models import Game_State, Choice
+from gods.agents.agent import Agent
 import random
 
-class Agent_Random:
+class Agent_Random(Agent):
     def __init__(self):
-        pass
+        self.rng = random.Random()
 
     def message(self, msg: str):
         pass  # Silent agent
 
     def choose_action(self, state: Game_State, choice: Choice, actions: list) -> int:
-        return random.randint(0, len(actions) - 1)
+        return self.rng.randrange(len(actions))
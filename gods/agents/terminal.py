@@ -1,6 +1,7 @@
 from gods.models import Game_State, Choice
+from gods.agents.agent import Agent
 
-class Agent_Terminal:
+class Agent_Terminal(Agent):
     def __init__(self):
         pass
 
@@ -0,0 +1,82 @@
+from __future__ import annotations
+from typing import Optional
+from gods.models import Game_State, Choice, state_hash, choice_key
+
+# Bound types of a stored value
+EXACT = 0
+LOWER = 1  # the search failed high, the true value is >= value
+UPPER = 2  # the search failed low, the true value is <= value
+
+ENTRY_BYTES = 160  # rough size of one stored entry (tuple + ints + floats)
+
+
+def position_key(state: Game_State, choice: Choice, pending_choices: list[Choice], player_index: int) -> int:
+    """Key of a search node: the state, the choice to make, the queued choices and
+    the player whose point of view the values are computed from."""
+    pending = tuple(choice_key(c) for c in pending_choices)
+    return hash((state_hash(state), choice_key(choice), pending, player_index))
+
+
+class Transposition_Table:
+    """Fixed-size table of search results, indexed by position_key.
+
+    Each bucket has two slots. The first keeps the deepest result of the
+    current search and is only overwritten by results at least as deep, or
+    when its entry comes from an older search. The second always takes the
+    newest result. Entries are (key, value, depth, bound, best_action, age).
+    """
+    def __init__(self, size_mb: float = 16.0):
+        num_buckets = max(1, int(size_mb * 2**20) // (2 * ENTRY_BYTES))
+        self.num_buckets = num_buckets
+        self.slots: list[Optional[tuple]] = [None] * (2 * num_buckets)
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    def __getstate__(self) -> dict:
+        # entries stay in this process: a pickled copy (see gods.agents.ponder)
+        # starts empty and fills its own
+        state = self.__dict__.copy()
+        state["slots"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.slots = [None] * (2 * self.num_buckets)
+
+    def new_search(self) -> None:
+        """Mark entries stored so far as old and reset the statistics."""
+        self.age += 1
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    def clear(self) -> None:
+        """Remove every entry, keeping the statistics."""
+        self.slots = [None] * (2 * self.num_buckets)
+
+    def probe(self, key: int) -> Optional[tuple]:
+        self.probes += 1
+        bucket = 2 * (key % self.num_buckets)
+        for slot in (bucket, bucket + 1):
+            entry = self.slots[slot]
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry
+        return None
+
+    def store(self, key: int, value: float, depth: int, bound: int, best_action: int) -> None:
+        self.stores += 1
+        entry = (key, value, depth, bound, best_action, self.age)
+        bucket = 2 * (key % self.num_buckets)
+        deep = self.slots[bucket]
+        if deep is None or deep[5] != self.age or depth >= deep[2]:
+            self.slots[bucket] = entry
+        else:
+            self.slots[bucket + 1] = entry
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
@@ -0,0 +1,683 @@
+from __future__ import annotations
+import contextlib
+import copy
+import io
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from gods.models import (
+    Game_State, Card, Choice, Card_Id, Card_Type, clone_choice, effective_power, compute_effective_power, get_actions,
+    equivalent_actions, start_journal, compute_hash, Card_Color,
+)
+from gods.compact import encode_state, decode_state, has_wonder_of_color
+from gods.setup import quick_setup, doubled_setup
+from gods.cards import Combinations
+from gods.game import get_next_choice, check_people_conditions, game_loop, rollout, player_score
+from gods.agents.agent import Agent
+from gods.agents.randomized import Agent_Random
+from gods.agents.duel import Agent_Duel
+from gods.agents.mcts import Agent_MCTS
+from gods.agents.mcts_shared import Agent_MCTS_Shared
+from gods.agents.minimax import Agent_Minimax
+from gods.agents.minimax_stochastic import Agent_Minimax_Stochastic
+from gods.agents.ponder import Agent_Ponder
+from gods.agents.ismcts import Agent_ISMCTS
+from gods.agents.minimax_search import Search_Context, minimax_search, equivalent_outcomes
+from gods.agents.transposition import Transposition_Table
+
+
+def sample_positions(num_positions: int, seed: int = 0, setup=quick_setup) -> list[tuple[Game_State, Choice, list[Choice]]]:
+    """Play random games from setup and collect (state, choice, pending) at random decisions."""
+    rng = random.Random(seed)
+    positions = []
+    game_seed = seed
+    while len(positions) < num_positions:
+        state = setup(game_seed)
+        game_seed += 1
+        check_people_conditions(state)
+        choices: list[Choice] = []
+        stop_after = rng.randint(2, 30)
+        for _ in range(stop_after):
+            choice = get_next_choice(state, choices)
+            if choice is None:
+                break
+            actions = choice.generate_actions(state)
+            choices.extend(choice.resolve(state, rng.randrange(len(actions))))
+        choice = get_next_choice(state, choices)
+        if choice is not None:
+            positions.append((state, choice, choices))
+    return positions
+
+
+def time_per_call(fn, repeats: int) -> float:
+    """Average seconds per call of fn()."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_clone(num_positions: int = 20, repeats: int = 200) -> None:
+    """Compare copy.deepcopy against Game_State.clone + clone_choice."""
+    positions = sample_positions(num_positions)
+
+    def with_deepcopy():
+        for state, choice, pending in positions:
+            copy.deepcopy(state)
+            copy.deepcopy(choice)
+
+    def with_clone():
+        for state, choice, pending in positions:
+            state.clone()
+            clone_choice(choice)
+            [clone_choice(c) for c in pending]
+
+    deepcopy_time = time_per_call(with_deepcopy, repeats) / num_positions
+    clone_time = time_per_call(with_clone, repeats) / num_positions
+    print("clone (state + choice):")
+    print(f"  deepcopy: {deepcopy_time * 1e6:8.1f} us")
+    print(f"  clone:    {clone_time * 1e6:8.1f} us  ({deepcopy_time / clone_time:.1f}x)")
+
+
+@dataclass
+class Unshared_Card:
+    """Layout of a card before the static fields moved to a shared Card_Definition:
+    a plain dataclass with every field in its own __dict__."""
+    name: str
+    card_type: Card_Type
+    power: int
+    color: Card_Color
+    effect: str
+    destroyed: bool = False
+    counters: int = 0
+    owner: Optional[int] = None
+    id: int = -1
+
+    @staticmethod
+    def of(card: Card) -> Unshared_Card:
+        return Unshared_Card(
+            card.name, card.card_type, card.power, card.color, card.effect, card.destroyed, card.counters, card.owner, card.id
+        )
+
+    def clone(self) -> Unshared_Card:
+        # as Card.clone did then
+        card = object.__new__(type(self))
+        card.__dict__.update(self.__dict__)
+        return card
+
+
+def benchmark_state_size(num_positions: int = 20, copies: int = 50) -> None:
+    """Memory allocated by Game_State.clone, per state and per card, measured
+    with tracemalloc. Card definitions are shared, so they do not count. The
+    unshared layout is measured on clones of the same cards as Unshared_Card,
+    and a state in that layout differs by its cards only."""
+    states = [state for state, choice, pending in sample_positions(num_positions)]
+    cards = [card for state in states for card in state.all_cards()]
+
+    def bytes_per_copy(make) -> float:
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        made = [make() for _ in range(copies)]
+        allocated = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        return allocated / sum(len(batch) for batch in made)
+
+    state_bytes = bytes_per_copy(lambda: [state.clone() for state in states])
+    card_bytes = bytes_per_copy(lambda: [card.clone() for card in cards])
+    unshared = [Unshared_Card.of(card) for card in cards]
+    unshared_bytes = bytes_per_copy(lambda: [card.clone() for card in unshared])
+    cards_per_state = len(cards) / len(states)
+    unshared_state_bytes = state_bytes + cards_per_state * (unshared_bytes - card_bytes)
+    print(f"memory of a clone, {cards_per_state:.0f} cards per state:")
+    print(f"  state: {unshared_state_bytes:7.0f} bytes unshared, {state_bytes:7.0f} bytes with definitions")
+    print(f"  card:  {unshared_bytes:7.0f} bytes unshared, {card_bytes:7.0f} bytes with definitions")
+
+
+def benchmark_combinations(num_items: int = 20, powers: tuple = (2, 5, 10), repeats: int = 3) -> None:
+    """Time and memory of a choose-cards decision over num_items cards with up to
+    power of them (generating the actions and taking one at random), with the
+    combinations in a list against Combinations."""
+    items = [Card_Id(area="wonders", card_index=i, owner_index=i % 2) for i in range(num_items)]
+    rng = random.Random(0)
+    print(f"choose-cards decision, {num_items} cards:")
+    for power in powers:
+        results = []
+        for make in (lambda: list(Combinations(items, power, up_to=True)), lambda: Combinations(items, power, up_to=True)):
+            def decide():
+                actions = make()
+                return actions[rng.randrange(len(actions))]
+            tracemalloc.start()
+            decide()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append((time_per_call(decide, repeats), peak))
+        (list_time, list_peak), (lazy_time, lazy_peak) = results
+        print(f"  up to {power:2d} ({len(Combinations(items, power, up_to=True))} actions): "
+              f"list {list_time * 1e3:9.2f} ms {list_peak / 2**20:7.1f} MB, "
+              f"lazy {lazy_time * 1e3:6.3f} ms {lazy_peak / 2**10:5.1f} KB")
+
+
+def benchmark_transposition(num_positions: int = 12, depth: int = 6) -> None:
+    """Fixed-depth minimax on seeded positions, with and without a transposition table."""
+    positions = sample_positions(num_positions, seed=11)
+    print(f"minimax depth {depth}, {num_positions} positions:")
+    for use_table in [False, True]:
+        nodes = 0
+        probes = hits = cutoffs = 0
+        start = time.perf_counter()
+        for state, choice, pending in positions:
+            table = Transposition_Table() if use_table else None
+            ctx = Search_Context(
+                player_index=choice.player_index,
+                start_time=time.time(),
+                time_limit=float("inf"),
+                table=table,
+                macro_actions=False,
+            )
+            minimax_search(state, choice, choice.generate_actions(state), depth, ctx)
+            nodes += ctx.total_nodes
+            if table is not None:
+                probes += table.probes
+                hits += table.hits
+                cutoffs += table.cutoffs
+        elapsed = time.perf_counter() - start
+        label = "table:   " if use_table else "no table:"
+        line = f"  {label} nodes={nodes:7d} time={elapsed:.2f}s"
+        if use_table:
+            line += f" hit_rate={hits / max(probes, 1):.2f} cutoffs={cutoffs}"
+        print(line)
+
+
+def benchmark_move_ordering(num_positions: int = 12, depth: int = 6) -> None:
+    """Fixed-depth minimax on seeded positions, interior moves in index order
+    against killer and history ordering, without a transposition table."""
+    positions = sample_positions(num_positions, seed=11)
+    print(f"minimax depth {depth}, {num_positions} positions, move ordering:")
+    for ordering in [False, True]:
+        nodes = cutoffs = first_move_cutoffs = 0
+        start = time.perf_counter()
+        for state, choice, pending in positions:
+            ctx = Search_Context(
+                player_index=choice.player_index,
+                start_time=time.time(),
+                time_limit=float("inf"),
+                ordering=ordering,
+                macro_actions=False,
+            )
+            minimax_search(state, choice, choice.generate_actions(state), depth, ctx)
+            nodes += ctx.total_nodes
+            cutoffs += ctx.cutoffs
+            first_move_cutoffs += ctx.first_move_cutoffs
+        elapsed = time.perf_counter() - start
+        label = "killers+history:" if ordering else "index order:    "
+        print(f"  {label} nodes={nodes:7d} cutoffs={cutoffs:6d} "
+              f"first-move cutoffs={first_move_cutoffs / max(cutoffs, 1):.0%} time={elapsed:.2f}s")
+
+
+def benchmark_pvs(num_positions: int = 12, depth: int = 9, time_limit: float = 1.0) -> None:
+    """Plain alpha-beta against principal variation search with aspiration windows:
+    nodes at a fixed depth, and depth completed within a time limit."""
+    positions = sample_positions(num_positions, seed=11)
+    print(f"minimax, {num_positions} positions, principal variation search:")
+    for label, pvs, window in [("alpha-beta:", False, 0.0), ("pvs+aspiration:", True, 5.0)]:
+        nodes = researches = failures = reached = 0
+        for limit, max_depth in [(float("inf"), depth), (time_limit, 50)]:
+            for state, choice, pending in positions:
+                ctx = Search_Context(
+                    player_index=choice.player_index,
+                    start_time=time.time(),
+                    time_limit=limit,
+                    table=Transposition_Table(),
+                    pvs=pvs,
+                    aspiration_window=window,
+                    macro_actions=False,
+                )
+                minimax_search(state, choice, choice.generate_actions(state), max_depth, ctx)
+                if limit == float("inf"):
+                    nodes += ctx.total_nodes
+                    researches += ctx.researches
+                    failures += ctx.aspiration_failures
+                else:
+                    reached += ctx.depth_reached
+        print(f"  {label:16s} depth {depth}: nodes={nodes:7d} re-searches={researches} aspiration fails={failures}; "
+              f"{time_limit}s: mean depth {reached / num_positions:.1f}")
+
+
+def benchmark_macro_actions(num_positions: int = 12, turns: int = 4, time_limit: float = 0.3, games: int = 6) -> None:
+    """Minimax over single choices against whole turns: nodes to search the same
+    number of turns (a turn is about two choices), depth within a time limit,
+    and a match at the same time per decision."""
+    positions = sample_positions(num_positions, seed=11)
+    print(f"minimax, {num_positions} positions, macro actions:")
+    for label, macro, per_turn in [("choices:", False, 2), ("turns:", True, 1)]:
+        nodes = []
+        for depth in range(2, turns + 1):
+            total = 0
+            for state, choice, pending in positions:
+                ctx = Search_Context(player_index=choice.player_index, start_time=time.time(),
+                                     time_limit=float("inf"), macro_actions=macro)
+                minimax_search(state, choice, choice.generate_actions(state), depth * per_turn, ctx)
+                total += ctx.total_nodes
+            nodes.append(f"{depth} turns={total}")
+        reached = 0
+        for state, choice, pending in positions:
+            ctx = Search_Context(player_index=choice.player_index, start_time=time.time(),
+                                 time_limit=time_limit, macro_actions=macro)
+            minimax_search(state, choice, choice.generate_actions(state), 50, ctx)
+            reached += ctx.depth_reached / per_turn
+        print(f"  {label:9s} nodes {', '.join(nodes)}; {time_limit}s: mean depth {reached / num_positions:.1f} turns")
+    win_rate = play_match(
+        Agent_Minimax(max_depth=50, time_limit=time_limit, macro_actions=True),
+        Agent_Minimax(max_depth=50, time_limit=time_limit, macro_actions=False),
+        games,
+    )
+    print(f"  turns against choices at {time_limit}s per decision: {win_rate:.0%} won")
+
+
+def branching_factors(setup, games: int) -> dict[str, list[int]]:
+    """Over random games from setup, by choice type: [choices, actions,
+    classes by equivalence_key, classes by outcome]."""
+    rng = random.Random(0)
+    stats: dict[str, list[int]] = {}
+    for game_seed in range(games):
+        state = setup(game_seed)
+        check_people_conditions(state)
+        start_journal(state)
+        choices: list[Choice] = []
+        choice = get_next_choice(state, choices)
+        while choice is not None:
+            actions = get_actions(state, choice)
+            same = equivalent_actions(state, actions)
+            distinct = [a for a in same if same[a] == a]
+            same_outcome = equivalent_outcomes(state, choice, distinct)
+            counts = stats.setdefault(choice.type, [0, 0, 0, 0])
+            counts[0] += 1
+            counts[1] += len(actions)
+            counts[2] += len(distinct)
+            counts[3] += sum(1 for a in same_outcome if same_outcome[a] == a)
+            choices.extend(choice.resolve(state, rng.randrange(len(actions))))
+            choice = get_next_choice(state, choices)
+    return stats
+
+
+def benchmark_action_collapsing(games: int = 20, num_positions: int = 12, depth: int = 6) -> None:
+    """Mean actions per choice before and after collapsing equivalent ones, with
+    the decks of quick_setup and with two copies of each card, and minimax
+    nodes and time with each kind of collapsing."""
+    for label, setup in [("quick_setup", quick_setup), ("doubled decks", doubled_setup)]:
+        print(f"branching factor, {games} random games, {label}: actions / by key / by outcome")
+        for choice_type, (num, actions, by_key, by_outcome) in branching_factors(setup, games).items():
+            print(f"  {choice_type:13s} {num:4d} choices: {actions / num:.2f} / {by_key / num:.2f} / {by_outcome / num:.2f}")
+    for label, setup in [("quick_setup", quick_setup), ("doubled decks", doubled_setup)]:
+        positions = sample_positions(num_positions, seed=11, setup=setup)
+        print(f"minimax, {num_positions} positions, {label}, depth {depth} choices:")
+        for collapse_label, collapse, outcomes in [("none:", False, False), ("by key:", True, False), ("by outcome:", True, True)]:
+            nodes = collapsed = 0
+            start = time.perf_counter()
+            for state, choice, pending in positions:
+                ctx = Search_Context(player_index=choice.player_index, start_time=time.time(), time_limit=float("inf"),
+                                     macro_actions=False, collapse=collapse, collapse_outcomes=outcomes)
+                minimax_search(state, choice, choice.generate_actions(state), depth, ctx)
+                nodes += ctx.total_nodes
+                collapsed += ctx.collapsed
+            print(f"  {collapse_label:12s} nodes={nodes:6d} collapsed={collapsed:5d} time={time.perf_counter() - start:.2f}s")
+
+
+def benchmark_power(num_positions: int = 20, frames: int = 100) -> None:
+    """Cost of drawing the power of every card on screen, with the power cache
+    against recomputing every power each time."""
+    positions = sample_positions(num_positions, seed=7)
+
+    def draw_frames(power):
+        for state, choice, pending in positions:
+            cards = state.all_cards()
+            for _ in range(frames):
+                for card in cards:
+                    power(state, card)
+
+    cached = time_per_call(lambda: draw_frames(effective_power), 1) / (num_positions * frames)
+    uncached = time_per_call(lambda: draw_frames(compute_effective_power), 1) / (num_positions * frames)
+    print("powers of all cards, per frame:")
+    print(f"  recomputed: {uncached * 1e6:8.1f} us")
+    print(f"  cached:     {cached * 1e6:8.1f} us  ({uncached / cached:.1f}x)")
+
+
+def benchmark_rollouts(num_positions: int = 20, rollouts: int = 20) -> None:
+    """Random games to the end per second: game_loop with Agent_Random, as MCTS
+    used to simulate (its prints captured), against the rollout kernel, both
+    from the same positions and pending choices."""
+    positions = sample_positions(num_positions, seed=7)
+    agent = Agent_Random()
+    rng = random.Random(0)
+
+    def with_game_loop(state, choices):
+        with contextlib.redirect_stdout(io.StringIO()):
+            game_loop(state, agent, display=None, choices=choices)
+
+    def with_rollout(state, choices):
+        rollout(state, choices, rng=rng)
+
+    def rollouts_per_second(run) -> float:
+        agent.rng.seed(0)
+        start = time.perf_counter()
+        for state, choice, pending in positions:
+            for _ in range(rollouts):
+                sim = state.clone()
+                run(sim, [clone_choice(choice)] + [clone_choice(c) for c in pending])
+        return num_positions * rollouts / (time.perf_counter() - start)
+
+    print("random rollouts from seeded positions (best of 3):")
+    for label, run in [("game_loop:", with_game_loop), ("rollout:  ", with_rollout)]:
+        best = max(rollouts_per_second(run) for _ in range(3))
+        print(f"  {label} {best:7.0f}/s")
+
+
+def benchmark_compact(num_positions: int = 20, repeats: int = 200) -> None:
+    """Cost of encoding, decoding, hashing and a few queries with the bitset
+    encoding of gods/compact.py against Game_State."""
+    positions = sample_positions(num_positions) + sample_positions(num_positions, setup=doubled_setup)
+    states = [state for state, choice, pending in positions]
+    compacts = [encode_state(state) for state in states]
+
+    def per_state(fn) -> float:
+        return time_per_call(fn, repeats) / len(states)
+
+    def uncached_hash():
+        for state in states:
+            compute_hash(state)
+
+    def compact_hash():
+        for compact in compacts:
+            hash(compact)
+
+    def blue_wonder_lists():
+        for state in states:
+            for player in state.players:
+                any(w.color == Card_Color.BLUE for w in player.wonders)
+
+    def blue_wonder_masks():
+        for compact in compacts:
+            for i in range(len(compact.wonders)):
+                has_wonder_of_color(compact, i, Card_Color.BLUE)
+
+    def hand_lookups():
+        for state in states:
+            for card in state.all_cards():
+                state.in_zone(card, "hand", 0)
+
+    def hand_masks():
+        for compact in compacts:
+            hand = compact.hands[0]
+            for card_id in range(len(compact.power)):
+                hand >> card_id & 1
+
+    def clones():
+        for state in states:
+            state.clone()
+
+    def encodes():
+        for state, compact in zip(states, compacts):
+            encode_state(state, compact.universe)
+
+    def decodes():
+        for compact in compacts:
+            decode_state(compact)
+
+    rows = [
+        ("hash", uncached_hash, compact_hash),
+        ("blue wonder", blue_wonder_lists, blue_wonder_masks),
+        ("in hand", hand_lookups, hand_masks),
+        ("copy", clones, encodes),
+    ]
+    print("  per state:      Game_State      compact")
+    for label, objects, ints in rows:
+        before, after = per_state(objects), per_state(ints)
+        print(f"  {label:12s} {before * 1e6:10.2f} us {after * 1e6:9.2f} us  ({before / after:.1f}x)")
+    print(f"  decode:                      {per_state(decodes) * 1e6:9.2f} us")
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    copies = [encode_state(state, compact.universe) for _ in range(50) for state, compact in zip(states, compacts)]
+    compact_bytes = (tracemalloc.get_traced_memory()[0] - start) / len(copies)
+    start = tracemalloc.get_traced_memory()[0]
+    clones = [state.clone() for _ in range(50) for state in states]
+    clone_bytes = (tracemalloc.get_traced_memory()[0] - start) / len(clones)
+    tracemalloc.stop()
+    print(f"  memory       {clone_bytes:10.0f} B  {compact_bytes:9.0f} B")
+
+
+def benchmark_mcts_tree(time_limit: float = 1.0, num_positions: int = 6) -> None:
+    """Iterations, nodes and node size of single-tree MCTS on seeded positions."""
+    positions = sample_positions(num_positions, seed=3)
+    agent = Agent_MCTS(time_limit=time_limit)
+    iterations = nodes = 0
+    start = time.perf_counter()
+    for state, choice, pending in positions:
+        agent.player_index = choice.player_index
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.mcts_search(state, choice, choice.actions)
+        iterations += agent.iterations
+        nodes += agent.tree.num_visited()
+    elapsed = time.perf_counter() - start
+    print(f"mcts, {time_limit}s per decision:")
+    print(f"  {iterations / elapsed:.0f} iterations/s, {nodes / num_positions:.0f} visited nodes per tree, {agent.tree.bytes_per_node()} bytes/node")
+
+
+def benchmark_mcts_reuse(games: int = 2, time_limit: float = 0.3) -> None:
+    """Fraction of each decision's visits kept from the previous tree, over games
+    between two MCTS agents."""
+    fractions = []
+
+    class Recorder(Agent):
+        def __init__(self, agent):
+            self.agent = agent
+
+        def message(self, msg: str):
+            pass
+
+        def observe_pending(self, choices) -> None:
+            self.agent.observe_pending(choices)
+
+        def choose_action(self, state, choice, actions) -> int:
+            index = self.agent.choose_action(state, choice, actions)
+            fractions.append(self.agent.reused_visits / int(self.agent.tree.visits[0]))
+            return index
+
+    play_match(Recorder(Agent_MCTS(time_limit=time_limit)), Agent_MCTS(time_limit=time_limit), games)
+    reused = [f for f in fractions if f > 0]
+    print(f"mcts tree reuse, {time_limit}s per decision, {len(fractions)} decisions:")
+    print(f"  reused a subtree in {len(reused) / len(fractions):.0%}, "
+          f"mean reused visits {sum(fractions) / len(fractions):.0%} (max {max(fractions):.0%})")
+
+
+def benchmark_ponder(think_time: float = 2.0, time_limit: float = 1.0, games: int = 3) -> None:
+    """Response time of Agent_Minimax_Stochastic with and without pondering, against
+    a player that takes think_time for every decision, as a human would."""
+
+    class Slow_Player(Agent):
+        def __init__(self):
+            self.rng = random.Random(0)
+
+        def message(self, msg: str):
+            pass
+
+        def choose_action(self, state, choice, actions) -> int:
+            time.sleep(think_time)
+            return self.rng.randrange(len(actions))
+
+    class Timed(Agent):
+        def __init__(self, agent):
+            self.agent = agent
+            self.times: list[float] = []  # of decisions right after the other player's
+            self.other_moved = False
+
+        def message(self, msg: str):
+            pass
+
+        def observe_pending(self, choices) -> None:
+            self.agent.observe_pending(choices)
+
+        def ponder(self, state, choice, actions) -> None:
+            self.other_moved = True
+            self.agent.ponder(state, choice, actions)
+
+        def choose_action(self, state, choice, actions) -> int:
+            start = time.perf_counter()
+            index = self.agent.choose_action(state, choice, actions)
+            if self.other_moved:
+                self.times.append(time.perf_counter() - start)
+            self.other_moved = False
+            return index
+
+    print(f"response time, {think_time}s to think for the other player, {time_limit}s per search:")
+    for label, pondering in [("searching:", False), ("pondering:", True)]:
+        searcher = Agent_Minimax_Stochastic(max_depth=20, time_limit=time_limit, num_samples=4, table_mb=0)
+        agent = Timed(Agent_Ponder(searcher) if pondering else searcher)
+        for seed in range(games):
+            searcher.rng.seed(seed)
+            state = quick_setup(seed)
+            check_people_conditions(state)
+            with contextlib.redirect_stdout(io.StringIO()):
+                game_loop(state, Agent_Duel(Slow_Player(), agent, False), display=None)
+        line = f"  {label} {sum(agent.times) / len(agent.times):.2f}s mean over {len(agent.times)} replies"
+        if pondering:
+            line += f", {agent.agent.hits} with {agent.agent.samples_pondered} samples pondered"
+        print(line)
+
+
+def benchmark_ismcts(time_limit: float = 0.5, num_positions: int = 6, games: int = 6) -> None:
+    """Iterations per second of ISMCTS against MCTS on the true state, and matches
+    against MCTS and stochastic minimax at the same time per decision."""
+    positions = sample_positions(num_positions, seed=3)
+    print(f"ismcts, {time_limit}s per decision:")
+    for label, agent in [("mcts (true state):", Agent_MCTS(time_limit=time_limit)), ("ismcts:", Agent_ISMCTS(time_limit=time_limit))]:
+        iterations = 0
+        start = time.perf_counter()
+        for state, choice, pending in positions:
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.choose_action(state, choice, choice.actions)
+            iterations += agent.iterations
+        print(f"  {label:19s} {iterations / (time.perf_counter() - start):7.0f} iterations/s")
+    opponents = [
+        ("mcts", Agent_MCTS(time_limit=time_limit)),
+        ("minimax stochastic", Agent_Minimax_Stochastic(time_limit=time_limit, table_mb=0)),
+    ]
+    for label, opponent in opponents:
+        won = play_match(Agent_ISMCTS(time_limit=time_limit), opponent, games)
+        print(f"  ismcts won {won:.0%} of {games} games against {label}")
+
+
+def benchmark_stochastic_workers(workers: int = 4, time_limit: float = 1.0, num_positions: int = 6) -> None:
+    """Stochastic minimax with the samples searched one after another and spread over
+    workers, at the same wall time: depth reached per sample, and how often the
+    decision agrees with a sequential search given 8 times longer."""
+    positions = sample_positions(num_positions, seed=4)
+
+    def decide(agent, state, choice) -> int:
+        agent.rng.seed(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return agent.choose_action(state, choice, choice.actions)
+
+    def searcher(limit: float, num_workers: int) -> Agent_Minimax_Stochastic:
+        return Agent_Minimax_Stochastic(max_depth=20, time_limit=limit, num_samples=8, table_mb=0, workers=num_workers)
+
+    references = [decide(searcher(8 * time_limit, 1), state, choice) for state, choice, pending in positions]
+    print(f"stochastic minimax, 8 samples, {time_limit}s per decision:")
+    for label, num_workers in [("sequential:", 1), (f"{workers} workers:", workers)]:
+        agent = searcher(time_limit, num_workers)
+        agree = depth = saved = 0
+        for (state, choice, pending), reference in zip(positions, references):
+            agree += decide(agent, state, choice) == reference
+            depth += sum(agent.sample_depths) / len(agent.sample_depths)
+            saved += agent.time_saved
+        print(f"  {label:12s} depth {depth / num_positions:.1f}, agrees with the long search {agree}/{num_positions}, "
+              f"{saved / num_positions:.2f}s saved")
+
+
+def benchmark_adaptive_sampling(time_limit: float = 1.0, num_positions: int = 10) -> None:
+    """Stochastic minimax with all samples against adaptive sampling: samples and
+    time used, contested samples searched deeper with the time left, and how often
+    the decision agrees with a search given 8 times longer."""
+    positions = sample_positions(num_positions, seed=4)
+
+    def decide(agent, state, choice) -> int:
+        agent.rng.seed(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return agent.choose_action(state, choice, choice.actions)
+
+    def searcher(limit: float, adaptive: bool) -> Agent_Minimax_Stochastic:
+        return Agent_Minimax_Stochastic(max_depth=20, time_limit=limit, num_samples=8, table_mb=0, adaptive=adaptive)
+
+    references = [decide(searcher(8 * time_limit, False), state, choice) for state, choice, pending in positions]
+    print(f"stochastic minimax, 8 samples, {time_limit}s per decision:")
+    for label, adaptive in [("all samples:", False), ("adaptive:", True)]:
+        agent = searcher(time_limit, adaptive)
+        agree = samples = deepened = 0
+        start = time.perf_counter()
+        for (state, choice, pending), reference in zip(positions, references):
+            agree += decide(agent, state, choice) == reference
+            samples += agent.num_samples - agent.samples_saved
+            deepened += agent.samples_deepened
+        elapsed = time.perf_counter() - start
+        print(f"  {label:12s} {samples / num_positions:.1f} samples, {deepened / num_positions:.1f} deepened, "
+              f"{elapsed / num_positions:.2f}s per decision, agrees with the long search {agree}/{num_positions}")
+
+
+def play_match(agent_0, agent_1, games: int, seed: int = 0) -> float:
+    """Games of agent_0 against agent_1 from seeded setups, alternating seats.
+    Returns the fraction won by agent_0, ties going against the ending player."""
+    wins = 0
+    for game_index in range(games):
+        swap = game_index % 2 == 1
+        state = quick_setup(seed + game_index // 2)
+        check_people_conditions(state)
+        with contextlib.redirect_stdout(io.StringIO()):
+            game_loop(state, Agent_Duel(agent_0, agent_1, swap), display=None)
+        seat = 1 if swap else 0
+        diff = player_score(state, seat) - player_score(state, 1 - seat)
+        if diff > 0 or (diff == 0 and state.ending_player != seat):
+            wins += 1
+    return wins / games
+
+
+def benchmark_tree_parallel(workers: int = 4, time_limit: float = 0.5, num_positions: int = 6, games: int = 6) -> None:
+    """Iterations per second of the shared tree against the single-tree agent, and
+    a match between them at the same time per decision."""
+    positions = sample_positions(num_positions, seed=3)
+    single = Agent_MCTS(time_limit=time_limit)
+    shared = Agent_MCTS_Shared(time_limit=time_limit, workers=workers)
+    print(f"mcts iterations per second, {time_limit}s per decision:")
+    for label, agent in [("single tree:", single), (f"shared, {workers} workers:", shared)]:
+        iterations = 0
+        start = time.perf_counter()
+        for state, choice, pending in positions:
+            agent.player_index = choice.player_index
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.mcts_search(state, choice, choice.actions)
+            iterations += agent.iterations
+        print(f"  {label:22s} {iterations / (time.perf_counter() - start):7.0f}/s")
+    print(f"  shared tree won {play_match(shared, single, games):.0%} of {games} games")
+
+
+if __name__ == "__main__":
+    benchmark_clone()
+    benchmark_state_size()
+    benchmark_combinations()
+    benchmark_transposition()
+    benchmark_move_ordering()
+    benchmark_pvs()
+    benchmark_macro_actions()
+    benchmark_action_collapsing()
+    benchmark_power()
+    benchmark_rollouts()
+    benchmark_compact()
+    benchmark_mcts_tree()
+    benchmark_mcts_reuse()
+    benchmark_tree_parallel()
+    benchmark_ponder()
+    benchmark_ismcts()
+    benchmark_stochastic_workers()
+    benchmark_adaptive_sampling()
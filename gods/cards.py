@@ -1,26 +1,31 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from collections.abc import Sequence
 import itertools
-from gods.models import Card, Card_Id, Card_Type, Card_Color, Game_State, effective_power, Choice
+import math
+from gods.models import (
+    Card, Card_Definition, Card_Id, Card_Type, Card_Color, Game_State, effective_power, compute_effective_power, Choice,
+    set_value, insert_card, remove_card, get_actions, register_choice_kind, PEOPLE_POWER_TAGS,
+)
 from gods.game import *
 
-def create_card(data: dict, default_power: int = 3) -> Card:
-    card_type = Card_Type(data["type"])
-    color = Card_Color(data["color"])
-    # Use the power from data if it's a people card (they have fixed power), otherwise use default
-    power = data["power"] if card_type == Card_Type.PEOPLE else default_power
-    name = data["name"]
+def create_definition(data: dict) -> Card_Definition:
+    return Card_Definition(
+        name=data["name"],
+        card_type=Card_Type(data["type"]),
+        color=Card_Color(data["color"]),
+        effect=data["effect"],
+        power=data["power"],
+    )
+
+
+def create_card(definition: Card_Definition, default_power: int = 3) -> Card:
+    # Use the printed power if it's a people card (they have fixed power), otherwise use default
+    power = definition.power if definition.card_type == Card_Type.PEOPLE else default_power
 
     # Use specialized card class if available (defined at bottom of file)
-    # Import here to avoid forward reference issues
-    card_class = _get_card_class(name)
-    return card_class(
-        name=name,
-        card_type=card_type,
-        power=power,
-        color=color,
-        effect=data["effect"]
-    )
+    card_class = _get_card_class(definition.name)
+    return card_class(definition=definition, power=power)
 
 
 def _get_card_class(name: str) -> type:
@@ -41,40 +46,127 @@ def is_indestructible(game: Game_State, people: Card, owner_idx: int) -> bool:
                 return True
     return False
 
-def all_combinations(card_ids: list[Card_Id], num_cards: int, up_to: bool) -> list[tuple]:
-    num_cards = min(num_cards, len(card_ids))
-    if up_to:
-        combinations = []
-        for k in range(0, num_cards + 1):
-            combinations += itertools.combinations(card_ids, k)
-        return combinations
-    else:
-        if len(card_ids) <= num_cards:
-            return [tuple(card_ids)]
-        return list(itertools.combinations(card_ids, num_cards))
-
-
-def make_choose_card_choice(player_index, get_targets, on_chosen) -> Choice:
-    choice = Choice(player_index=player_index)
-    choice.type = "choose-card"
-    choice.generate_actions = lambda state, choice: get_targets(state)
-    def resolve(state, choice, option_index):
-        card_id = choice.generate_actions(state, choice)[option_index]
-        if Card_Id.is_null(card_id):
-            return []
-        return on_chosen(state, card_id) or []
-    choice.resolve = resolve
-    return choice
-
-def make_choose_cards_choice(player_index, get_combinations, on_chosen) -> Choice:
-    choice = Choice(player_index=player_index)
-    choice.type = "choose-cards"
-    choice.generate_actions = lambda state, choice: get_combinations(state)
-    def resolve(state, choice, option_index):
-        combination = choice.generate_actions(state, choice)[option_index]
-        return on_chosen(state, combination) or []
-    choice.resolve = resolve
-    return choice
+class Combinations(Sequence):
+    """Combinations of num_items of items (up to num_items with up_to), without
+    building them. Ordered by size, then as itertools.combinations; an index is
+    decoded with the combinatorial number system, so len, indexing and random
+    sampling take time in the number of items, not of combinations."""
+    def __init__(self, items: list, num_items: int, up_to: bool):
+        self.items = items
+        num_items = min(num_items, len(items))
+        self.sizes = range(0, num_items + 1) if up_to else range(num_items, num_items + 1)
+        self.counts = [math.comb(len(items), k) for k in self.sizes]
+        self.length = sum(self.counts)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> tuple:
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("combination index out of range")
+        for size, count in zip(self.sizes, self.counts):
+            if index < count:
+                return self.decode(index, size)
+            index -= count
+
+    def __iter__(self):
+        for size in self.sizes:
+            yield from itertools.combinations(self.items, size)
+
+    def decode(self, rank: int, size: int) -> tuple:
+        """The rank-th combination of size items in lexicographic order."""
+        n = len(self.items)
+        result = []
+        position = 0
+        for remaining in range(size, 0, -1):
+            while True:
+                count = math.comb(n - position - 1, remaining - 1)  # combinations starting here
+                if rank < count:
+                    break
+                rank -= count
+                position += 1
+            result.append(self.items[position])
+            position += 1
+        return tuple(result)
+
+
+# Choices asked by card effects. They name the card by id and call its methods:
+# get_card_selection and on_card_chosen for choose-card, get_combinations and
+# on_cards_chosen for choose-cards, get_options and on_option_chosen for
+# choose-binary.
+
+def generate_card_selection(state: Game_State, choice: Choice) -> list[Card_Id]:
+    return state.card_by_id(choice.source).get_card_selection(state)
+
+def resolve_card_chosen(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    card_id = get_actions(state, choice)[option_index]
+    if Card_Id.is_null(card_id):
+        return []
+    return state.card_by_id(choice.source).on_card_chosen(state, choice, card_id)
+
+register_choice_kind("choose-card", "choose-card", generate_card_selection, resolve_card_chosen)
+
+def make_choose_card_choice(card: Card, player_index: int, iteration: int = 0) -> Choice:
+    return Choice("choose-card", player_index, card.id, iteration)
+
+
+def generate_combinations(state: Game_State, choice: Choice) -> Combinations:
+    return state.card_by_id(choice.source).get_combinations(state)
+
+def resolve_cards_chosen(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    combination = get_actions(state, choice)[option_index]
+    return state.card_by_id(choice.source).on_cards_chosen(state, choice, combination)
+
+register_choice_kind("choose-cards", "choose-cards", generate_combinations, resolve_cards_chosen)
+
+def make_choose_cards_choice(card: Card, player_index: int) -> Choice:
+    return Choice("choose-cards", player_index, card.id)
+
+
+def generate_pick_actions(state: Game_State, choice: Choice) -> list[Card_Id]:
+    combinations = generate_combinations(state, choice)
+    items = combinations.items
+    picked = len(choice.picked)
+    missing = combinations.sizes[0] - picked  # picks before the combination is complete
+    start = choice.picked[-1] + 1 if choice.picked else 0
+    actions = [items[i] for i in range(start, len(items) - max(missing, 1) + 1)]
+    if missing <= 0:
+        actions.append(Card_Id.null())  # done
+    return actions
+
+def resolve_pick(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    combinations = generate_combinations(state, choice)
+    card_id = get_actions(state, choice)[option_index]
+    picked = choice.picked
+    if not Card_Id.is_null(card_id):
+        picked += (combinations.items.index(card_id),)
+        if len(picked) < combinations.sizes[-1]:
+            return [Choice("choose-cards-step", choice.player_index, choice.source, choice.iteration, picked)]
+    combination = tuple(combinations.items[i] for i in picked)
+    return state.card_by_id(choice.source).on_cards_chosen(state, choice, combination)
+
+register_choice_kind("choose-cards-step", "choose-card", generate_pick_actions, resolve_pick)
+
+def make_pick_choice(choice: Choice) -> Choice:
+    """A choose-cards choice as a sequence of choose-card choices for search: the
+    cards of the combination are picked one by one in the order of the items,
+    then null ends it. Each combination is reached in exactly one way."""
+    return Choice("choose-cards-step", choice.player_index, choice.source, choice.iteration)
+
+
+def generate_options(state: Game_State, choice: Choice) -> list:
+    return state.card_by_id(choice.source).get_options(state)
+
+def resolve_option_chosen(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    return state.card_by_id(choice.source).on_option_chosen(state, choice, option_index)
+
+register_choice_kind("choose-binary", "choose-binary", generate_options, resolve_option_chosen)
+
+def make_choose_binary_choice(card: Card, player_index: int) -> Choice:
+    return Choice("choose-binary", player_index, card.id)
+
 
 def eval_most(game: Game_State, card: Card, player_index: int, metric) -> int:
     scores = [metric(game, i) for i in range(len(game.players))]
@@ -85,7 +177,7 @@ def eval_most(game: Game_State, card: Card, player_index: int, metric) -> int:
 
 # Card classes with specialized effects
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Light(Card):
     """When you end the game, you may play a card with power <= X"""
     def get_card_selection(self, state: Game_State) -> list[Card_Id]:
@@ -97,10 +189,12 @@ class Light(Card):
         return result
 
     def on_game_end(self, game: Game_State) -> list[Choice]:
-        action = lambda state, card_id: play_card(state, card_id)
-        return [make_choose_card_choice(self.owner, self.get_card_selection, action)]
+        return [make_choose_card_choice(self, self.owner)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        return play_card(game, card_id)
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Moon(Card):
     def draw_back_up(self, game: Game_State) -> list[Choice]:
         player = game.players[self.owner]
@@ -123,13 +217,13 @@ class Moon(Card):
     def on_discard(self, game: Game_State, card_discarded: Card) -> list[Choice]:
         return self.draw_back_up(game)
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class War(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
-        for people in game.peoples:
+        for i, people in enumerate(game.peoples):
             if not people.destroyed and effective_power(game, people) <= effective_power(game, self):
-                card_id = Card_Id(area="people", card_index=game.peoples.index(people), owner_index=people.owner)
+                card_id = Card_Id(area="people", card_index=i, owner_index=people.owner)
                 result.append(card_id)
         result.append(Card_Id.null())
         return result
@@ -137,10 +231,13 @@ class War(Card):
     def on_pass(self, game: Game_State) -> list[Choice]:
         if game.current_player != self.owner:
             return []
-        action = lambda state, card_id: destroy_people(state, card_id)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, action)]
+        return [make_choose_card_choice(self, game.current_player)]
 
-@dataclass
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        destroy_people(game, card_id)
+        return []
+
+@dataclass(eq=False, slots=True)
 class Rivers(Card):
     def get_card_selection(self, state: Game_State) -> list[Card_Id]:
         targets = []
@@ -151,10 +248,13 @@ class Rivers(Card):
         return targets
 
     def on_pass(self, game: Game_State) -> list[Choice]:
-        action = lambda state, card_id: restore_people(state, card_id)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, action)]
+        return [make_choose_card_choice(self, game.current_player)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        restore_people(game, card_id)
+        return []
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Earthquake(Card):
     def on_played(self, game: Game_State) -> list[Choice]:
         power = effective_power(game, self)
@@ -164,7 +264,7 @@ class Earthquake(Card):
                 destroy_people(game, people_id)
         return []
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Eruption(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         targets = []
@@ -176,20 +276,21 @@ class Eruption(Card):
                     targets.append(card_id)
         return targets
 
+    def get_combinations(self, game: Game_State) -> Combinations:
+        return Combinations(self.get_card_selection(game), effective_power(game, self), up_to=True)
+
     def on_played(self, game: Game_State) -> list[Choice]:
-        eruption = self
-        def get_combos(state):
-            power = effective_power(state, eruption)
-            return all_combinations(eruption.get_card_selection(state), power, up_to=True)
-        def on_chosen(state, combination):
-            cards = [state.get_card(card_id) for card_id in combination]
-            for card in cards:
-                idx = state.players[card.owner].wonders.index(card)
-                shuffle_card_into_deck(state, Card_Id(area="wonders", card_index=idx, owner_index=card.owner))
-        return [make_choose_cards_choice(game.current_player, get_combos, on_chosen)]
-
-
-@dataclass
+        return [make_choose_cards_choice(self, game.current_player)]
+
+    def on_cards_chosen(self, game: Game_State, choice: Choice, combination: tuple) -> list[Choice]:
+        cards = [game.get_card(card_id) for card_id in combination]
+        for card in cards:
+            area, owner_index, idx = game.locate(card.id)
+            shuffle_card_into_deck(game, Card_Id(area=area, card_index=idx, owner_index=owner_index))
+        return []
+
+
+@dataclass(eq=False, slots=True)
 class Meteorite(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
@@ -208,7 +309,7 @@ class Meteorite(Card):
         return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Miracle(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
@@ -220,28 +321,16 @@ class Miracle(Card):
         return result
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        choice = Choice()
-        choice.player_index = game.current_player
-        choice.type = "choose-card"
-
-        def generate_actions(state: Game_State, choice: Choice) -> list:
-            return self.get_card_selection(state)
-        choice.generate_actions = generate_actions
-
-        miracle_card = self
-        def resolve(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
-            actions = choice.generate_actions(state, choice)
-            card_id = actions[option_index]
-            card = state.get_card(card_id)
-            bonus = effective_power(state, miracle_card)
-            card.counters += bonus
-            return play_card(state, card_id)
+        return [make_choose_card_choice(self, game.current_player)]
 
-        choice.resolve = resolve
-        return [choice]
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        card = game.get_card(card_id)
+        bonus = effective_power(game, self)
+        set_value(game, card, "counters", card.counters + bonus)
+        return play_card(game, card_id)
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Flashback(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
@@ -252,20 +341,21 @@ class Flashback(Card):
                 result.append(card_id)
         return result
 
+    def get_combinations(self, game: Game_State) -> Combinations:
+        return Combinations(self.get_card_selection(game), effective_power(game, self), up_to=True)
+
     def on_played(self, game: Game_State) -> list[Choice]:
-        flashback = self
-        def get_combos(state):
-            return all_combinations(flashback.get_card_selection(state), effective_power(state, flashback), up_to=True)
-        def on_chosen(state, combination):
-            player = state.players[state.current_player]
-            cards = [state.get_card(card_id) for card_id in combination]
-            for card in cards:
-                player.discard.remove(card)
-                player.hand.append(card)
-        return [make_choose_cards_choice(game.current_player, get_combos, on_chosen)]
-
-
-@dataclass
+        return [make_choose_cards_choice(self, game.current_player)]
+
+    def on_cards_chosen(self, game: Game_State, choice: Choice, combination: tuple) -> list[Choice]:
+        cards = [game.get_card(card_id) for card_id in combination]
+        for card in cards:
+            remove_card(game, "discard", game.current_player, game.locate(card.id)[2])
+            insert_card(game, "hand", game.current_player, card)
+        return []
+
+
+@dataclass(eq=False, slots=True)
 class Prophecy(Card):
     """ Play up to X extra cards """
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
@@ -281,31 +371,15 @@ class Prophecy(Card):
         power = effective_power(game, self)
         if n >= power:
             return []
+        return [make_choose_card_choice(self, self.owner, iteration=n)]
 
-        choice = Choice(player_index=self.owner)
-        choice.type = "choose-card"
-
-        def generate_actions(state: Game_State, choice: Choice) -> list:
-            return self.get_card_selection(state)
-        choice.generate_actions = generate_actions
-
-        prophecy = self
-        def make_resolve(iteration):
-            def resolve(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
-                actions = choice.generate_actions(state, choice)
-                card_id = actions[option_index]
-                result: list[Choice] = []
-                if not Card_Id.is_null(card_id):
-                    result.extend(play_card(state, card_id))
-                    result.extend(prophecy._make_nth_choice(state, iteration + 1))
-                return result
-            return resolve
-
-        choice.resolve = make_resolve(n)
-        return [choice]
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        result = play_card(game, card_id)
+        result.extend(self._make_nth_choice(game, choice.iteration + 1))
+        return result
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Time_Warp(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         targets = []
@@ -315,20 +389,22 @@ class Time_Warp(Card):
                 targets.append(card_id)
         return targets
 
+    def get_combinations(self, game: Game_State) -> Combinations:
+        return Combinations(self.get_card_selection(game), effective_power(game, self), up_to=True)
+
     def on_played(self, game: Game_State) -> list[Choice]:
-        time_warp = self
-        def get_combos(state):
-            return all_combinations(time_warp.get_card_selection(state), effective_power(state, time_warp), up_to=True)
-        def on_chosen(state, combination):
-            cards = [state.get_card(card_id) for card_id in combination]
-            for card in cards:
-                state.players[card.owner].wonders.remove(card)
-                card.counters = 0
-                state.players[card.owner].hand.append(card)
-        return [make_choose_cards_choice(game.current_player, get_combos, on_chosen)]
-
-
-@dataclass
+        return [make_choose_cards_choice(self, game.current_player)]
+
+    def on_cards_chosen(self, game: Game_State, choice: Choice, combination: tuple) -> list[Choice]:
+        cards = [game.get_card(card_id) for card_id in combination]
+        for card in cards:
+            remove_card(game, "wonders", card.owner, game.locate(card.id)[2])
+            set_value(game, card, "counters", 0)
+            insert_card(game, "hand", card.owner, card)
+        return []
+
+
+@dataclass(eq=False, slots=True)
 class Aurora(Card):
     def on_played(self, game: Game_State) -> list[Choice]:
         power = effective_power(game, self)
@@ -338,7 +414,7 @@ class Aurora(Card):
         return result
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Darkness(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
@@ -349,17 +425,18 @@ class Darkness(Card):
             result.append(card_id)
         return result
 
+    def get_combinations(self, game: Game_State) -> Combinations:
+        return Combinations(self.get_card_selection(game), effective_power(game, self), up_to=False)
+
     def on_played(self, game: Game_State) -> list[Choice]:
-        darkness = self
-        def get_combos(state):
-            return all_combinations(darkness.get_card_selection(state), effective_power(state, darkness), up_to=False)
-        def on_chosen(state, combination):
-            discard_cards(state, list(combination))
-            
-        return [make_choose_cards_choice(1 - self.owner, get_combos, on_chosen)]
+        return [make_choose_cards_choice(self, 1 - self.owner)]
 
+    def on_cards_chosen(self, game: Game_State, choice: Choice, combination: tuple) -> list[Choice]:
+        discard_cards(game, list(combination))
+        return []
 
-@dataclass
+
+@dataclass(eq=False, slots=True)
 class Spring(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
@@ -370,13 +447,15 @@ class Spring(Card):
         return result
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        spring_card = self
-        def add_counters(state, card_id):
-            state.get_card(card_id).counters += effective_power(state, spring_card)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, add_counters)]
+        return [make_choose_card_choice(self, game.current_player)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        card = game.get_card(card_id)
+        set_value(game, card, "counters", card.counters + effective_power(game, self))
+        return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Regrowth(Card):
     """Restore a people with power <= X"""
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
@@ -389,22 +468,24 @@ class Regrowth(Card):
         return result
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        def restore(state, card_id):
-            state.get_card(card_id).destroyed = False
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, restore)]
+        return [make_choose_card_choice(self, game.current_player)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        set_value(game, game.get_card(card_id), "destroyed", False)
+        return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Flood(Card):
     """Put X -1 counters on all people"""
     def on_played(self, game: Game_State) -> list[Choice]:
         power = effective_power(game, self)
         for people in game.peoples:
-            people.counters -= power
+            set_value(game, people, "counters", people.counters - power)
         return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Forgive(Card):
     """Add X +1 counters on a people"""
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
@@ -415,13 +496,15 @@ class Forgive(Card):
         return result
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        forgive_card = self
-        def add_counters(state, card_id):
-            state.get_card(card_id).counters += effective_power(state, forgive_card)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, add_counters)]
+        return [make_choose_card_choice(self, game.current_player)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        card = game.get_card(card_id)
+        set_value(game, card, "counters", card.counters + effective_power(game, self))
+        return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Unmaking(Card):
     """Destroy a wonder with power <= X"""
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
@@ -435,11 +518,14 @@ class Unmaking(Card):
         return targets
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        action = lambda state, card_id: destroy_wonder(state, card_id)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, action)]
+        return [make_choose_card_choice(self, game.current_player)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        destroy_wonder(game, card_id)
+        return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Revolt(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         result = []
@@ -451,11 +537,14 @@ class Revolt(Card):
         return result
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        action = lambda state, card_id: destroy_people(state, card_id)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, action)]
+        return [make_choose_card_choice(self, game.current_player)]
 
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        destroy_people(game, card_id)
+        return []
 
-@dataclass
+
+@dataclass(eq=False, slots=True)
 class Blessing(Card):
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
         targets = []
@@ -466,15 +555,17 @@ class Blessing(Card):
         return targets
 
     def on_played(self, game: Game_State) -> list[Choice]:
-        blessing_card = self
-        def add_counters(state, card_id):
-            state.get_card(card_id).counters += effective_power(state, blessing_card)
-        return [make_choose_card_choice(game.current_player, self.get_card_selection, add_counters)]
+        return [make_choose_card_choice(self, game.current_player)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        card = game.get_card(card_id)
+        set_value(game, card, "counters", card.counters + effective_power(game, self))
+        return []
 
 
 # Passive wonders - these use hooks rather than on_played
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Wisdom(Card):
     """When you pass, you may play a card with power <= X"""
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
@@ -491,34 +582,39 @@ class Wisdom(Card):
     def on_pass(self, game: Game_State) -> list[Choice]:
         if game.current_player != self.owner:
             return []
-        action = lambda state, card_id: play_card(state, card_id)
-        return [make_choose_card_choice(self.owner, self.get_card_selection, action)]
+        return [make_choose_card_choice(self, self.owner)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        return play_card(game, card_id)
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Knowledge(Card):
     """Opponent events get -X, down to a minimum of 1 power"""
     def power_modifier(self, game: Game_State, card: Card, power: int) -> int:
         if card.card_type == Card_Type.EVENT:
             # Check if card belongs to opponent
             opponent_idx = 1 - self.owner
-            if card in game.players[opponent_idx].hand:
+            if game.in_zone(card, "hand", opponent_idx):
                 reduction = effective_power(game, self)
                 return max(1, power - reduction)
         return power
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Sky(Card):
-    """Your other blue wonders get +X"""
+    """Your other blue wonders get +X
+
+    X leaves out the bonus of other Skies (see rules.md): two Skies counting each
+    other's bonus would each have the power of the other plus their own."""
     def power_modifier(self, game: Game_State, card: Card, power: int) -> int:
-        if card.color == Card_Color.BLUE and card != self:
-            if card in game.players[self.owner].wonders:
-                return power + effective_power(game, self)
+        if card.color == Card_Color.BLUE and card is not self:
+            if game.in_zone(card, "wonders", self.owner):
+                return power + compute_effective_power(game, self, skip=Sky)
         return power
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Deserts(Card):
     """You can score destroyed peoples with power X or less"""
     def on_scoring_people(self, game: Game_State, people: Card, points: int) -> int:
@@ -528,7 +624,7 @@ class Deserts(Card):
         return points
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Forests(Card):
     """When you pass, you may restore a people with power <= X"""
     def get_card_selection(self, game: Game_State) -> list[Card_Id]:
@@ -544,12 +640,14 @@ class Forests(Card):
     def on_pass(self, game: Game_State) -> list[Choice]:
         if game.current_player != self.owner:
             return []
-        def restore(state, card_id):
-            state.get_card(card_id).destroyed = False
-        return [make_choose_card_choice(self.owner, self.get_card_selection, restore)]
+        return [make_choose_card_choice(self, self.owner)]
+
+    def on_card_chosen(self, game: Game_State, choice: Choice, card_id: Card_Id) -> list[Choice]:
+        set_value(game, game.get_card(card_id), "destroyed", False)
+        return []
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Mountains(Card):
     """Your peoples with power X or less are indestructible"""
     def is_indestructible(self, game: Game_State, people: Card) -> bool:
@@ -559,14 +657,14 @@ class Mountains(Card):
         return False
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Animals(Card):
     """This is worth X points at the end of the game"""
     def on_scoring(self, game: Game_State) -> int:
         return effective_power(game, self)
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Love(Card):
     """Your peoples are worth X points extra"""
     def on_scoring_people(self, game: Game_State, people: Card, points: int) -> int:
@@ -574,7 +672,7 @@ class Love(Card):
             return points + effective_power(game, self)
         return points
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Seas(Card):
     """Your alive peoples with power X or less are worth +1 points"""
     def on_scoring_people(self, game: Game_State, people: Card, points: int) -> int:
@@ -584,27 +682,27 @@ class Seas(Card):
         return points
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Fire(Card):
     """Your red events get +X"""
     def power_modifier(self, game: Game_State, card: Card, power: int) -> int:
         if card.card_type == Card_Type.EVENT and card.color == Card_Color.RED:
-            if card in game.players[self.owner].hand:
+            if game.in_zone(card, "hand", self.owner):
                 return power + effective_power(game, self)
         return power
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Sun(Card):
     """Your green wonders get +X"""
     def power_modifier(self, game: Game_State, card: Card, power: int) -> int:
-        if card.color == Card_Color.GREEN and card != self:
-            if card in game.players[self.owner].wonders:
+        if card.color == Card_Color.GREEN and card is not self:
+            if game.in_zone(card, "wonders", self.owner):
                 return power + effective_power(game, self)
         return power
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Stars(Card):
     """When you draw cards, you may draw from the shared deck."""
     def on_draw_replacement(self, game: Game_State) -> list[Choice]:
@@ -613,44 +711,40 @@ class Stars(Card):
         if not game.shared_deck:
             return []
 
-        choice = Choice()
-        choice.player_index = self.owner
-        choice.type = "choose-binary"
-
-        def generate_actions(state: Game_State, choice: Choice) -> list:
-            return ["Draw from shared deck", "Draw normally"]
-        choice.generate_actions = generate_actions
+        return [make_choose_binary_choice(self, self.owner)]
 
-        stars_card = self
-        def resolve(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
-            player_id = stars_card.owner
-            if option_index == 0:
-                power = effective_power(state, stars_card)
-                player = state.players[player_id]
-                card = state.shared_deck.pop()
-                card.power = power
-                card.owner = self.owner
-                player.hand.append(card)
-                return []
-            else:
-                return draw_card(state, player_id, replacement_effects=False)
+    def get_options(self, game: Game_State) -> list:
+        return ["Draw from shared deck", "Draw normally"]
 
-        choice.resolve = resolve
-        return [choice]
+    def on_option_chosen(self, game: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+        player_id = self.owner
+        if option_index == 0:
+            power = effective_power(game, self)
+            card = remove_card(game, "shared", None, len(game.shared_deck) - 1)
+            set_value(game, card, "power", power)
+            set_value(game, card, "owner", self.owner)
+            insert_card(game, "hand", player_id, card)
+            return []
+        else:
+            return draw_card(game, player_id, replacement_effects=False)
 
 
 # People card classes - each implements their own condition for ownership
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Egyptians(Card):
     """You have the most total power among green wonders"""
+    metric_inputs = PEOPLE_POWER_TAGS
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         metric = lambda g, i: sum(effective_power(g, w) for w in g.players[i].wonders if w.color == Card_Color.GREEN)
         return eval_most(game, self, player_index, metric)
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Greeks(Card):
     """You have twice or more cards in hand than the opponent"""
+    metric_inputs = PEOPLE_POWER_TAGS + ("hand",)
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         player = game.players[player_index]
         opponent = game.players[1 - player_index]
@@ -658,35 +752,45 @@ class Greeks(Card):
             return effective_power(game, self)
         return 0
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Vikings(Card):
     """You have the most cards in your deck"""
+    metric_inputs = PEOPLE_POWER_TAGS + ("deck",)
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         return eval_most(game, self, player_index, lambda g, i: len(g.players[i].deck))
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Minoans(Card):
     """You have the most wonders"""
+    metric_inputs = PEOPLE_POWER_TAGS
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         return eval_most(game, self, player_index, lambda g, i: len(g.players[i].wonders))
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Babylonians(Card):
     """You have the most total power among wonders"""
+    metric_inputs = PEOPLE_POWER_TAGS
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         metric = lambda g, i: sum(effective_power(g, w) for w in g.players[i].wonders)
         return eval_most(game, self, player_index, metric)
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Romans(Card):
     """You have the most total power among red wonders"""
+    metric_inputs = PEOPLE_POWER_TAGS
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         metric = lambda g, i: sum(effective_power(g, w) for w in g.players[i].wonders if w.color == Card_Color.RED)
         return eval_most(game, self, player_index, metric)
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Judeans(Card):
     """You have the most total power among blue wonders"""
+    metric_inputs = PEOPLE_POWER_TAGS
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         metric = lambda g, i: sum(effective_power(g, w) for w in g.players[i].wonders if w.color == Card_Color.BLUE)
         return eval_most(game, self, player_index, metric)
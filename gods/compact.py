@@ -0,0 +1,230 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from gods.models import Card, Card_Color, Card_Definition, Card_Type, Game_State, Player
+
+
+# Compact encoding of a Game_State. Card.id numbers the cards of a game from 0
+# (see create_game), so a set of cards is an int with bit card.id set for each
+# card in it: a few dozen cards fit in one machine word. Hands, discards and
+# wonders in play are such masks; decks, peoples and the shared deck keep their
+# order as tuples of ids. Card fields are tuples indexed by id. What a card is
+# (its class and definition) never changes, so it lives in a Card_Universe
+# shared by every encoding of the game.
+#
+# A Compact_State is immutable and compares and hashes as a tuple of ints, over
+# the same facts as state_hash(). The universe is not compared: card ids only
+# mean the same cards within one game, so only compare encodings that share a
+# universe (encode_state(state, universe)). encode_state and decode_state are lossless:
+# decoding gives back the same zones in the same order, the same card fields
+# and the same state fields.
+
+MASK_FIELDS = {"hand": "hands", "discard": "discards", "wonders": "wonders"}  # zones stored as masks
+
+
+@dataclass(eq=False)
+class Card_Universe:
+    """The cards of one game by Card.id, with the mask of the cards of each
+    color and type."""
+    classes: tuple[type, ...]
+    definitions: tuple[Card_Definition, ...]
+    color_masks: dict[Card_Color, int]
+    type_masks: dict[Card_Type, int]
+
+
+def card_universe(state: Game_State) -> Card_Universe:
+    cards = sorted(state.all_cards(), key=lambda card: card.id)
+    assert [card.id for card in cards] == list(range(len(cards))), "card ids must be 0..n-1"
+    color_masks = dict.fromkeys(Card_Color, 0)
+    type_masks = dict.fromkeys(Card_Type, 0)
+    for card in cards:
+        color_masks[card.definition.color] |= 1 << card.id
+        type_masks[card.definition.card_type] |= 1 << card.id
+    return Card_Universe(
+        classes=tuple(type(card) for card in cards),
+        definitions=tuple(card.definition for card in cards),
+        color_masks=color_masks,
+        type_masks=type_masks,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Compact_State:
+    """Encoding of a Game_State, see encode_state. Equality and hash ignore the
+    universe: encodings of two different games can compare equal."""
+    universe: Card_Universe = field(compare=False, repr=False)
+    # Zones, one entry per player
+    decks: tuple[tuple[int, ...], ...]  # card ids, in list order
+    hands: tuple[int, ...]  # masks
+    discards: tuple[int, ...]
+    wonders: tuple[int, ...]
+    peoples: tuple[int, ...]  # card ids
+    shared_deck: tuple[int, ...]
+    # Card fields by card id
+    power: tuple[int, ...]
+    counters: tuple[int, ...]
+    owner: tuple[int, ...]  # -1 for None
+    destroyed: int  # mask
+    # Game_State fields, see HASHED_STATE_FIELDS
+    current_player: int
+    current_phase: str
+    game_ending: bool
+    ending_player: Optional[int]
+    final_turn: bool
+    game_over: bool
+    extra_turns: int
+    seed: int
+    rng_draws: int
+    # Only needed by decode_state, not part of the position (as for state_hash())
+    player_names: tuple[str, ...] = field(default=(), compare=False)
+    order: tuple[int, ...] = field(default=(), compare=False, repr=False)  # index of each card in its zone
+
+
+def zone_mask(zone: list[Card]) -> int:
+    mask = 0
+    for card in zone:
+        mask |= 1 << card.id
+    return mask
+
+
+def mask_ids(mask: int) -> Iterator[int]:
+    """Card ids in mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def encode_state(state: Game_State, universe: Optional[Card_Universe] = None) -> Compact_State:
+    """Compact encoding of state. Pass the universe of an earlier encoding of
+    the same game to share it."""
+    if universe is None:
+        universe = card_universe(state)
+    size = len(universe.definitions)
+    power = [0] * size
+    counters = [0] * size
+    owner = [-1] * size
+    order = [0] * size
+    destroyed = 0
+    for _, _, zone in state.zones():
+        for index, card in enumerate(zone):
+            power[card.id] = card.power
+            counters[card.id] = card.counters
+            owner[card.id] = -1 if card.owner is None else card.owner
+            order[card.id] = index
+            if card.destroyed:
+                destroyed |= 1 << card.id
+    players = state.players
+    return Compact_State(
+        universe=universe,
+        decks=tuple(tuple(card.id for card in player.deck) for player in players),
+        hands=tuple(zone_mask(player.hand) for player in players),
+        discards=tuple(zone_mask(player.discard) for player in players),
+        wonders=tuple(zone_mask(player.wonders) for player in players),
+        peoples=tuple(card.id for card in state.peoples),
+        shared_deck=tuple(card.id for card in state.shared_deck),
+        power=tuple(power),
+        counters=tuple(counters),
+        owner=tuple(owner),
+        destroyed=destroyed,
+        current_player=state.current_player,
+        current_phase=state.current_phase,
+        game_ending=state.game_ending,
+        ending_player=state.ending_player,
+        final_turn=state.final_turn,
+        game_over=state.game_over,
+        extra_turns=state.extra_turns,
+        rng_draws=state.rng_draws,
+        seed=state.seed,
+        player_names=tuple(player.name for player in players),
+        order=tuple(order),
+    )
+
+
+def _decode_card(compact: Compact_State, card_id: int) -> Card:
+    owner = compact.owner[card_id]
+    return compact.universe.classes[card_id](
+        definition=compact.universe.definitions[card_id],
+        power=compact.power[card_id],
+        destroyed=bool(compact.destroyed >> card_id & 1),
+        counters=compact.counters[card_id],
+        owner=None if owner < 0 else owner,
+        id=card_id,
+    )
+
+
+def _decode_zone(compact: Compact_State, ids) -> list[Card]:
+    return [_decode_card(compact, card_id) for card_id in ids]
+
+
+def _decode_mask(compact: Compact_State, mask: int) -> list[Card]:
+    return _decode_zone(compact, sorted(mask_ids(mask), key=compact.order.__getitem__))
+
+
+def decode_state(compact: Compact_State) -> Game_State:
+    """The Game_State that compact encodes, with new cards."""
+    players = [
+        Player(
+            name=name,
+            deck=_decode_zone(compact, compact.decks[i]),
+            hand=_decode_mask(compact, compact.hands[i]),
+            discard=_decode_mask(compact, compact.discards[i]),
+            wonders=_decode_mask(compact, compact.wonders[i]),
+        )
+        for i, name in enumerate(compact.player_names)
+    ]
+    return Game_State(
+        players=players,
+        peoples=_decode_zone(compact, compact.peoples),
+        current_player=compact.current_player,
+        current_phase=compact.current_phase,
+        game_ending=compact.game_ending,
+        ending_player=compact.ending_player,
+        final_turn=compact.final_turn,
+        game_over=compact.game_over,
+        extra_turns=compact.extra_turns,
+        shared_deck=_decode_zone(compact, compact.shared_deck),
+        seed=compact.seed,
+        rng_draws=compact.rng_draws,
+    )
+
+
+# Queries on the encoding, each a few integer operations.
+
+def area_mask(compact: Compact_State, area: str, owner_index: Optional[int]) -> int:
+    """Mask of the cards in a zone, see get_zone()."""
+    if area == "people":
+        return _ids_mask(compact.peoples)
+    if area == "shared":
+        return _ids_mask(compact.shared_deck)
+    if area == "deck":
+        return _ids_mask(compact.decks[owner_index])
+    if area not in MASK_FIELDS:
+        raise ValueError(f"Invalid card area: {area}")
+    return getattr(compact, MASK_FIELDS[area])[owner_index]
+
+
+def _ids_mask(ids: tuple[int, ...]) -> int:
+    mask = 0
+    for card_id in ids:
+        mask |= 1 << card_id
+    return mask
+
+
+def in_area(compact: Compact_State, card_id: int, area: str, owner_index: Optional[int]) -> bool:
+    return bool(area_mask(compact, area, owner_index) >> card_id & 1)
+
+
+def has_wonder_of_color(compact: Compact_State, player_index: int, color: Card_Color) -> bool:
+    return compact.wonders[player_index] & compact.universe.color_masks[color] != 0
+
+
+def wonder_count(compact: Compact_State, player_index: int) -> int:
+    """The Minoans metric."""
+    return compact.wonders[player_index].bit_count()
+
+
+def deck_count(compact: Compact_State, player_index: int) -> int:
+    """The Vikings metric."""
+    return len(compact.decks[player_index])
@@ -1,7 +1,10 @@
 from __future__ import annotations
 import random
-from typing import Optional
-from gods.models import Card, Card_Id, Card_Type, Choice, Game_State
+from typing import Callable, Optional
+from gods.models import (
+    Card, Card_Id, Card_Type, Choice, Game_State,
+    set_value, insert_card, remove_card, shuffle_zone, game_rng, subscribers, journal_choices, get_actions, register_choice_kind,
+)
 from gods.agents.agent import Agent
 
 def draw_card(game: Game_State, player_id: int, replacement_effects=True) -> list[Choice]:
@@ -11,7 +14,7 @@ def draw_card(game: Game_State, player_id: int, replacement_effects=True) -> lis
         return []
 
     if replacement_effects:
-        for w in player.wonders:
+        for w in subscribers(game, "on_draw_replacement")[player_id]:
             choices = w.on_draw_replacement(game)
             if choices:
                 return choices
@@ -19,10 +22,10 @@ def draw_card(game: Game_State, player_id: int, replacement_effects=True) -> lis
     if len(player.deck) == 0:
         return []
 
-    card = player.deck.pop()
-    player.hand.append(card)
+    card = remove_card(game, "deck", player_id, len(player.deck) - 1)
+    insert_card(game, "hand", player_id, card)
 
-    for w in player.wonders:
+    for w in subscribers(game, "on_draw")[player_id]:
         choices = w.on_draw(game)
         if choices:
             return choices
@@ -39,28 +42,67 @@ def discard_cards(game: Game_State, card_ids: list[Card_Id]) -> list[Choice]:
 
     cards = [game.get_card(card_id) for card_id in card_ids]
     for i, card in enumerate(cards):
-        player = game.players[card_ids[i].owner_index]
-        player.hand.remove(card)
-        player.discard.append(card)
+        owner_index = card_ids[i].owner_index
+        remove_card(game, "hand", owner_index, game.locate(card.id)[2])
+        insert_card(game, "discard", owner_index, card)
 
     choices = []
     player_id = card_ids[0].owner_index
-    for wonder_id in game.wonders(player_id):
-        wonder = game.get_card(wonder_id)
+    for wonder in subscribers(game, "on_discard")[player_id]:
         for card in cards:
             choices += wonder.on_discard(game, card)
 
     return choices
 
 
+VERIFY_SCORES = False  # compare the cached scoring with the reference functions
+
+
 def check_people_conditions(game: Game_State) -> None:
     """Check and update ownership of people cards based on their conditions."""
-    for people in game.peoples:
+    refresh_people_points(game)
+    for people, points in zip(game.peoples, game.people_points):
         old_owner = people.owner
-        new_owner = evaluate_people_condition(game, people)
+        new_owner = owner_from_points(game, people, points)
+        if VERIFY_SCORES:
+            assert new_owner == evaluate_people_condition(game, people), people.name
 
         if new_owner != old_owner:
-            people.owner = new_owner
+            set_value(game, people, "owner", new_owner)
+
+
+def refresh_people_points(game: Game_State) -> None:
+    """Bring game.people_points and game.scores up to date.
+
+    Only peoples whose metric_inputs intersect the tags recorded since the last
+    refresh are evaluated again. The scores are kept unless a people's points
+    changed or something other than a deck, hand or discard was modified.
+    """
+    tags = game.score_tags
+    if len(game.people_points) != len(game.peoples):
+        game.people_points = [(p.eval_points(game, 0), p.eval_points(game, 1)) for p in game.peoples]
+        game.scores = None
+    elif tags:
+        changed = False
+        for i, people in enumerate(game.peoples):
+            if not tags.isdisjoint(people.metric_inputs):
+                points = (people.eval_points(game, 0), people.eval_points(game, 1))
+                if points != game.people_points[i]:
+                    game.people_points[i] = points
+                    changed = True
+        if changed or not tags.issubset(("deck", "hand", "discard", "shared")):
+            game.scores = None
+    tags.clear()
+
+
+def player_score(game: Game_State, player_index: int) -> int:
+    """Same as compute_player_score, from the cached people points and scores."""
+    refresh_people_points(game)
+    if game.scores is None:
+        game.scores = [score_from_points(game, i) for i in range(len(game.players))]
+    if VERIFY_SCORES:
+        assert game.scores[player_index] == compute_player_score(game, player_index)
+    return game.scores[player_index]
 
 
 def evaluate_people_condition(game: Game_State, people: Card) -> Optional[int]:
@@ -72,7 +114,11 @@ def evaluate_people_condition(game: Game_State, people: Card) -> Optional[int]:
         people.eval_points(game, 0),
         people.eval_points(game, 1)
     ]
+    return owner_from_points(game, people, scores)
+
 
+def owner_from_points(game: Game_State, people: Card, scores) -> Optional[int]:
+    """Owner of a people given the points it is worth to each player."""
     if scores[0] > scores[1]:
         return 0
     elif scores[1] > scores[0]:
@@ -80,8 +126,8 @@ def evaluate_people_condition(game: Game_State, people: Card) -> Optional[int]:
     else:
         # Tie or no one qualifies - check for wonders that break ties
         if scores[0] == scores[1]:
-            for i, player in enumerate(game.players):
-                for w in player.wonders:
+            for i, wonders in enumerate(game.hook_index.get("wins_tie") or subscribers(game, "wins_tie")):
+                for w in wonders:
                     if w.wins_tie(game, people):
                         return i
             return people.owner
@@ -90,30 +136,29 @@ def evaluate_people_condition(game: Game_State, people: Card) -> Optional[int]:
 
 def play_card(state: Game_State, card_id: Card_Id) -> list[Choice]:
     """Play a card from a player's hand. Returns list of choices from the card's on_played."""
-    player = state.players[card_id.owner_index]
+    owner_index = card_id.owner_index
     card = state.get_card(card_id)
     if card_id.area == "hand":
-        del player.hand[card_id.card_index]
+        remove_card(state, "hand", owner_index, card_id.card_index)
 
     if card.card_type == Card_Type.WONDER:
-        card.owner = state.current_player
-        player.wonders.append(card)
+        set_value(state, card, "owner", state.current_player)
+        insert_card(state, "wonders", owner_index, card)
     elif card.card_type == Card_Type.EVENT:
-        player.discard.append(card)
+        insert_card(state, "discard", owner_index, card)
     return card.on_played(state)
 
 
-def wonders_by_priority(state: Game_State) -> list[Card]:
-    active_player = state.active_player()
-    opponent = state.opponent()
-    all_wonders = active_player.wonders + opponent.wonders
-    return all_wonders
+def wonders_by_priority(state: Game_State, hook: str) -> list[Card]:
+    """Wonders in play implementing hook, the active player's first."""
+    index = subscribers(state, hook)
+    return index[state.current_player] + index[1 - state.current_player]
 
 def destroy_people(game: Game_State, card_id: Card_Id) -> None:
     people = game.get_card(card_id)
-    people.destroyed = True
+    set_value(game, people, "destroyed", True)
     people.on_destroyed(game)
-    for card in wonders_by_priority(game):
+    for card in wonders_by_priority(game, "on_destroy"):
         card.on_destroy(game, people)
 
 def destroy_wonder(game: Game_State, card_id: Card_Id) -> None:
@@ -121,17 +166,16 @@ def destroy_wonder(game: Game_State, card_id: Card_Id) -> None:
     assert card.card_type == Card_Type.WONDER, card.card_type
     owner_idx = card_id.owner_index
     if owner_idx is not None:
-        player = game.players[owner_idx]
-        player.wonders.remove(card)
-        player.discard.append(card)
+        remove_card(game, "wonders", owner_idx, game.locate(card.id)[2])
+        insert_card(game, "discard", owner_idx, card)
 
     card.on_destroyed(game)
-    for w in wonders_by_priority(game):
+    for w in wonders_by_priority(game, "on_destroy"):
         w.on_destroy(game, card)
 
 def restore_people(game: Game_State, card_id: Card_Id) -> None:
     people = game.get_card(card_id)
-    people.destroyed = False
+    set_value(game, people, "destroyed", False)
 
 def shuffle_card_into_deck(game: Game_State, card_id: Card_Id) -> None:
     card = game.get_card(card_id)
@@ -140,20 +184,23 @@ def shuffle_card_into_deck(game: Game_State, card_id: Card_Id) -> None:
     assert card_id.owner_index is not None
     owner_idx = card_id.owner_index
     if owner_idx is not None:
-        player = game.players[owner_idx]
-        player.wonders.remove(card)
-        card.counters = 0
-        player.deck.append(card)
-        random.shuffle(player.deck)
+        area, _, index = game.locate(card.id)  # the wonders or the discard pile
+        remove_card(game, area, owner_idx, index)
+        set_value(game, card, "counters", 0)
+        insert_card(game, "deck", owner_idx, card)
+        shuffle_zone(game, "deck", owner_idx)
 
 def declare_end_game(game: Game_State) -> None:
     """Active player declares end of game."""
-    game.game_ending = True
-    game.ending_player = game.current_player
+    set_value(game, game, "game_ending", True)
+    set_value(game, game, "ending_player", game.current_player)
 
 
 def compute_player_score(game: Game_State, player_index: int) -> int:
-    """Compute the total score for a player."""
+    """Compute the total score for a player.
+
+    Reference implementation, search uses the cached player_score.
+    """
     score = 0
     player = game.players[player_index]
 
@@ -173,106 +220,162 @@ def compute_player_score(game: Game_State, player_index: int) -> int:
     return score
 
 
+def score_from_points(game: Game_State, player_index: int) -> int:
+    """compute_player_score using game.people_points instead of eval_points."""
+    score = 0
+    modifiers = subscribers(game, "on_scoring_people")[player_index]
+    for people, points in zip(game.peoples, game.people_points):
+        points = 0 if people.destroyed else points[player_index]
+        for wonder in modifiers:
+            points = wonder.on_scoring_people(game, people, points)
+        score += points
+    for wonder in subscribers(game, "on_scoring")[player_index]:
+        score += wonder.on_scoring(game)
+    return score
+
+
+def generate_play_actions(state: Game_State, choice: Choice) -> list:
+    return [Card_Id(area="hand", card_index=i, owner_index=choice.player_index)
+            for i in range(len(state.players[choice.player_index].hand))]
+
+def resolve_play(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    actions = get_actions(state, choice)
+    card_id = actions[option_index]
+    new_choices = play_card(state, card_id)
+    set_value(state, state, "current_phase", "post-play")
+    return new_choices
+
+register_choice_kind("play", "choose-card", generate_play_actions, resolve_play)
+
 def make_play_choice(state: Game_State) -> Choice:
-    choice = Choice()
-    choice.player_index = state.current_player
-    choice.type = "choose-card"
-
-    def generate_actions(state: Game_State, choice: Choice) -> list:
-        return [Card_Id(area="hand", card_index=i, owner_index=state.current_player)
-                for i, card in enumerate(state.players[state.current_player].hand)]
-    choice.generate_actions = generate_actions
-
-    def resolve(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
-        actions = choice.generate_actions(state, choice)
-        card_id = actions[option_index]
-        new_choices = play_card(state, card_id)
-        state.current_phase = "post-play"
-        return new_choices
-    choice.resolve = resolve
-    return choice
+    return Choice("play", state.current_player)
+
+
+def generate_main_actions(state: Game_State, choice: Choice) -> list:
+    player = state.active_player()
+    options = []
+    if player.hand:
+        options.append("play")
+    options.append("pass")
+    return options
+
+def resolve_main(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    actions = get_actions(state, choice)
+    action = actions[option_index]
+    if action == "play":
+        return [make_play_choice(state)]
+    elif action == "pass":
+        result: list[Choice] = []
+        for w in subscribers(state, "on_pass")[state.current_player]:
+            result.extend(w.on_pass(state))
+        set_value(state, state, "current_phase", "post-pass-effects")
+        return result
+    return []
+
+register_choice_kind("main", "main", generate_main_actions, resolve_main)
 
 def make_main_choice(state: Game_State) -> Choice:
-    choice = Choice()
-    choice.player_index = state.current_player
-    choice.type = "main"
-
-    def generate_actions(state: Game_State, choice: Choice) -> list:
-        player = state.active_player()
-        options = []
-        if player.hand:
-            options.append("play")
-        options.append("pass")
-        return options
-    choice.generate_actions = generate_actions
-
-    def resolve(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
-        actions = choice.generate_actions(state, choice)
-        action = actions[option_index]
-        if action == "play":
-            return [make_play_choice(state)]
-        elif action == "pass":
-            result: list[Choice] = []
-            player = state.active_player()
-            for w in player.wonders:
-                result.extend(w.on_pass(state))
-            state.current_phase = "post-pass-effects"
-            return result
-        return []
+    return Choice("main", state.current_player)
 
-    choice.resolve = resolve
-    return choice
+
+def generate_turn_actions(state: Game_State, choice: Choice) -> list:
+    return ["pass"] + generate_play_actions(state, choice)
+
+def resolve_turn(state: Game_State, choice: Choice, option_index: int) -> list[Choice]:
+    main_choice = make_main_choice(state)
+    main_actions = get_actions(state, main_choice)
+    if option_index == 0:
+        return main_choice.resolve(state, main_actions.index("pass"))
+    play_choice, = main_choice.resolve(state, main_actions.index("play"))
+    return play_choice.resolve(state, option_index - 1)
+
+register_choice_kind("turn", "turn", generate_turn_actions, resolve_turn)
+
+def make_turn_choice(state: Game_State) -> Choice:
+    """The main choice and the card to play as one choice, for search.
+
+    Actions are "pass" and the Card_Id of each hand card, playing it. Resolving
+    goes through make_main_choice and make_play_choice, so the outcome is the
+    same as making the two choices; the UI and the network protocol keep using
+    those.
+    """
+    return Choice("turn", state.current_player)
 
 
 def get_next_choice(state: Game_State, choices: list[Choice]) -> Choice | None:
     """Advance game state until a choice is produced or the game ends."""
+    journal_choices(state, choices)
     while not state.game_over:
         if choices:
             choice = choices.pop(0)
-            actions = choice.generate_actions(state, choice)
+            choice.actions = None  # generate them for the current state
+            actions = get_actions(state, choice)
             if not actions:
                 continue
             return choice
 
         if state.current_phase == "start":
-            for w in state.active_player().wonders:
+            for w in subscribers(state, "on_turn_start")[state.current_player]:
                 choices.extend(w.on_turn_start(state))
 
-            state.current_phase = "main"
+            set_value(state, state, "current_phase", "main")
 
         elif state.current_phase == "main":
             choices.append(make_main_choice(state))
 
         elif state.current_phase == "post-play":
             check_people_conditions(state)
-            state.current_phase = "end"
+            set_value(state, state, "current_phase", "end")
 
         elif state.current_phase == "post-pass-effects":
             # on_pass choices already resolved, now draw
             player = state.active_player()
             if not player.deck:
-                state.game_over = True
-                state.ending_player = state.current_player
+                set_value(state, state, "game_over", True)
+                set_value(state, state, "ending_player", state.current_player)
                 continue
             new_choices = draw_card(state, state.current_player)
             choices.extend(new_choices)
             check_people_conditions(state)
-            state.current_phase = "post-pass-draw"
+            set_value(state, state, "current_phase", "post-pass-draw")
 
         elif state.current_phase == "post-pass-draw":
             # draw choices resolved
             check_people_conditions(state)
-            state.current_phase = "end"
+            set_value(state, state, "current_phase", "end")
 
         elif state.current_phase == "end":
-            for w in state.active_player().wonders:
+            for w in subscribers(state, "on_turn_end")[state.current_player]:
                 choices.extend(w.on_turn_end(state))
             state.switch_turn()
-            state.current_phase = "start"
+            set_value(state, state, "current_phase", "start")
 
     return None
 
 
+MAX_FLAT_COMBINATIONS = 16  # larger choose-cards choices are searched a card at a time
+
+
+def get_next_search_choice(state: Game_State, choices: list[Choice], macro_actions: bool = False) -> Choice | None:
+    """get_next_choice as search sees it: choose-cards choices with more than
+    MAX_FLAT_COMBINATIONS actions pick their cards one at a time with
+    make_pick_choice, and with macro_actions main choices are replaced by
+    make_turn_choice. The outcome of each decision is the same, game_loop and
+    the UI keep the choices as they are."""
+    choice = get_next_choice(state, choices)
+    if choice is None:
+        return None
+    if macro_actions and choice.type == "main":
+        choice = make_turn_choice(state)
+    elif choice.kind == "choose-cards" and len(choice.actions) > MAX_FLAT_COMBINATIONS:
+        from gods.cards import make_pick_choice  # cards.py imports this module
+        choice = make_pick_choice(choice)
+    else:
+        return choice
+    get_actions(state, choice)
+    return choice
+
+
 def detailed_str(card: Card) -> str:
     counters_str = f" (+{card.counters})" if card.counters > 0 else (f" ({card.counters})" if card.counters < 0 else "")
     return f"{card.name} [{card.color.value} {card.card_type.value}, power {card.power}{counters_str}] - {card.effect}"
@@ -313,8 +416,10 @@ def display_game_state(game: Game_State, current_player_view: bool = True) -> No
         print("  points:", compute_player_score(game, i))
     print("\n" + "=" * 60)
 
-def game_loop(game: Game_State, agent: Agent, display: any = display_game_state) -> None:
-    choices = []
+def game_loop(game: Game_State, agent: Agent, display: any = display_game_state, choices: Optional[list[Choice]] = None) -> None:
+    """Play the game to the end with agent, starting from the pending choices if given."""
+    if choices is None:
+        choices = []
     while not game.game_over:
         choice = get_next_choice(game, choices)
         if choice is None:
@@ -323,13 +428,15 @@ def game_loop(game: Game_State, agent: Agent, display: any = display_game_state)
         if display is not None and choice.type == "main":
             display(game)
         
-        actions = choice.generate_actions(game, choice)
+        actions = get_actions(game, choice)
         if len(actions) == 1:
             index = 0
         else:
+            # the choices queued after this one, for agents that match positions (Agent_Ponder)
+            agent.observe_pending(choices)
             index = agent.choose_action(game, choice, actions)        
 
-        new_choices = choice.resolve(game, choice, index)
+        new_choices = choice.resolve(game, index)
         choices.extend(new_choices)
 
     if display is not None:
@@ -337,3 +444,31 @@ def game_loop(game: Game_State, agent: Agent, display: any = display_game_state)
     print("Game ended!")
     print(f"Player 1: {compute_player_score(game, 0)}")
     print(f"Player 2: {compute_player_score(game, 1)}")
+
+
+def random_policy(state: Game_State, choice: Choice, actions: list, rng: random.Random) -> int:
+    return rng.randrange(len(actions))
+
+
+def rollout(
+    state: Game_State,
+    choices: list[Choice],
+    policy: Callable[[Game_State, Choice, list, random.Random], int] = random_policy,
+    rng: Optional[random.Random] = None,
+) -> None:
+    """Play the game to the end with policy choosing every action.
+
+    Headless version of game_loop for search: no display, no output, and the
+    actions of each decision are generated once. choices are the pending
+    choices, they are consumed. rng drives the policy, the next stream of the
+    state's own (see game_rng) if None.
+    """
+    if rng is None:
+        rng = game_rng(state)
+    while True:
+        choice = get_next_choice(state, choices)
+        if choice is None:
+            return
+        actions = choice.actions  # just generated by get_next_choice
+        index = 0 if len(actions) == 1 else policy(state, choice, actions, rng)
+        choices.extend(choice.resolve(state, index))
@@ -41,10 +41,13 @@ def select_deck(available_cards: list[Card], player_name: str) -> list[Card]:
 
         choice = input("Enter choice: ").strip().upper()
 
+        # The deck holds copies, and cards compare by identity: match names.
+        chosen = {c.name for c in deck}
+
         if choice == 'AUTO':
-            remaining_cards = [c for c in available_cards if c not in deck]
+            remaining_cards = [c for c in available_cards if c.name not in chosen]
             random.shuffle(remaining_cards)
-            deck.extend(remaining_cards[:remaining])
+            deck.extend(copy.deepcopy(c) for c in remaining_cards[:remaining])
             break
 
         try:
@@ -52,7 +55,7 @@ def select_deck(available_cards: list[Card], player_name: str) -> list[Card]:
                 idx = int(choice[1:]) - 1
                 if 0 <= idx < len(wonders):
                     card = wonders[idx]
-                    if card not in deck:
+                    if card.name not in chosen:
                         deck.append(copy.deepcopy(card))
                         print(f"Added {card.name} to deck.")
                     else:
@@ -63,7 +66,7 @@ def select_deck(available_cards: list[Card], player_name: str) -> list[Card]:
                 idx = int(choice[1:]) - 1
                 if 0 <= idx < len(events):
                     card = events[idx]
-                    if card not in deck:
+                    if card.name not in chosen:
                         deck.append(copy.deepcopy(card))
                         print(f"Added {card.name} to deck.")
                     else:
@@ -1,7 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Callable, Optional
+from typing import Callable, Optional, Sequence
 from enum import Enum
+import hashlib
+import random
 
 
 class Card_Type(Enum):
@@ -17,17 +19,65 @@ class Card_Color(Enum):
     YELLOW = "yellow"
 
 
-@dataclass
-class Card:
+# Methods through which wonders in play react to the game, see subscribers().
+HOOKS = (
+    "on_draw", "on_draw_replacement", "on_destroy", "on_discard", "on_pass",
+    "on_turn_end", "on_turn_start", "power_modifier", "on_scoring",
+    "on_scoring_people", "wins_tie",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Card_Definition:
+    """What every copy of a card shares, loaded once from cards.json (see
+    get_card_definitions in setup.py). Copies of a game keep pointing at the
+    same definitions."""
     name: str
     card_type: Card_Type
-    power: int
     color: Card_Color
     effect: str
+    power: int  # printed power, only used for peoples
+
+    def __copy__(self) -> Card_Definition:
+        return self
+
+    def __deepcopy__(self, memo) -> Card_Definition:
+        return self
+
+
+_new_object = object.__new__  # see Card.clone
+
+
+# Cards compare by identity: two copies of a card with the same fields are
+# still different cards, and finding one in a zone must not compare fields.
+# Instances only hold what changes during a game, in slots, and read the rest
+# from their definition (the hashing functions use card.definition directly,
+# the properties cost a call). Subclasses are declared with eq=False,
+# slots=True as well. See Game_State.locate().
+@dataclass(eq=False, slots=True)
+class Card:
+    definition: Card_Definition
+    power: int
     destroyed: bool = False
     counters: int = 0  # +1 counters
     owner: Optional[int] = None  # player index who controls this card (for people)
-    id: int = -1
+    id: int = -1  # unique within a game, set by create_game
+
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    @property
+    def card_type(self) -> Card_Type:
+        return self.definition.card_type
+
+    @property
+    def color(self) -> Card_Color:
+        return self.definition.color
+
+    @property
+    def effect(self) -> str:
+        return self.definition.effect
 
     def on_draw(self, game: Game_State) -> list[Choice]: return []
     def on_draw_replacement(self, game: Game_State) -> list[Choice]: return []
@@ -44,6 +94,10 @@ class Card:
         """Modify another card's power. Override in subclasses."""
         return power
 
+    # Tags of the changes that can affect eval_points, see PEOPLE_POWER_TAGS.
+    # Not annotated: a class attribute, not a dataclass field.
+    metric_inputs = ()
+
     def eval_points(self, game: Game_State, player_index: int) -> int:
         """Evaluate points for a people card. Override in people subclasses."""
         return 0
@@ -60,6 +114,29 @@ class Card:
         """Whether this card breaks ties for a people. Override in subclasses."""
         return False
 
+    # Names of the HOOKS this class overrides, set by __init_subclass__.
+    # Not annotated, like metric_inputs.
+    hooks = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        # not super(): slots=True replaces the class the zero-argument form refers to
+        object.__init_subclass__(**kwargs)
+        cls.hooks = frozenset(name for name in HOOKS if getattr(cls, name) is not getattr(Card, name))
+
+    def clone(self) -> Card:
+        """Copy of this card. Fields are immutable values, so a flat copy is enough."""
+        card = _new_object(type(self))
+        card.definition = self.definition
+        card.power = self.power
+        card.destroyed = self.destroyed
+        card.counters = self.counters
+        card.owner = self.owner
+        card.id = self.id
+        return card
+
+    def __deepcopy__(self, memo) -> Card:
+        return self.clone()
+
 @dataclass
 class Player:
     name: str
@@ -68,21 +145,162 @@ class Player:
     discard: list[Card] = field(default_factory=list)
     wonders: list[Card] = field(default_factory=list)  # wonders in play
 
+    def clone(self) -> Player:
+        """Copy of this player and its cards."""
+        return Player(
+            name=self.name,
+            deck=clone_cards(self.deck),
+            hand=clone_cards(self.hand),
+            discard=clone_cards(self.discard),
+            wonders=clone_cards(self.wonders),
+        )
+
+
+def clone_cards(cards: list[Card]) -> list[Card]:
+    return [card.clone() for card in cards]
+
 def generate_no_actions(state: Game_State, choice) -> list:
     return []
 
 def resolve_nothing(state: Game_State, choice, index: int):
     pass
 
+
 @dataclass
-class Choice:
-    player_index: int = 0
-    type: str = "" # main, choose-card, choose-binary
-    generate_actions: Callable[[Game_State, Choice], list] = generate_no_actions
-    resolve: Callable[[Game_State, Choice, int], list[Choice]] = resolve_nothing
-    
+class Choice_Kind:
+    type: str  # what agents see: main, choose-card, choose-cards, choose-binary
+    generate_actions: Callable[[Game_State, Choice], Sequence]
+    resolve: Callable[[Game_State, Choice, int], Optional[list[Choice]]]
+
+
+CHOICE_KINDS: dict[str, Choice_Kind] = {}  # Choice.kind -> what it does, see register_choice_kind
+
+
+def register_choice_kind(kind: str, type: str, generate_actions, resolve) -> None:
+    """Make kind usable in Choice: generate_actions(state, choice) returns its
+    actions and resolve(state, choice, option_index) applies one of them and
+    returns the new choices (None for none)."""
+    CHOICE_KINDS[kind] = Choice_Kind(type, generate_actions, resolve)
+
+
+register_choice_kind("none", "none", generate_no_actions, resolve_nothing)
+
 
 @dataclass
+class Choice:
+    """A pending decision, as plain data dispatched through CHOICE_KINDS.
+
+    Choices refer to the card whose effect asks for them by id, so the same
+    choice acts on any copy of the state; they can be copied, compared,
+    pickled and sent to other processes.
+    """
+    kind: str = "none"
+    player_index: int = 0
+    source: int = -1  # id of the card asking for the choice, -1 for the turn structure
+    iteration: int = 0  # repetitions of the same effect, e.g. the nth card played by Prophecy
+    picked: tuple[int, ...] = ()  # positions already picked, see make_pick_choice in cards.py
+    actions: Optional[Sequence] = field(default=None, compare=False, repr=False)  # cached get_actions()
+    classes: Optional[list[int]] = field(default=None, compare=False, repr=False)  # cached get_action_classes()
+
+    @property
+    def type(self) -> str:
+        return CHOICE_KINDS[self.kind].type
+
+    def generate_actions(self, state: Game_State) -> Sequence:
+        return CHOICE_KINDS[self.kind].generate_actions(state, self)
+
+    def resolve(self, state: Game_State, option_index: int) -> list[Choice]:
+        return CHOICE_KINDS[self.kind].resolve(state, self, option_index) or []
+
+
+def get_actions(state: Game_State, choice: Choice) -> Sequence:
+    """Actions of a choice, generated once.
+
+    get_next_choice regenerates them every time it hands out a choice, so the
+    cached list always matches the state the choice is resolved in.
+    """
+    if choice.actions is None:
+        choice.actions = choice.generate_actions(state)
+        choice.classes = None
+    return choice.actions
+
+
+def clone_choice(choice: Choice) -> Choice:
+    """Copy of a choice without its cached actions."""
+    return Choice(choice.kind, choice.player_index, choice.source, choice.iteration, choice.picked)
+
+
+def choice_key(choice: Choice) -> tuple:
+    """Hashable description of a choice, equal for choices that behave the same."""
+    return (choice.kind, choice.player_index, choice.source, choice.iteration, choice.picked)
+
+
+def action_key(state: Game_State, action):
+    """Hashable description of an action that stays the same when cards move
+    around: a Card_Id is described by the area and owner of its card, its name
+    and hashed fields instead of its index (copies that differ by their
+    counters are different actions), a combination by the descriptions of its
+    cards."""
+    if isinstance(action, Card_Id):
+        if Card_Id.is_null(action):
+            return ("none",)
+        card = state.get_card(action)
+        return (action.area, action.owner_index, card.name) + tuple(getattr(card, name) for name in HASHED_CARD_FIELDS)
+    if isinstance(action, (tuple, list)):
+        return tuple(action_key(state, a) for a in action)
+    return action
+
+
+def equivalence_key(state: Game_State, action):
+    """Hashable description of an action, equal for actions with the same outcome
+    in state: a Card_Id is described by its card's name and hashed fields, and
+    by its index only in the areas where state_hash looks at positions, a
+    combination by the sorted descriptions of its cards."""
+    if isinstance(action, Card_Id):
+        if Card_Id.is_null(action):
+            return ("none",)
+        card = state.get_card(action)
+        index = action.card_index if action.area in ORDERED_AREAS else None
+        return (action.area, action.owner_index, index, card.name) + tuple(getattr(card, name) for name in HASHED_CARD_FIELDS)
+    if isinstance(action, (tuple, list)):
+        return tuple(sorted((equivalence_key(state, a) for a in action), key=repr))
+    return action
+
+
+def has_equivalent_cards(state: Game_State) -> bool:
+    """Whether two cards of the game share a name, without which no two actions
+    are equal by equivalence_key."""
+    cards = state.all_cards()
+    return len({card.name for card in cards}) < len(cards)
+
+
+def action_classes(state: Game_State, actions: Sequence) -> list[int]:
+    """Each action's index mapped to the first action equivalent to it by
+    equivalence_key."""
+    first: dict = {}
+    return [first.setdefault(equivalence_key(state, action), index) for index, action in enumerate(actions)]
+
+
+def get_action_classes(state: Game_State, choice: Choice) -> list[int]:
+    """action_classes of the choice's actions, computed once along with them
+    (see get_actions)."""
+    actions = get_actions(state, choice)
+    if choice.classes is None:
+        choice.classes = action_classes(state, actions)
+    return choice.classes
+
+
+def equivalent_actions(state: Game_State, actions: Sequence, order=None, classes: Optional[list[int]] = None) -> dict[int, int]:
+    """Each index in order (all of actions by default) mapped to the first one in
+    order equivalent to it by equivalence_key, itself for the first of a class.
+    classes are the action_classes of actions, computed here if None."""
+    if classes is None:
+        classes = action_classes(state, actions)
+    first: dict[int, int] = {}
+    return {index: first.setdefault(classes[index], index) for index in (range(len(actions)) if order is None else order)}
+
+
+@dataclass(slots=True)
 class Card_Id:
     area: str  # "deck", "hand", "discard", "wonders", "people"
     card_index: int
@@ -108,6 +326,83 @@ class Game_State:
     game_over: bool = False
     extra_turns: int = 0  # for Prophecy card
     shared_deck: list[Card] = field(default_factory=list)  # for Stars card
+    seed: int = 0  # of the game's random streams, see game_rng()
+    rng_draws: int = 0  # streams taken so far
+    journal: Optional[list] = field(default=None, compare=False, repr=False)  # undo log, see undo()
+    zobrist: Optional[int] = field(default=None, compare=False, repr=False)  # see state_hash()
+    power_cache: dict = field(default_factory=dict, compare=False, repr=False)  # see effective_power()
+    # Scoring caches, see refresh_people_points() in game.py
+    people_points: list[tuple[int, int]] = field(default_factory=list, compare=False, repr=False)
+    scores: Optional[list[int]] = field(default=None, compare=False, repr=False)
+    score_tags: set[str] = field(default_factory=set, compare=False, repr=False)  # what changed since
+    locations: Optional[dict[int, tuple]] = field(default=None, compare=False, repr=False)  # see locate()
+    hook_index: dict = field(default_factory=dict, compare=False, repr=False)  # see subscribers()
+
+    def clone(self) -> Game_State:
+        """Fast copy used by search instead of copy.deepcopy.
+
+        Only zones and card fields are copied. Pending choices refer to cards by
+        id, so they act on the copy as well (see clone_choice).
+        """
+        state = object.__new__(Game_State)
+        state.__dict__.update(self.__dict__)
+        state.players = [player.clone() for player in self.players]
+        state.peoples = clone_cards(self.peoples)
+        state.shared_deck = clone_cards(self.shared_deck)
+        state.locations = None if self.locations is None else dict(self.locations)
+        state.journal = None
+        state.power_cache = {}
+        state.hook_index = {}
+        state.people_points = list(self.people_points)
+        state.scores = None if self.scores is None else list(self.scores)
+        state.score_tags = set(self.score_tags)
+        return state
+
+    def __getstate__(self) -> dict:
+        # power_cache is keyed by id(card), which a copy made by pickle or
+        # deepcopy does not share
+        state = self.__dict__.copy()
+        state["power_cache"] = {}
+        return state
+
+    def zones(self) -> list[tuple[str, Optional[int], list[Card]]]:
+        """(area, owner_index, cards) of every zone, see get_zone()."""
+        zones = [("people", None, self.peoples), ("shared", None, self.shared_deck)]
+        for owner_index, player in enumerate(self.players):
+            for area in PLAYER_AREAS:
+                zones.append((area, owner_index, getattr(player, area)))
+        return zones
+
+    def all_cards(self) -> list[Card]:
+        return [card for _, _, zone in self.zones() for card in zone]
+
+    def card_locations(self) -> dict[int, tuple[str, Optional[int], int]]:
+        """Card.id -> (area, owner_index, index) of every card, so that finding a
+        card in its zone or checking which zone it is in never scans a list.
+
+        Built on first use, then kept up to date by the mutation functions below.
+        """
+        if self.locations is None:
+            self.locations = {}
+            for area, owner_index, zone in self.zones():
+                _relocate(self.locations, area, owner_index, zone, 0)
+        return self.locations
+
+    def locate(self, card_id: int) -> tuple[str, Optional[int], int]:
+        """(area, owner_index, index) of the card whose Card.id is card_id."""
+        return self.card_locations()[card_id]
+
+    def in_zone(self, card: Card, area: str, owner_index: Optional[int]) -> bool:
+        location = self.card_locations().get(card.id)
+        return location is not None and location[0] == area and location[1] == owner_index
+
+    def card_by_id(self, card_id: int) -> Card:
+        """The card whose Card.id is card_id, wherever it is."""
+        return self.card_at(*self.card_locations()[card_id])
+
+    def card_at(self, area: str, owner_index: Optional[int], index: int) -> Card:
+        """The card at a location of card_locations()."""
+        return get_zone(self, area, owner_index)[index]
 
     def active_player(self) -> Player:
         return self.players[self.current_player]
@@ -129,45 +424,364 @@ class Game_State:
 
     def switch_turn(self) -> None:
         if self.extra_turns > 0:
-            self.extra_turns -= 1
+            set_value(self, self, "extra_turns", self.extra_turns - 1)
             return
 
         if self.final_turn:
-            self.game_over = True
+            set_value(self, self, "game_over", True)
             return
 
-        self.current_player = 1 - self.current_player
+        set_value(self, self, "current_player", 1 - self.current_player)
 
         if self.game_ending and self.current_player != self.ending_player:
-            self.final_turn = True
+            set_value(self, self, "final_turn", True)
 
     def get_card(self, card_id: Card_Id) -> Card:
+        """The card at the position card_id names, read as card_by_id reads its
+        location. A Card_Id is a position, not a Card.id, so it is the location
+        itself, except that people ids carry the owner of the card while their
+        zone has none; the map checks that it names the card there."""
         assert not Card_Id.is_null(card_id)
-
-        if card_id.area == "people":
-            assert self.peoples[card_id.card_index].owner == card_id.owner_index
-            return self.peoples[card_id.card_index]
-        assert card_id.owner_index is not None
-
-        if card_id.area == "deck":
-            return self.players[card_id.owner_index].deck[card_id.card_index]
-        elif card_id.area == "hand":
-            return self.players[card_id.owner_index].hand[card_id.card_index]
-        elif card_id.area == "discard":
-            return self.players[card_id.owner_index].discard[card_id.card_index]
-        elif card_id.area == "wonders":
-            return self.players[card_id.owner_index].wonders[card_id.card_index]
-        else:
-            raise ValueError(f"Invalid card area: {card_id.area}")
+        people = card_id.area == "people"
+        location = (card_id.area, None if people else card_id.owner_index, card_id.card_index)
+        card = self.card_at(*location)
+        assert self.locate(card.id) == location and (not people or card.owner == card_id.owner_index)
+        return card
 
 
 def effective_power(game: Game_State, card: Card) -> int:
-    """Calculate effective power of a card, applying all wonder power modifiers."""
+    """Effective power of a card, cached in game.power_cache.
+
+    The cache is cleared by the mutation functions below whenever something a
+    power modifier can look at changes: power, counters or owner of a card, or
+    the content of a hand or of the wonders in play.
+    """
+    power = game.power_cache.get(id(card))
+    if power is None:
+        power = compute_effective_power(game, card)
+        game.power_cache[id(card)] = power
+    return power
+
+
+def compute_effective_power(game: Game_State, card: Card, skip: Optional[type] = None) -> int:
+    """Calculate effective power of a card, applying all wonder power modifiers.
+
+    The modifiers of wonders of class skip are left out (see Sky in cards.py).
+    """
     power = card.power + card.counters
     # Apply power modifiers from all wonders in play
-    for player in game.players:
-        for wonder in player.wonders:
-            power = wonder.power_modifier(game, card, power)
+    # hot path: the index lookup of subscribers() inlined
+    for wonders in game.hook_index.get("power_modifier") or subscribers(game, "power_modifier"):
+        for wonder in wonders:
+            if type(wonder) is not skip:
+                power = wonder.power_modifier(game, card, power)
     if power < 0:
         power = 0
-    return power
\ No newline at end of file
+    return power
+
+
+def subscribers(state: Game_State, hook: str) -> list[list[Card]]:
+    """Wonders in play whose class overrides hook, by player and in play order.
+
+    Most wonders implement one or two hooks, so events only call the cards that
+    react to them. Cached in state.hook_index; when a wonder enters or leaves
+    play only the lists of the hooks it implements are updated.
+    """
+    index = state.hook_index.get(hook)
+    if index is None:
+        index = [[w for w in player.wonders if hook in w.hooks] for player in state.players]
+        state.hook_index[hook] = index
+    return index
+
+
+# Mutations
+#
+# Once a game has started, every change to a Game_State goes through the
+# functions below. When state.journal is a list, each of them appends an entry
+# describing how to revert it, so search can apply a choice and roll it back
+# with undo() instead of copying the state.
+
+POWER_FIELDS = ("power", "counters", "owner")  # card fields that power modifiers read
+POWER_AREAS = ("hand", "wonders")  # zones that power modifiers read
+
+# Each change also adds a tag to state.score_tags: the area of a zone that
+# changed, or the name of a card field, prefixed with "people-" for peoples.
+# People cards list in metric_inputs the tags that can change their points.
+PEOPLE_POWER_TAGS = ("people-power", "people-counters", "power", "counters", "owner", "wonders")
+
+
+def _card_changed(state: Game_State, card: Card, name: str) -> None:
+    if name in POWER_FIELDS and state.power_cache:
+        state.power_cache.clear()
+    state.score_tags.add("people-" + name if card.definition.card_type == Card_Type.PEOPLE else name)
+
+
+def _relocate(locations: dict, area: str, owner_index: Optional[int], zone: list[Card], start: int) -> None:
+    """Record the locations of zone[start:], after cards were inserted or removed at start."""
+    for index in range(start, len(zone)):
+        locations[zone[index].id] = (area, owner_index, index)
+
+
+def _update_subscribers(state: Game_State, owner_index: int, card: Card) -> None:
+    """Refresh the hook_index lists that card belongs to, after it entered or left play.
+
+    The lists are replaced rather than modified, so an event looping over the
+    subscribers keeps the wonders that were in play when it started.
+    """
+    wonders = state.players[owner_index].wonders
+    for hook in card.hooks:
+        index = state.hook_index.get(hook)
+        if index is not None:
+            index[owner_index] = [w for w in wonders if hook in w.hooks]
+
+
+def _zone_changed(state: Game_State, area: str) -> None:
+    if area in POWER_AREAS and state.power_cache:
+        state.power_cache.clear()
+    state.score_tags.add(area)
+
+
+def invalidate_caches(state: Game_State) -> None:
+    """Forget everything derived from the state, after changing it without the functions below."""
+    state.zobrist = None
+    state.power_cache.clear()
+    state.hook_index.clear()
+    state.locations = None
+    state.people_points = []
+    state.scores = None
+    state.score_tags.clear()
+
+def start_journal(state: Game_State) -> None:
+    if state.journal is None:
+        state.journal = []
+
+
+def journal_mark(state: Game_State) -> int:
+    """Position to pass to undo() to revert everything done after this call."""
+    return len(state.journal)
+
+
+def set_value(state: Game_State, obj, name: str, value) -> None:
+    """Set a field of a card or of the state itself."""
+    old_value = getattr(obj, name)
+    if state.journal is not None:
+        state.journal.append(("value", obj, name, old_value))
+    if state.zobrist is None:
+        setattr(obj, name, value)
+    elif obj is state:
+        delta = _zobrist_keys["state", name, value] - _zobrist_keys["state", name, old_value]
+        state.zobrist = (state.zobrist + delta) & HASH_MASK
+        setattr(obj, name, value)
+    else:
+        # a card counts in the hash only while in a zone, see _card_key
+        location = state.card_locations().get(obj.id)
+        if location is None:
+            setattr(obj, name, value)
+        else:
+            area, owner_index, index = location
+            position = index if area in ORDERED_AREAS else None
+            old_key = _card_key(obj, area, owner_index, position)
+            setattr(obj, name, value)
+            delta = _card_key(obj, area, owner_index, position) - old_key
+            state.zobrist = (state.zobrist + delta) & HASH_MASK
+    if obj is not state:
+        _card_changed(state, obj, name)
+
+
+PLAYER_AREAS = ("deck", "hand", "discard", "wonders")
+
+
+def get_zone(state: Game_State, area: str, owner_index: Optional[int]) -> list[Card]:
+    """Card list for an area: "deck", "hand", "discard", "wonders", "people" or "shared"."""
+    if area == "people":
+        return state.peoples
+    if area == "shared":
+        return state.shared_deck
+    return getattr(state.players[owner_index], area)
+
+
+def insert_card(state: Game_State, area: str, owner_index: Optional[int], card: Card, index: Optional[int] = None) -> None:
+    """Put a card in a zone, at the end unless index is given."""
+    zone = get_zone(state, area, owner_index)
+    if index is None:
+        index = len(zone)
+    if state.zobrist is not None:
+        state.zobrist -= _zone_hash(area, owner_index, zone, index)
+    zone.insert(index, card)
+    if state.locations is not None:
+        if index == len(zone) - 1:
+            state.locations[card.id] = (area, owner_index, index)
+        else:
+            _relocate(state.locations, area, owner_index, zone, index)
+    if state.zobrist is not None:
+        state.zobrist = (state.zobrist + _zone_hash(area, owner_index, zone, index)) & HASH_MASK
+    _zone_changed(state, area)
+    if area == "wonders" and card.hooks:
+        _update_subscribers(state, owner_index, card)
+    if state.journal is not None:
+        state.journal.append(("insert", area, owner_index, index))
+
+
+def remove_card(state: Game_State, area: str, owner_index: Optional[int], index: int) -> Card:
+    """Take the card at index out of a zone."""
+    zone = get_zone(state, area, owner_index)
+    if state.zobrist is not None:
+        state.zobrist -= _zone_hash(area, owner_index, zone, index)
+    card = zone.pop(index)
+    if state.locations is not None:
+        del state.locations[card.id]
+        if index < len(zone):
+            _relocate(state.locations, area, owner_index, zone, index)
+    if state.zobrist is not None:
+        state.zobrist = (state.zobrist + _zone_hash(area, owner_index, zone, index)) & HASH_MASK
+    _zone_changed(state, area)
+    if area == "wonders" and card.hooks:
+        _update_subscribers(state, owner_index, card)
+    if state.journal is not None:
+        state.journal.append(("remove", area, owner_index, index, card))
+    return card
+
+
+def game_rng(state: Game_State) -> random.Random:
+    """Next random stream of the game, for a shuffle or any other chance event.
+
+    The game's randomness is a function of (seed, rng_draws) rather than a
+    generator object: clones copy two ints instead of a Mersenne Twister state,
+    undo() rewinds rng_draws like any other field, and nothing outside the game,
+    such as an agent or a rollout on another state, can shift its draws.
+    """
+    rng = random.Random(f"{state.seed}/{state.rng_draws}")
+    set_value(state, state, "rng_draws", state.rng_draws + 1)
+    return rng
+
+
+def spawn_seed(rng: random.Random) -> int:
+    """Seed for an independent stream derived from rng, e.g. for a worker or a sampled game."""
+    return rng.getrandbits(64)
+
+
+def shuffle_zone(state: Game_State, area: str, owner_index: Optional[int]) -> None:
+    cards = get_zone(state, area, owner_index)[:]
+    game_rng(state).shuffle(cards)
+    set_zone_order(state, area, owner_index, cards)
+
+
+def set_zone_order(state: Game_State, area: str, owner_index: Optional[int], cards: list[Card]) -> None:
+    """Replace the content of a zone with a permutation of it."""
+    zone = get_zone(state, area, owner_index)
+    if state.journal is not None:
+        state.journal.append(("order", area, owner_index, zone[:]))
+    if state.zobrist is not None:
+        state.zobrist -= _zone_hash(area, owner_index, zone, 0)
+    zone[:] = cards
+    if state.locations is not None:
+        _relocate(state.locations, area, owner_index, zone, 0)
+    if area == "wonders":
+        state.hook_index.clear()
+    if state.zobrist is not None:
+        state.zobrist = (state.zobrist + _zone_hash(area, owner_index, zone, 0)) & HASH_MASK
+
+
+def journal_choices(state: Game_State, choices: list[Choice]) -> None:
+    """Record the pending choice queue before it gets modified."""
+    if state.journal is not None:
+        state.journal.append(("choices", choices, choices[:]))
+
+
+def undo(state: Game_State, mark: int) -> None:
+    """Revert all mutations recorded after journal_mark() returned mark."""
+    journal = state.journal
+    state.journal = None  # reverting is not recorded
+    while len(journal) > mark:
+        entry = journal.pop()
+        kind = entry[0]
+        if kind == "value":
+            _, obj, name, value = entry
+            set_value(state, obj, name, value)
+        elif kind == "insert":
+            _, area, owner_index, index = entry
+            remove_card(state, area, owner_index, index)
+        elif kind == "remove":
+            _, area, owner_index, index, card = entry
+            insert_card(state, area, owner_index, card, index)
+        elif kind == "order":
+            _, area, owner_index, cards = entry
+            set_zone_order(state, area, owner_index, cards)
+        elif kind == "choices":
+            _, choices, saved = entry
+            choices[:] = saved
+    state.journal = journal
+
+
+# Hashing
+#
+# Zobrist-style hash of a position: every (state field, value) and every card
+# as it is where it is, (card, zone, position, field values), has a fixed random
+# 64-bit key, and the hash of a state is the sum of the keys of the facts that
+# hold in it. A card's fields share its key with its place, so two copies of a
+# card that trade their counters between zones give another hash, while copies
+# that are equal in every field are interchangeable. Keys are summed rather than
+# xored so that two equal cards in the same zone do not cancel out. The
+# mutation functions above keep state.zobrist up to date once it has been
+# computed, at the cost of a few dictionary lookups per change.
+
+HASH_MASK = (1 << 64) - 1
+VERIFY_HASH = False  # recompute the hash from scratch in state_hash() and compare
+
+HASHED_STATE_FIELDS = (
+    "current_player", "current_phase", "game_ending", "ending_player",
+    "final_turn", "game_over", "extra_turns", "seed", "rng_draws",
+)
+HASHED_CARD_FIELDS = ("power", "counters", "destroyed", "owner")  # the fields of _card_key
+ORDERED_AREAS = ("deck", "people", "shared")  # position of a card matters
+
+class _Zobrist_Keys(dict):
+    """Keys by fact tuple, generated on first use. Indexing it directly is the
+    fast path used by the mutation functions."""
+    def __missing__(self, parts: tuple) -> int:
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+        key = self[parts] = int.from_bytes(digest, "little")
+        return key
+
+
+_zobrist_keys = _Zobrist_Keys()
+
+
+def zobrist_key(*parts) -> int:
+    """Random 64-bit key for a fact, the same in every process."""
+    return _zobrist_keys[parts]
+
+
+def _card_key(card: Card, area: str, owner_index: Optional[int], position: Optional[int]) -> int:
+    """Key of card with its fields, at position of a zone (None where the order does not matter)."""
+    return _zobrist_keys[
+        "card", card.definition.name, area, owner_index, position, card.power, card.counters, card.destroyed, card.owner
+    ]
+
+
+def _zone_hash(area: str, owner_index: Optional[int], zone: list[Card], start: int) -> int:
+    """Sum of the card keys of zone[start:]."""
+    ordered = area in ORDERED_AREAS
+    total = 0
+    for index in range(start, len(zone)):
+        total += _card_key(zone[index], area, owner_index, index if ordered else None)
+    return total
+
+
+def compute_hash(state: Game_State) -> int:
+    """Hash of a state computed from scratch."""
+    total = 0
+    for name in HASHED_STATE_FIELDS:
+        total += zobrist_key("state", name, getattr(state, name))
+    for area, owner_index, zone in state.zones():
+        total += _zone_hash(area, owner_index, zone, 0)
+    return total & HASH_MASK
+
+
+def state_hash(state: Game_State) -> int:
+    """64-bit hash of the position, maintained incrementally after the first call."""
+    if state.zobrist is None:
+        state.zobrist = compute_hash(state)
+    elif VERIFY_HASH:
+        assert state.zobrist == compute_hash(state), "incremental hash is out of sync"
+    return state.zobrist
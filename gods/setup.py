@@ -1,6 +1,7 @@
 
-from gods.models import Card, Card_Type, Card_Color, Player, Game_State, Choice
-from gods.cards import create_card
+from gods.models import Card, Card_Definition, Card_Type, Card_Color, Player, Game_State, Choice, spawn_seed
+from gods.cards import create_card, create_definition
+from typing import Optional
 import json
 import copy
 import random
@@ -10,11 +11,21 @@ def load_cards_from_json(filepath: str) -> list[dict]:
         return json.load(f)
 
 
+_card_definitions: Optional[tuple[Card_Definition, ...]] = None
+
+
+def get_card_definitions() -> tuple[Card_Definition, ...]:
+    """Definitions of all cards, read from cards.json once and shared by every card."""
+    global _card_definitions
+    if _card_definitions is None:
+        import os
+        filepath = os.path.join(os.path.dirname(__file__), "cards.json")
+        _card_definitions = tuple(create_definition(d) for d in load_cards_from_json(filepath))
+    return _card_definitions
+
+
 def get_all_cards() -> list[Card]:
-    import os
-    filepath = os.path.join(os.path.dirname(__file__), "cards.json")
-    data = load_cards_from_json(filepath)
-    return [create_card(d, 3) for d in data]
+    return [create_card(d, 3) for d in get_card_definitions()]
 
 
 def get_people_cards() -> list[Card]:
@@ -25,8 +36,14 @@ def get_playable_cards() -> list[Card]:
     return [c for c in get_all_cards() if c.card_type != Card_Type.PEOPLE]
 
 
-def create_game(player1_deck: list[Card], player2_deck: list[Card], people_cards: list[Card], shared_deck: list[Card]) -> Game_State:
-    """Initialize a new game with the given decks and people cards."""
+def create_game(player1_deck: list[Card], player2_deck: list[Card], people_cards: list[Card], shared_deck: list[Card], rng: Optional[random.Random] = None) -> Game_State:
+    """Initialize a new game with the given decks and people cards.
+
+    rng shuffles the decks and seeds the game's own random streams (see
+    game_rng), a fresh unseeded generator if None.
+    """
+    if rng is None:
+        rng = random.Random()
     p1 = Player(name="Player 1", deck=player1_deck)
     p2 = Player(name="Player 2", deck=player2_deck)
     for i, card in enumerate(p1.deck):
@@ -34,14 +51,17 @@ def create_game(player1_deck: list[Card], player2_deck: list[Card], people_cards
     for i, card in enumerate(p2.deck):
         p2.deck[i].owner = 1
     
-    random.shuffle(p1.deck)
-    random.shuffle(p2.deck)
+    rng.shuffle(p1.deck)
+    rng.shuffle(p2.deck)
 
     game = Game_State(
         players=[p1, p2],
-        peoples=people_cards
+        peoples=people_cards,
+        seed=spawn_seed(rng),
     )
     game.shared_deck = shared_deck
+    for i, card in enumerate(game.all_cards()):
+        card.id = i
 
     for player in game.players:
         for _ in range(5):
@@ -50,18 +70,20 @@ def create_game(player1_deck: list[Card], player2_deck: list[Card], people_cards
                 player.hand.append(card)
     return game
 
-def quick_setup(seed: int) -> Game_State:
-    if seed is not None:
-        random.seed(seed)
+def quick_setup(seed: Optional[int] = None) -> Game_State:
+    """Quick setup with random decks and people cards.
 
-    """Quick setup with random decks and people cards."""
+    The same seed gives the same game, including its later shuffles, whatever
+    else uses the random module meanwhile.
+    """
+    rng = random.Random(seed)
     all_playable = get_playable_cards()
     for i, card in enumerate(all_playable):
-        all_playable[i].power = random.randint(1, 5)
+        all_playable[i].power = rng.randint(1, 5)
     
 
     # Random decks for both players
-    random.shuffle(all_playable)
+    rng.shuffle(all_playable)
     deck1 = []
     deck2 = []
     for i in range(10):
@@ -70,10 +92,27 @@ def quick_setup(seed: int) -> Game_State:
 
     # Random 3 people cards
     all_people = get_people_cards()
-    random.shuffle(all_people)
+    rng.shuffle(all_people)
     peoples = []
     for i in range(3):
         peoples.append(all_people.pop())
 
-    return create_game(deck1, deck2, peoples, all_playable)
+    return create_game(deck1, deck2, peoples, all_playable, rng)
+
 
+
+def doubled_setup(seed: Optional[int] = None) -> Game_State:
+    """quick_setup with two copies of 5 cards in each deck."""
+    rng = random.Random(seed)
+    cards = get_playable_cards()
+    for card in cards:
+        card.power = rng.randint(1, 5)
+    rng.shuffle(cards)
+    decks = [[], []]
+    for deck in decks:
+        for _ in range(5):
+            card = cards.pop()
+            deck += [card, card.clone()]
+    peoples = get_people_cards()
+    rng.shuffle(peoples)
+    return create_game(decks[0], decks[1], peoples[:3], cards, rng)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+import random
+from typing import Iterator
+
+from gods.models import Game_State, Choice, HASHED_STATE_FIELDS, get_actions, start_journal, journal_mark, undo
+from gods.game import get_next_choice, check_people_conditions
+
+
+def random_game(state: Game_State, rng: random.Random) -> Iterator[tuple[Choice, list[Choice]]]:
+    """Play state to the end with random actions, yielding (choice, pending
+    choices) before each move."""
+    check_people_conditions(state)
+    choices: list[Choice] = []
+    while (choice := get_next_choice(state, choices)) is not None:
+        yield choice, choices
+        choices.extend(choice.resolve(state, rng.randrange(len(choice.generate_actions(state)))))
+
+
+def play_and_undo(state: Game_State, rng: random.Random) -> Iterator[str]:
+    """Play state to the end with random actions on a journal, as minimax does,
+    then undo the moves one by one, yielding "move n" or "undo n" after each."""
+    check_people_conditions(state)
+    start_journal(state)
+    choices: list[Choice] = []
+    marks = []
+    while True:
+        marks.append(journal_mark(state))
+        choice = get_next_choice(state, choices)
+        if choice is None:
+            break
+        choices = list(choice.resolve(state, rng.randrange(len(get_actions(state, choice))))) + choices
+        yield f"move {len(marks)}"
+    for move, mark in reversed(list(enumerate(marks))):
+        undo(state, mark)
+        yield f"undo {move}"
+
+
+def same_state(a: Game_State, b: Game_State) -> bool:
+    """Whether a and b have the same fields, zones and cards, card by card."""
+    def card_fields(card):
+        return (type(card), card.definition, card.power, card.destroyed, card.counters, card.owner, card.id)
+    return (
+        [getattr(a, name) for name in HASHED_STATE_FIELDS] == [getattr(b, name) for name in HASHED_STATE_FIELDS]
+        and [player.name for player in a.players] == [player.name for player in b.players]
+        and [(area, owner_index, [card_fields(card) for card in zone]) for area, owner_index, zone in a.zones()]
+        == [(area, owner_index, [card_fields(card) for card in zone]) for area, owner_index, zone in b.zones()]
+    )
@@ -0,0 +1,54 @@
+from __future__ import annotations
+import random
+import unittest
+
+from gods.models import Card_Id, action_classes, get_action_classes, get_actions, equivalent_actions, action_key
+from gods.setup import doubled_setup
+from gods.tests import random_game
+
+
+class Test_Action_Classes(unittest.TestCase):
+    def test_cached_with_actions(self):
+        """get_action_classes agrees with action_classes on every choice of random
+        games with doubled decks, and is recomputed with the actions."""
+        rng = random.Random(0)
+        collapsed = 0
+        for game_seed in range(10):
+            state = doubled_setup(game_seed)
+            for choice, _ in random_game(state, rng):
+                classes = get_action_classes(state, choice)
+                self.assertEqual(classes, action_classes(state, get_actions(state, choice)))
+                self.assertIs(get_action_classes(state, choice), classes)
+                collapsed += sum(1 for index, first in enumerate(classes) if first != index)
+                choice.actions = None
+                get_actions(state, choice)
+                self.assertIsNone(choice.classes)
+        self.assertGreater(collapsed, 0)  # doubled decks have equivalent actions
+
+    def test_first_in_order(self):
+        state = doubled_setup(0)
+        classes = [0, 1, 0, 1, 4]
+        same = equivalent_actions(state, [None] * 5, [3, 2, 1, 0, 4], classes)
+        self.assertEqual(same, {3: 3, 2: 2, 1: 3, 0: 2, 4: 4})
+
+
+class Test_Action_Key(unittest.TestCase):
+    def test_copies(self):
+        """Two copies of a card in hand are one action for ISMCTS while they are
+        equal, two once one of them has counters."""
+        state = doubled_setup(0)
+        hand = state.players[0].hand + state.players[0].deck
+        names = [card.name for card in hand]
+        first = next(i for i, name in enumerate(names) if names.count(name) > 1)
+        second = names.index(names[first], first + 1)
+        state.players[0].hand = [hand[first], hand[second]]
+        state.players[0].deck = [card for i, card in enumerate(hand) if i not in (first, second)]
+        ids = [Card_Id(area="hand", card_index=i, owner_index=0) for i in range(2)]
+        self.assertEqual(action_key(state, ids[0]), action_key(state, ids[1]))
+        hand[second].counters = 2
+        self.assertNotEqual(action_key(state, ids[0]), action_key(state, ids[1]))
+        self.assertEqual(action_key(state, (ids[1],)), (action_key(state, ids[1]),))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+from __future__ import annotations
+import random
+import unittest
+
+from gods.models import compute_hash
+from gods.compact import encode_state, decode_state
+from gods.setup import quick_setup, doubled_setup
+from gods.tests import random_game, same_state
+
+
+class Test_Compact(unittest.TestCase):
+    def test_round_trip(self):
+        """Every position of random games survives encoding and decoding, card
+        order included."""
+        rng = random.Random(0)
+        for game_seed in range(20):
+            state = (doubled_setup if game_seed % 2 else quick_setup)(game_seed)
+            for _ in random_game(state, rng):
+                compact = encode_state(state)
+                decoded = decode_state(compact)
+                self.assertTrue(same_state(decoded, state))
+                self.assertEqual(encode_state(decoded), compact)
+                self.assertEqual(encode_state(decoded).order, compact.order)
+                self.assertEqual(compute_hash(decoded), compute_hash(state))
+
+
+if __name__ == "__main__":
+    unittest.main()
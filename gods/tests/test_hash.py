@@ -0,0 +1,67 @@
+from __future__ import annotations
+import random
+import unittest
+import unittest.mock
+
+import gods.models
+from gods.models import Game_State, Card, state_hash, compute_hash, set_value, insert_card, remove_card
+from gods.setup import quick_setup, doubled_setup
+from gods.tests import random_game, play_and_undo
+
+
+def two_copies(state: Game_State) -> tuple[Card, Card]:
+    """Two copies of a card of the first player, moved to their wonders and discard."""
+    deck = state.players[0].deck
+    names = [card.name for card in deck]
+    index = next(i for i, name in enumerate(names) if names.count(name) > 1)
+    first = remove_card(state, "deck", 0, index)
+    second = remove_card(state, "deck", 0, names.index(first.name, index + 1) - 1)
+    insert_card(state, "wonders", 0, first)
+    insert_card(state, "discard", 0, second)
+    return first, second
+
+
+class Test_Hash(unittest.TestCase):
+    def test_play_and_undo(self):
+        """The incremental hash agrees with compute_hash after every move and every
+        undo of random games, half of them with doubled decks."""
+        rng = random.Random(0)
+        for game_index in range(40):
+            state = (doubled_setup if game_index % 2 else quick_setup)(game_index)
+            state_hash(state)
+            for step in play_and_undo(state, rng):
+                self.assertEqual(state_hash(state), compute_hash(state), f"game {game_index}, {step}")
+
+    def test_verified_games(self):
+        """Random games with VERIFY_HASH on: the incremental hash is compared with
+        compute_hash at every use."""
+        rng = random.Random(1)
+        with unittest.mock.patch.object(gods.models, "VERIFY_HASH", True):
+            for game_seed in range(20):
+                state = quick_setup(game_seed)
+                for _ in random_game(state, rng):
+                    state_hash(state)
+
+    def test_fields_where_the_card_is(self):
+        """Copies of a card that trade their counters between zones give different
+        positions, copies equal in every field are interchangeable."""
+        hashes = {}
+        for boosted in ("in play", "discarded", "other copy in play"):
+            state = doubled_setup(0)
+            state_hash(state)
+            in_play, discarded = two_copies(state)
+            if boosted == "other copy in play":
+                remove_card(state, "wonders", 0, 0)
+                remove_card(state, "discard", 0, 0)
+                insert_card(state, "wonders", 0, discarded)
+                insert_card(state, "discard", 0, in_play)
+                in_play, discarded = discarded, in_play
+            set_value(state, discarded if boosted == "discarded" else in_play, "counters", 3)
+            hashes[boosted] = state_hash(state)
+            self.assertEqual(hashes[boosted], compute_hash(state))
+        self.assertNotEqual(hashes["in play"], hashes["discarded"])
+        self.assertEqual(hashes["in play"], hashes["other copy in play"])
+
+
+if __name__ == "__main__":
+    unittest.main()
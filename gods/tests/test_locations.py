@@ -0,0 +1,32 @@
+from __future__ import annotations
+import random
+import unittest
+
+from gods.models import Card_Id, invalidate_caches
+from gods.setup import quick_setup, doubled_setup
+from gods.tests import play_and_undo
+
+
+class Test_Locations(unittest.TestCase):
+    def test_play_and_undo(self):
+        """The maintained location map equals a fresh one after every move and
+        every undo of random games, half of them with doubled decks, and every
+        position resolves to the card the map puts there."""
+        rng = random.Random(0)
+        for game_index in range(40):
+            state = (doubled_setup if game_index % 2 else quick_setup)(game_index)
+            state.card_locations()
+            for step in play_and_undo(state, rng):
+                fresh = state.clone()
+                invalidate_caches(fresh)
+                self.assertEqual(state.card_locations(), fresh.card_locations(), f"game {game_index}, {step}")
+                for area, owner_index, zone in state.zones():
+                    for index, card in enumerate(zone):
+                        self.assertIs(state.card_by_id(card.id), card)
+                        if area != "shared":
+                            card_id = Card_Id(area, index, card.owner if area == "people" else owner_index)
+                            self.assertIs(state.get_card(card_id), card)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+import random
+import unittest
+import unittest.mock
+
+import gods.agents.mcts
+from gods.agents.mcts import Node_Store, Agent_MCTS, NO_KEY, MIXED_KEYS
+
+
+def small_tree() -> Node_Store:
+    """A root with three children, the second with two children of its own."""
+    tree = Node_Store()
+    tree.add_nodes(-1, 1)
+    tree.expand(0, 3)
+    tree.expand(2, 2)
+    for node, (visits, wins) in enumerate([(10, 2.0), (3, 1.0), (6, 1.5), (1, -1.0), (4, 2.0), (2, 0.5)]):
+        tree.visits[node] = visits
+        tree.wins[node] = wins
+    return tree
+
+
+class Test_Node_Store(unittest.TestCase):
+    def test_children_contiguous(self):
+        tree = small_tree()
+        self.assertEqual(tree.size, 6)
+        self.assertEqual((tree.first_child[0], tree.num_children[0]), (1, 3))
+        self.assertEqual((tree.first_child[2], tree.num_children[2]), (4, 2))
+        self.assertEqual(list(tree.parent), [-1, 0, 0, 0, 2, 2])
+        self.assertEqual(tree.first_child[1], -1)
+
+    def test_subtree(self):
+        subtree = small_tree().subtree(2)
+        self.assertEqual(subtree.size, 3)
+        self.assertEqual((subtree.visits[0], subtree.first_child[0], subtree.num_children[0]), (6, 1, 2))
+        self.assertEqual(list(subtree.visits[1:]), [4, 2])
+        self.assertEqual(list(subtree.wins), [1.5, 2.0, 0.5])
+
+    def test_record_position(self):
+        tree = small_tree()
+        tree.record_position(1, 100)
+        tree.record_position(1, 100)
+        self.assertEqual(tree.positions, {100: 1})
+        tree.record_position(1, 200)  # reached in another position: not reusable
+        self.assertEqual(tree.key[1], MIXED_KEYS)
+        self.assertEqual(tree.positions, {})
+        self.assertEqual(tree.key[2], NO_KEY)
+
+    def test_num_visited(self):
+        tree = small_tree()
+        tree.expand(1, 4)
+        self.assertEqual(tree.num_visited(), 6)
+
+    def test_best_child(self):
+        agent = Agent_MCTS()
+        agent.tree = small_tree()
+        agent.tree.visits[3] = 0
+        self.assertEqual(agent.best_child(0, 3), 3)  # unvisited first
+        # past num_actions skipped, then UCB1: 1/3 + 1.41 sqrt(ln 10 / 3) > 1.5/6 + 1.41 sqrt(ln 10 / 6)
+        self.assertEqual(agent.best_child(0, 2), 1)
+
+    @unittest.skipIf(gods.agents.mcts.np is None, "NumPy is not installed")
+    def test_wide_node_with_numpy(self):
+        """Nodes with NUMPY_MIN_CHILDREN children or more pick the same child with
+        NumPy as with the plain loop."""
+        rng = random.Random(0)
+        agent = Agent_MCTS()
+        tree = agent.tree = Node_Store()
+        tree.add_nodes(-1, 1)
+        num_children = gods.agents.mcts.NUMPY_MIN_CHILDREN + 5
+        tree.expand(0, num_children)
+        for child in range(1, num_children + 1):
+            tree.visits[child] = rng.randrange(1, 50)
+            tree.wins[child] = rng.uniform(-1.0, 1.0) * tree.visits[child]
+        tree.visits[0] = sum(tree.visits[1:])
+        with_numpy = agent.best_child(0, num_children)
+        with unittest.mock.patch.object(gods.agents.mcts, "np", None):
+            self.assertEqual(agent.best_child(0, num_children), with_numpy)
+
+
+if __name__ == "__main__":
+    unittest.main()
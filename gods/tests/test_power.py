@@ -0,0 +1,51 @@
+from __future__ import annotations
+import random
+import unittest
+
+from gods.models import Game_State, effective_power, compute_effective_power, invalidate_caches
+from gods.setup import quick_setup, doubled_setup, get_playable_cards
+from gods.tests import random_game
+
+
+def two_skies_setup(seed: int) -> Game_State:
+    """quick_setup with two Skies (powers 1 and 3) and a Moon in play for the first player."""
+    state = quick_setup(seed)
+    cards = {card.name: card for card in get_playable_cards()}
+    wonders = [cards["Sky"], cards["Sky"].clone(), cards["Moon"]]
+    for card, power in zip(wonders, (1, 3, 2)):
+        card.power = power
+        card.owner = 0
+        card.id = len(state.all_cards())
+        state.players[0].wonders.append(card)
+    invalidate_caches(state)
+    return state
+
+
+class Test_Power(unittest.TestCase):
+    def assert_order_independent(self, state: Game_State) -> None:
+        """effective_power must not depend on which card is asked about first, and
+        must agree with compute_effective_power."""
+        forward, backward = state.clone(), state.clone()
+        forward_powers = [effective_power(forward, card) for card in forward.all_cards()]
+        backward_powers = [effective_power(backward, card) for card in reversed(backward.all_cards())][::-1]
+        computed = [compute_effective_power(state, card) for card in state.all_cards()]
+        self.assertEqual(forward_powers, computed)
+        self.assertEqual(backward_powers, computed)
+
+    def test_two_skies(self):
+        """A Sky's bonus leaves out the other Sky's (rules.md): the Skies get +3 and
+        +1, the Moon +1 and +3, and the result does not depend on the order."""
+        state = two_skies_setup(0)
+        self.assert_order_independent(state)
+        self.assertEqual([effective_power(state, card) for card in state.players[0].wonders], [4, 4, 6])
+
+    def test_random_games(self):
+        rng = random.Random(0)
+        for game_seed in range(100):
+            state = doubled_setup(game_seed)
+            for _ in random_game(state, rng):
+                self.assert_order_independent(state)
+
+
+if __name__ == "__main__":
+    unittest.main()
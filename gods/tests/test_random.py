@@ -0,0 +1,42 @@
+from __future__ import annotations
+import contextlib
+import io
+import random
+import unittest
+
+from gods.models import Choice, clone_choice
+from gods.game import get_next_choice, check_people_conditions, rollout, player_score
+from gods.setup import quick_setup
+
+
+class Test_Random_Streams(unittest.TestCase):
+    def test_reproducible(self):
+        """The same seed plays out identically with a rollout from every decision and
+        a draw from the random module in between, as a searching agent would do."""
+        def play(seed: int, meddle: bool) -> tuple[list[int], int]:
+            state = quick_setup(seed)
+            check_people_conditions(state)
+            agent_rng = random.Random(seed)
+            choices: list[Choice] = []
+            trace = []
+            while (choice := get_next_choice(state, choices)) is not None:
+                actions = choice.generate_actions(state)
+                if meddle:
+                    random.random()
+                    rollout(state.clone(), [clone_choice(choice)] + [clone_choice(c) for c in choices])
+                index = agent_rng.randrange(len(actions))
+                trace.append(index)
+                choices.extend(choice.resolve(state, index))
+            return trace + [player_score(state, 0), player_score(state, 1)], state.rng_draws
+
+        shuffled = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for seed in range(100):
+                trace, draws = play(seed, False)
+                self.assertEqual(play(seed, True)[0], trace, f"seed {seed}")
+                shuffled += draws > 0
+        self.assertGreater(shuffled, 0)  # some games drew from the game's own stream
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+import random
+import unittest
+
+from gods.models import Choice, get_actions, start_journal, journal_mark, undo
+from gods.game import get_next_choice, check_people_conditions
+from gods.setup import quick_setup, doubled_setup
+from gods.tests import same_state
+
+
+class Test_Replay(unittest.TestCase):
+    def test_play_and_undo(self):
+        """Random games played on one journaled state, as minimax does, then undone
+        move by move. Each undo must give back the state and pending choices from
+        before the move, as kept by clone(). Half of the games have doubled decks,
+        where two cards can only be told apart by their place."""
+        rng = random.Random(0)
+        for game_index in range(40):
+            state = (doubled_setup if game_index % 2 else quick_setup)(game_index)
+            check_people_conditions(state)
+            start_journal(state)
+            choices: list[Choice] = []
+            history = []  # (mark, clone, queue, its choices) before each move
+            while True:
+                history.append((journal_mark(state), state.clone(), choices, choices[:]))
+                choice = get_next_choice(state, choices)
+                if choice is None:
+                    break
+                new_choices = choice.resolve(state, rng.randrange(len(get_actions(state, choice))))
+                choices = list(new_choices) + choices
+            for move, (mark, before, queue, queued) in reversed(list(enumerate(history))):
+                undo(state, mark)
+                self.assertTrue(same_state(state, before), f"game {game_index}, undo {move}")
+                self.assertEqual(len(queue), len(queued))
+                self.assertTrue(all(a is b for a, b in zip(queue, queued)), f"game {game_index}, undo {move}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import random
+import unittest
+import unittest.mock
+
+import gods.game
+from gods.game import player_score, compute_player_score
+from gods.setup import quick_setup, doubled_setup
+from gods.tests import random_game, play_and_undo
+
+
+class Test_Scores(unittest.TestCase):
+    def test_play_and_undo(self):
+        """The maintained scores agree with compute_player_score after every move
+        and every undo of random games, half of them with doubled decks."""
+        rng = random.Random(0)
+        for game_index in range(40):
+            state = (doubled_setup if game_index % 2 else quick_setup)(game_index)
+            for step in play_and_undo(state, rng):
+                for player_index in range(len(state.players)):
+                    self.assertEqual(
+                        player_score(state, player_index), compute_player_score(state, player_index),
+                        f"game {game_index}, {step}",
+                    )
+
+    def test_verified_games(self):
+        """Random games with VERIFY_SCORES on: the cached scoring is compared with
+        compute_player_score at every use."""
+        rng = random.Random(1)
+        with unittest.mock.patch.object(gods.game, "VERIFY_SCORES", True):
+            for game_seed in range(20):
+                state = quick_setup(game_seed)
+                for _ in random_game(state, rng):
+                    player_score(state, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
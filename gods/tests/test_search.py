@@ -0,0 +1,108 @@
+from __future__ import annotations
+import contextlib
+import io
+import math
+import random
+import time
+import unittest
+import unittest.mock
+
+import gods.game
+from gods.models import Game_State, Choice, clone_choice, start_journal
+from gods.agents.minimax_search import Search_Context, minimax, minimax_search
+from gods.agents.transposition import Transposition_Table
+from gods.setup import quick_setup, doubled_setup
+from gods.tests import random_game
+
+
+def sample_positions() -> list[tuple[Game_State, Choice]]:
+    """(state, choice) at a few decisions of random games, half with doubled decks."""
+    positions = []
+    for seed in range(10):
+        state = (doubled_setup if seed % 2 else quick_setup)(seed)
+        for move, (choice, _) in enumerate(random_game(state, random.Random(seed))):
+            if move in (5, 15, 25):
+                positions.append((state.clone(), clone_choice(choice)))
+    return positions
+
+
+def best_value(state: Game_State, choice: Choice, depth: int, **options) -> float:
+    """Value of the best action found by minimax_search to depth, with the
+    Search_Context options given and no time limit."""
+    ctx = Search_Context(player_index=choice.player_index, start_time=time.time(), time_limit=math.inf, **options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scores = minimax_search(state.clone(), clone_choice(choice), choice.generate_actions(state), depth, ctx)
+    return max(scores)
+
+
+# alpha-beta with none of the enhancements, against which each is checked
+PLAIN = {"ordering": False, "pvs": False, "aspiration_window": 0.0}
+
+
+def large_choose_cards(seeds: range) -> list[tuple[Game_State, Choice]]:
+    """(state, choice) before each choose-cards choice with more than
+    MAX_FLAT_COMBINATIONS actions in random games."""
+    found = []
+    for seed in seeds:
+        state = quick_setup(seed)
+        for choice, _ in random_game(state, random.Random(seed)):
+            if choice.kind == "choose-cards" and len(choice.generate_actions(state)) > gods.game.MAX_FLAT_COMBINATIONS:
+                found.append((state.clone(), clone_choice(choice)))
+    return found
+
+
+def search_value(state: Game_State, choice: Choice, depth: float) -> float:
+    """Value of minimax with a full window, choice pending on a copy of state."""
+    state = state.clone()
+    start_journal(state)
+    ctx = Search_Context(player_index=choice.player_index, start_time=time.time(), time_limit=math.inf)
+    return minimax(state, [clone_choice(choice)], depth, -math.inf, math.inf, ctx)
+
+
+class Test_Search_Value(unittest.TestCase):
+    """The enhancements of minimax_search change how fast it finds the value of a
+    position, not the value."""
+    def assert_same_values(self, **options) -> None:
+        for state, choice in sample_positions():
+            for depth in (2, 3):
+                self.assertAlmostEqual(
+                    best_value(state, choice, depth, **{**PLAIN, **options}), best_value(state, choice, depth, **PLAIN),
+                    msg=f"{choice} at depth {depth}",
+                )
+
+    def test_table(self):
+        self.assert_same_values(table=Transposition_Table(4))
+
+    def test_move_ordering(self):
+        self.assert_same_values(ordering=True)
+
+    def test_principal_variation(self):
+        self.assert_same_values(pvs=True)
+
+    def test_aspiration_windows(self):
+        # a window narrower than most score gaps, so that iterations fail and widen
+        self.assert_same_values(pvs=True, aspiration_window=0.5)
+
+    def test_collapse(self):
+        self.assert_same_values(collapse=True)
+
+    def test_collapse_outcomes(self):
+        self.assert_same_values(collapse=True, collapse_outcomes=True)
+
+
+class Test_Pick_Decomposition(unittest.TestCase):
+    def test_same_value_as_flat(self):
+        """A choose-cards picked card by card is one ply, as when searched flat:
+        at the horizon its combination is finished before the position is scored."""
+        positions = large_choose_cards(range(60))
+        self.assertGreater(len(positions), 0)
+        for state, choice in positions:
+            for depth in (1, 2):
+                decomposed = search_value(state, choice, depth)
+                with unittest.mock.patch.object(gods.game, "MAX_FLAT_COMBINATIONS", math.inf):
+                    flat = search_value(state, choice, depth)
+                self.assertAlmostEqual(decomposed, flat, msg=f"{choice} at depth {depth}")
+
+
+if __name__ == "__main__":
+    unittest.main()
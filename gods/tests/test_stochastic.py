@@ -0,0 +1,24 @@
+from __future__ import annotations
+import unittest
+
+from gods.agents.minimax_stochastic import vote_decided
+
+
+class Test_Vote_Decided(unittest.TestCase):
+    def test_lead_larger_than_samples_left(self):
+        self.assertTrue(vote_decided([[1.0, 0.0]] * 3 + [[0.0, 1.0]], 1))
+        self.assertFalse(vote_decided([[1.0, 0.0]] * 3 + [[0.0, 1.0]], 2))
+
+    def test_votes_not_margins(self):
+        # the other action's scores are upper bounds far below the best: a
+        # margin test would stop here, the votes are split
+        results = [[5.0, -100.0], [5.0, -100.0], [-100.0, 5.0], [5.0, -100.0], [-100.0, 5.0]]
+        self.assertFalse(vote_decided(results, 10))
+
+    def test_significant_lead(self):
+        self.assertTrue(vote_decided([[1.0, 0.0]] * 6, 10))
+        self.assertFalse(vote_decided([[1.0, 0.0]] * 3, 10))  # fewer than MIN_SAMPLES
+
+
+if __name__ == "__main__":
+    unittest.main()
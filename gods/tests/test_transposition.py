@@ -0,0 +1,46 @@
+from __future__ import annotations
+import pickle
+import unittest
+
+from gods.agents.transposition import Transposition_Table, EXACT, LOWER
+
+
+class Test_Transposition_Table(unittest.TestCase):
+    def setUp(self):
+        self.table = Transposition_Table(0)  # a single bucket
+        self.assertEqual(self.table.num_buckets, 1)
+
+    def test_probe(self):
+        self.assertIsNone(self.table.probe(7))
+        self.table.store(7, 1.5, 3, LOWER, 2)
+        self.assertEqual(self.table.probe(7)[1:5], (1.5, 3, LOWER, 2))
+        self.assertIsNone(self.table.probe(8))
+
+    def test_depth_preferred(self):
+        """The first slot keeps the deepest result of the search, the second the newest."""
+        self.table.store(1, 0.0, 4, EXACT, 0)
+        self.table.store(2, 0.0, 2, EXACT, 0)
+        self.table.store(3, 0.0, 1, EXACT, 0)
+        self.assertIsNotNone(self.table.probe(1))
+        self.assertIsNone(self.table.probe(2))
+        self.assertIsNotNone(self.table.probe(3))
+        self.table.store(4, 0.0, 4, EXACT, 0)  # as deep replaces
+        self.assertIsNone(self.table.probe(1))
+        self.assertIsNotNone(self.table.probe(4))
+
+    def test_older_search_replaced(self):
+        self.table.store(1, 0.0, 9, EXACT, 0)
+        self.table.new_search()
+        self.table.store(2, 0.0, 1, EXACT, 0)
+        self.assertIsNone(self.table.probe(1))
+        self.assertIsNotNone(self.table.probe(2))
+
+    def test_pickled_empty(self):
+        self.table.store(1, 0.0, 1, EXACT, 0)
+        copy = pickle.loads(pickle.dumps(self.table))
+        self.assertIsNone(copy.probe(1))
+        self.assertEqual(len(copy.slots), 2 * copy.num_buckets)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,12 @@ import threading
 
 from pyray import *
 
-from gods.models import Game_State, effective_power
+from gods.models import Game_State, effective_power, get_zone, invalidate_caches
 from gods.setup import quick_setup
 from gods.game import game_loop, compute_player_score
 from gods.agents.duel import Agent_Duel
 from gods.agents.minimax_stochastic import Agent_Minimax_Stochastic
+from gods.agents.ponder import Agent_Ponder
 
 from gods_online.agent_remote import Agent_Local_Online, Agent_Remote
 import kitchen_table.models as kt
@@ -24,13 +25,28 @@ from gods_graphical.ui import (
 )
 
 
-def init_table_state(gods_state: Game_State, bottom_player: int = 0) -> kt.Table_State:
+def snapshot(gods_state: Game_State) -> Game_State:
+    """Copy of the game for drawing one frame.
+
+    The game thread changes gods_state while frames are drawn, and reading a
+    state through effective_power or the scoring functions fills its caches.
+    Drawing from a copy with empty caches never writes to the live game.
+    """
+    state = gods_state.clone()
+    invalidate_caches(state)
+    return state
+
+
+def init_table_state(gods_state: Game_State, ui_state: UI_State, bottom_player: int = 0) -> kt.Table_State:
     cards = []
-    gods_cards = []
 
     def draw_power(card: kt.Card):
-        gods_card = gods_cards[card.id]
-        power = str(effective_power(gods_state, gods_card))
+        frame_state = ui_state.frame_state
+        location = frame_state.card_locations().get(card.id)
+        if location is None:  # between two zones when the frame was taken
+            return
+        gods_card = get_zone(frame_state, location[0], location[1])[location[2]]
+        power = str(effective_power(frame_state, gods_card))
         draw_card_power_badge(power, gods_card.destroyed)
 
     def register_cards(card_list):
@@ -45,9 +61,7 @@ def init_table_state(gods_state: Game_State, bottom_player: int = 0) -> kt.Table
                 draw_callback=draw_power,
             )
             card.id = card_id
-            card_list[i].kt_card_id = card_id
             cards.append(kt_card)
-            gods_cards.append(card)
             card_ids.append(card_id)
         return card_ids
 
@@ -132,7 +146,7 @@ def setup_online_game(host: str = "localhost", port: int = 9999):
 
 def play(gods_state: Game_State, table_state: kt.Table_State, ui_state: UI_State, agent_local: Agent, agent_opponent: Agent, player_index: int):
     agent = Agent_Duel(agent_local, agent_opponent, swap=player_index != 0)
-    table_state.draw_callback = lambda table: draw_hud(gods_state, table_state, bottom_player=player_index)
+    table_state.draw_callback = lambda table: draw_hud(ui_state.frame_state, table_state, bottom_player=player_index)
 
     def display(state):
         update_stacks(table_state, gods_state, bottom_player=player_index)
@@ -160,18 +174,20 @@ def play(gods_state: Game_State, table_state: kt.Table_State, ui_state: UI_State
         else:
             table_state.zoomed_card_id = -1
 
+        ui_state.frame_state = snapshot(gods_state)
         begin_drawing()
         draw_background()
         draw_table(table_state)
         draw_buttons(ui_state.buttons)
-        draw_highlighted_cards(ui_state.highlighted_cards, gods_state, table_state)
+        draw_highlighted_cards(ui_state.highlighted_cards, ui_state.frame_state, table_state)
         end_drawing()
 
     # Game over screen
     if gods_state.game_over:
-        update_stacks(table_state, gods_state, bottom_player=player_index)
-        scores = [compute_player_score(gods_state, 0), compute_player_score(gods_state, 1)]
-        names = [gods_state.players[0].name, gods_state.players[1].name]
+        final_state = ui_state.frame_state = snapshot(gods_state)
+        update_stacks(table_state, final_state, bottom_player=player_index)
+        scores = [compute_player_score(final_state, 0), compute_player_score(final_state, 1)]
+        names = [final_state.players[0].name, final_state.players[1].name]
         pi = player_index
         if scores[pi] > scores[1 - pi]:
             result_text = "You win!"
@@ -195,8 +211,8 @@ if __name__ == "__main__":
         sock = None
     
     gods_state = quick_setup(seed)
-    table_state = init_table_state(gods_state, bottom_player=player_index)
     ui_state = UI_State()
+    table_state = init_table_state(gods_state, ui_state, bottom_player=player_index)
     
     agent_ui = Agent_UI(table_state, ui_state, bottom_player=player_index)
     if sock is not None:
@@ -204,7 +220,7 @@ if __name__ == "__main__":
         agent_opponent = Agent_Remote(sock)
     else:
         agent_local = agent_ui
-        agent_opponent = Agent_Minimax_Stochastic()
+        agent_opponent = Agent_Ponder(Agent_Minimax_Stochastic())
 
     play(gods_state, table_state, ui_state, agent_local, agent_opponent, player_index)
     
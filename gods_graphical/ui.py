@@ -1,12 +1,14 @@
 from __future__ import annotations
 import os
 from dataclasses import dataclass, field
+from typing import Optional
 
 from pyray import *
 
 from kitchen_table.config import tweak
 from kitchen_table.rendering import draw_table, draw_background, color_from_tuple
 import kitchen_table.models as kt
+from gods.models import Game_State
 
 IMAGES_DIR = os.path.join(os.path.dirname(__file__), "..", "gods", "cards", "card-images")
 
@@ -106,6 +108,7 @@ class Button:
 class UI_State:
     buttons: list[Button] = field(default_factory=list)
     highlighted_cards: list = field(default_factory=list)
+    frame_state: Optional[Game_State] = None  # what the current frame draws, see snapshot() in main.py
 
 
 # --- Card rendering ---
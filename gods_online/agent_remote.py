@@ -22,6 +22,12 @@ class Agent_Local_Online(Agent):
         self.local_agent = local_agent
         self.sock = sock
 
+    def observe_pending(self, choices: list[Choice]) -> None:
+        self.local_agent.observe_pending(choices)
+
+    def ponder(self, state: Game_State, choice: Choice, actions: list) -> None:
+        self.local_agent.ponder(state, choice, actions)
+
     def choose_action(self, state: Game_State, choice: Choice, actions: list) -> int:
         index = self.local_agent.choose_action(state, choice, actions)
         send_message(self.sock, {"type": "action", "index": index})